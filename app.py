@@ -1,8 +1,93 @@
-from flask import Flask, render_template, jsonify, request
+import csv
+import functools
+import io
+import json
+import queue
+import time
+import zlib
+
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
+import archive_index
 import db_manager 
-import json 
+import db_pool
+import metrics
+import watchlist
+from jsonl_sink import rotated_segment_paths
+from live_tail import LogTailBroadcaster
+from response_cache import ResponseCache
+
+SSE_KEEPALIVE_SECONDS = 15
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_FLUSH_BYTES = 64 * 1024
+EXPORT_GZIP_LEVEL = 6
 
 app = Flask(__name__)
+response_cache = ResponseCache()
+tail_broadcaster = LogTailBroadcaster(db_manager.get_tail_databases)
+
+http_requests_total = metrics.counter(
+    "pylog_http_requests_total", "HTTP requests handled, by route, method and status.", ["route", "method", "status"])
+http_request_seconds = metrics.histogram(
+    "pylog_http_request_duration_seconds", "Time to build a response, by route.", ["route"])
+http_request_sql_seconds = metrics.histogram(
+    "pylog_http_request_sql_seconds", "SQLite time spent per request, by route.", ["route"])
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    metrics.start_sql_timing()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses (SSE) are measured up to the first byte only.
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    sql_seconds = metrics.stop_sql_timing()
+    if 'request_started' in g:
+        http_request_seconds.observe(time.perf_counter() - g.request_started, route=route)
+        http_request_sql_seconds.observe(sql_seconds, route=route)
+    http_requests_total.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+def normalized_request_key():
+    # Empty filter values are what the UI sends for unset inputs; ignore them
+    # so they share a cache entry with requests that omit the parameter.
+    args = tuple(sorted((key, value) for key, value in request.args.items(multi=True) if value != ''))
+    return (request.path, args)
+
+def cached_json_endpoint(time_bucket_seconds=None):
+    """Caches a JSON view's body until the ingest watermark moves.
+
+    Responses carry an ETag built from the watermark and the normalized request,
+    so a matching If-None-Match gets a 304 without touching the queries. Views
+    whose result also depends on the wall clock (e.g. "last hour") pass
+    time_bucket_seconds to roll the key over periodically.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            watermark = db_manager.get_ingest_watermark()
+            cache_key = normalized_request_key()
+            if time_bucket_seconds:
+                cache_key += (int(time.time() // time_bucket_seconds),)
+            etag = ResponseCache.make_etag(cache_key, watermark)
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                body = response_cache.get(cache_key, watermark)
+                if body is None:
+                    view_response = app.make_response(view(*args, **kwargs))
+                    if view_response.status_code != 200:
+                        return view_response
+                    body = view_response.get_data()
+                    response_cache.put(cache_key, watermark, body)
+                response = Response(body, mimetype='application/json')
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
 
 @app.route('/')
 def index():
@@ -10,55 +95,346 @@ def index():
     recent_logs, _ = db_manager.get_logs_from_db(limit=5)
     return render_template('index.html', dashboard_data=dashboard_data, recent_logs=recent_logs)
 
-@app.route('/api/logs', methods=['GET'])
-def api_get_logs():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    offset = (page - 1) * per_page
+def serialize_log_rows(logs):
+    processed_logs = []
+    for log in logs:
+        processed_log = dict(log)
+        processed_log['_SYSTEMD_UNIT'] = log.get('systemd_unit')
+        processed_log['_COMM'] = log.get('comm')
+        processed_log['_BOOT_ID'] = log.get('boot_id')
+        processed_log['__CURSOR'] = log.get('journal_cursor')
+        processed_logs.append(processed_log)
+    return processed_logs
 
+def get_log_filters_from_request():
     filters = {}
     if request.args.get('priority'):
         filters['priority'] = request.args.get('priority')
     if request.args.get('identifier'):
         filters['identifier'] = request.args.get('identifier')
+    if request.args.get('unit'):
+        filters['unit'] = request.args.get('unit')
     if request.args.get('hostname'):
         filters['hostname'] = request.args.get('hostname')
+    # match=exact turns identifier/hostname into equality tests (values from /api/facets).
+    if request.args.get('match'):
+        filters['match'] = request.args.get('match')
     if request.args.get('message'):
         filters['message'] = request.args.get('message')
     if request.args.get('global_search'):
         filters['global_search'] = request.args.get('global_search')
+    if request.args.get('template_id', type=int) is not None:
+        filters['template_id'] = request.args.get('template_id', type=int)
+    # Optional time range (epoch seconds); with sharding it also limits which
+    # shard files are opened.
+    if request.args.get('since', type=float) is not None:
+        filters['since'] = request.args.get('since', type=float)
+    if request.args.get('until', type=float) is not None:
+        filters['until'] = request.args.get('until', type=float)
+    return filters
 
+@app.route('/api/logs', methods=['GET'])
+@cached_json_endpoint()
+def api_get_logs():
+    per_page = request.args.get('per_page', 20, type=int)
+    filters = get_log_filters_from_request()
 
-    logs, total_logs = db_manager.get_logs_from_db(limit=per_page, offset=offset, filters=filters)
-
-    processed_logs = []
-    for log in logs:
-        processed_log = dict(log)
+    # Cursor (keyset) pagination: ?paging=cursor for the first page, then the
+    # opaque `next`/`prev` tokens from the previous response as ?cursor=.
+    page_token = request.args.get('cursor')
+    if page_token or request.args.get('paging') == 'cursor':
+        total_mode = request.args.get('total', db_manager.TOTAL_MODE_ESTIMATE)
+        if total_mode not in (db_manager.TOTAL_MODE_EXACT, db_manager.TOTAL_MODE_ESTIMATE, db_manager.TOTAL_MODE_NONE):
+            return jsonify({'error': f"Unknown total mode '{total_mode}'."}), 400
         try:
-            raw_data = json.loads(log.get('raw_log', '{}'))
-            processed_log['_SYSTEMD_UNIT'] = raw_data.get('_SYSTEMD_UNIT')
-            processed_log['_COMM'] = raw_data.get('_COMM')
-            processed_log['_BOOT_ID'] = raw_data.get('_BOOT_ID')
-            processed_log['__CURSOR'] = raw_data.get('__CURSOR')
-
-        except json.JSONDecodeError:
-            pass
-        processed_logs.append(processed_log)
+            page = db_manager.get_logs_page(limit=per_page, filters=filters, page_token=page_token, total_mode=total_mode)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        total_logs = page['total_logs']
+        return jsonify({
+            'logs': serialize_log_rows(page['logs']),
+            'next': page['next'],
+            'prev': page['prev'],
+            'total_logs': total_logs,
+            'total_is_estimate': page['total_is_estimate'],
+            'per_page': per_page,
+            'total_pages': (total_logs + per_page - 1) // per_page if total_logs is not None else None
+        })
 
+    page = request.args.get('page', 1, type=int)
+    offset = (page - 1) * per_page
+    sort = request.args.get('sort', 'time')
+
+    logs, total_logs = db_manager.get_logs_from_db(limit=per_page, offset=offset, filters=filters, sort=sort)
 
     return jsonify({
-        'logs': processed_logs,
+        'logs': serialize_log_rows(logs),
         'total_logs': total_logs,
         'page': page,
         'per_page': per_page,
         'total_pages': (total_logs + per_page - 1) // per_page
     })
 
+@app.route('/api/logs/<int:log_id>', methods=['GET'])
+def api_get_log_detail(log_id):
+    # raw_log is stored compressed; only this view pays for decoding it.
+    log_detail = db_manager.get_log_detail(log_id)
+    if log_detail is None:
+        return jsonify({'error': f"Log {log_id} not found."}), 404
+    return jsonify(serialize_log_rows([log_detail])[0])
+
+def iter_export_lines(logs, export_format, include_raw_log):
+    if export_format == 'ndjson':
+        for log in logs:
+            yield json.dumps(log, ensure_ascii=False) + "\n"
+        return
+    columns = list(db_manager.LOG_LIST_COLUMNS) + (['raw_log'] if include_raw_log else [])
+    line_buffer = io.StringIO()
+    writer = csv.writer(line_buffer)
+    writer.writerow(columns)
+    for log in logs:
+        if include_raw_log and log.get('raw_log') is not None:
+            log['raw_log'] = json.dumps(log['raw_log'], ensure_ascii=False)
+        writer.writerow([log.get(column) for column in columns])
+        yield line_buffer.getvalue()
+        line_buffer.seek(0)
+        line_buffer.truncate()
+    yield line_buffer.getvalue()
+
+def iter_export_chunks(lines, gzip_output):
+    """Joins lines into ~EXPORT_FLUSH_BYTES chunks, gzip-compressed on the fly if asked."""
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip_output else None
+    pending = []
+    pending_bytes = 0
+    for line in lines:
+        encoded = line.encode('utf-8')
+        pending.append(encoded)
+        pending_bytes += len(encoded)
+        if pending_bytes >= EXPORT_FLUSH_BYTES:
+            chunk = b"".join(pending)
+            pending = []
+            pending_bytes = 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(pending)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+@app.route('/api/logs/export')
+def api_export_logs():
+    # Streams every matching row (no paging) as NDJSON or CSV. Rows come from a
+    # server-side cursor, so memory stays flat whatever the result size.
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown export format '{export_format}'."}), 400
+    filters = get_log_filters_from_request()
+    newest_first = request.args.get('order', 'desc') != 'asc'
+    include_raw_log = request.args.get('raw') in ('1', 'true')
+    gzip_output = 'gzip' in request.accept_encodings or request.args.get('compress') == 'gzip'
+
+    logs = db_manager.iter_logs(filters=filters, newest_first=newest_first, include_raw_log=include_raw_log)
+    body = iter_export_chunks(iter_export_lines(logs, export_format, include_raw_log), gzip_output)
+
+    filename = f"pylog-export-{time.strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+        'Vary': 'Accept-Encoding',
+    }
+    if gzip_output:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+def format_sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/api/logs/stream')
+def api_stream_logs():
+    filters = {}
+    for key in ('priority', 'identifier', 'unit', 'hostname', 'match'):
+        if request.args.get(key):
+            filters[key] = request.args.get(key)
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription = tail_broadcaster.subscribe(filters)
+
+    def generate():
+        # Late rows from older shards have lower ids than rows already sent,
+        # so ids are not monotonic: backfilled rows are deduplicated by id and
+        # the SSE event id is the highest id sent so far (the resume point).
+        highest_sent_id = last_event_id or 0
+        backfilled_ids = set()
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id is not None:
+                rows, complete = tail_broadcaster.backfill(last_event_id, filters)
+                for row in serialize_log_rows(rows):
+                    backfilled_ids.add(row['id'])
+                    highest_sent_id = max(highest_sent_id, row['id'])
+                    yield format_sse_event('log', row, highest_sent_id)
+                if not complete:
+                    yield format_sse_event('reset', {'reason': 'too many missed rows'})
+
+            while True:
+                if subscription.overflowed.is_set():
+                    yield format_sse_event('reset', {'reason': 'client fell behind'})
+                    return
+                try:
+                    row = subscription.rows.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if row['id'] in backfilled_ids:
+                    continue
+                highest_sent_id = max(highest_sent_id, row['id'])
+                yield format_sse_event('log', serialize_log_rows([row])[0], highest_sent_id)
+        finally:
+            tail_broadcaster.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/dashboard-data')
+@cached_json_endpoint(time_bucket_seconds=60)
 def api_dashboard_data():
-    data = db_manager.get_dashboard_data()
+    # ?window=<seconds> for the top identifiers and priorities (default: the
+    # last 24 hours, 0 = all time); the error count always covers the last hour.
+    window_seconds = request.args.get('window', db_manager.DASHBOARD_WINDOW_SECONDS, type=int)
+    data = db_manager.get_dashboard_data(window_seconds=window_seconds)
     return jsonify(data)
 
+@app.route('/api/patterns')
+@cached_json_endpoint(time_bucket_seconds=60)
+def api_top_patterns():
+    window_seconds = request.args.get('window', db_manager.DASHBOARD_WINDOW_SECONDS, type=int)
+    limit = min(request.args.get('limit', db_manager.TOP_TEMPLATES_DEFAULT_LIMIT, type=int), 1000)
+    return jsonify(db_manager.get_top_templates(window_seconds=window_seconds, limit=limit))
+
+@app.route('/api/facets')
+@cached_json_endpoint(time_bucket_seconds=60)
+def api_facets():
+    # ?facet=identifier,unit,hostname,priority (default: all), ?prefix= for
+    # typeahead, and the time range as ?since=&until= or ?window=<seconds>
+    # (default: the dashboard window, 0 = all time). The other log filters
+    # narrow the counts; message and global_search are not applied.
+    facets = [facet.strip() for facet in request.args.get('facet', '').split(',') if facet.strip()]
+    unknown_facets = [facet for facet in facets if facet not in db_manager.FACET_NAMES]
+    if unknown_facets:
+        return jsonify({'error': f"Unknown facet(s): {', '.join(unknown_facets)}."}), 400
+    filters = get_log_filters_from_request()
+    if 'priority' in filters:
+        try:
+            filters['priority'] = int(filters['priority'])
+        except ValueError:
+            return jsonify({'error': f"Invalid priority '{filters['priority']}'."}), 400
+    since = filters.pop('since', None)
+    until = filters.pop('until', None)
+    if since is None and until is None:
+        window_seconds = request.args.get('window', db_manager.DASHBOARD_WINDOW_SECONDS, type=int)
+        if window_seconds > 0:
+            since = time.time() - window_seconds
+    limit = min(max(request.args.get('limit', db_manager.FACET_DEFAULT_LIMIT, type=int), 1), db_manager.FACET_MAX_LIMIT)
+    return jsonify(db_manager.get_facets(facets=facets or None, filters=filters, since=since, until=until,
+                                         prefix=request.args.get('prefix') or None, limit=limit))
+
+@app.route('/api/histogram')
+@cached_json_endpoint(time_bucket_seconds=60)
+def api_histogram():
+    # ?since=&until= (epoch seconds, default: the last 24 hours), then either
+    # ?bucket=<seconds> or ?buckets=<count>; always capped at HISTOGRAM_MAX_POINTS.
+    # Filters: ?priority= (exact), ?identifier=/?hostname= (substring) and
+    # ?unit= (exact systemd unit, counted from the facet rollups).
+    filters = {key: request.args.get(key) for key in ('priority', 'identifier', 'unit', 'hostname') if request.args.get(key)}
+    try:
+        histogram = db_manager.get_log_histogram(
+            since=request.args.get('since', type=float),
+            until=request.args.get('until', type=float),
+            bucket_seconds=request.args.get('bucket', type=int),
+            bucket_count=request.args.get('buckets', db_manager.HISTOGRAM_DEFAULT_BUCKETS, type=int),
+            filters=filters,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(histogram)
+
+@app.route('/api/archive/search')
+def api_archive_search():
+    # Searches rotated JSONL segments in place (see archive_index); ?q= words
+    # must all appear in the message, identifier/unit/hostname match exactly.
+    query = {key: request.args.get(key) or None for key in ('q', 'identifier', 'unit', 'hostname')}
+    if not any(query.values()):
+        return jsonify({'error': 'Give at least one of q, identifier, unit or hostname.'}), 400
+    limit = min(request.args.get('limit', archive_index.ARCHIVE_SEARCH_DEFAULT_LIMIT, type=int),
+                archive_index.ARCHIVE_SEARCH_MAX_LIMIT)
+    result = archive_index.search_archive(
+        rotated_segment_paths(db_manager.OUTPUT_LOG_FILE_FOR_IMPORT),
+        terms=query['q'], identifier=query['identifier'], unit=query['unit'], hostname=query['hostname'],
+        since=request.args.get('since', type=float), until=request.args.get('until', type=float),
+        limit=limit, newest_first=request.args.get('order', 'desc') != 'asc',
+    )
+    return jsonify(result)
+
+@app.route('/api/watchlist/rules', methods=['GET'])
+def api_list_watchlist_rules():
+    return jsonify(watchlist.list_rules())
+
+@app.route('/api/watchlist/rules', methods=['POST'])
+def api_add_watchlist_rule():
+    # Rules are picked up by running collectors / ingest servers within
+    # WATCHLIST_RELOAD_INTERVAL_SECONDS.
+    try:
+        rule = watchlist.add_rule(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(rule), 201
+
+@app.route('/api/watchlist/rules/<int:rule_id>', methods=['DELETE'])
+def api_delete_watchlist_rule(rule_id):
+    if not watchlist.delete_rule(rule_id):
+        return jsonify({'error': f"Rule {rule_id} not found."}), 404
+    return '', 204
+
+@app.route('/api/alerts', methods=['GET'])
+def api_list_alerts():
+    alerts = watchlist.list_alerts(
+        limit=min(request.args.get('limit', watchlist.ALERTS_DEFAULT_LIMIT, type=int), 1000),
+        after_id=request.args.get('after_id', type=int),
+        unacknowledged_only=request.args.get('unacknowledged') in ('1', 'true'),
+    )
+    return jsonify(alerts)
+
+@app.route('/api/alerts/<int:alert_id>/acknowledge', methods=['POST'])
+def api_acknowledge_alert(alert_id):
+    if not watchlist.acknowledge_alert(alert_id):
+        return jsonify({'error': f"Alert {alert_id} not found or already acknowledged."}), 404
+    return '', 204
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render_prometheus_text(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/api/db-pool-stats')
+def api_db_pool_stats():
+    return jsonify(db_pool.all_pool_stats())
 
 if __name__ == '__main__':
+    db_manager.ensure_log_databases()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,458 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+from collections import OrderedDict
+
+import db_manager
+
+# Sidecar indexes that make rotated JSONL archive segments searchable in
+# place. A segment is split into blocks of INDEX_BLOCK_LINES lines; the
+# sidecar `<segment>.idx` keeps the segment's time range and, per block, its
+# byte range, time range and a bloom filter over identifiers, units, hosts and
+# message words. A search skips segments and blocks that cannot match and
+# only reads the rest: plain segments through mmap, gzipped segments one
+# gzip member at a time, which is why compress_segment() writes one member
+# per block (still a normal .gz for gzip/zcat and bulk_import).
+
+INDEX_SUFFIX = ".idx"
+INDEX_FORMAT_VERSION = 1
+INDEX_BLOCK_LINES = 1000
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+SEGMENT_GZIP_LEVEL = 6
+READ_CHUNK_BYTES = 1024 * 1024
+INDEX_CACHE_MAX_SEGMENTS = 256
+ARCHIVE_SEARCH_DEFAULT_LIMIT = 100
+ARCHIVE_SEARCH_MAX_LIMIT = 1000
+
+# Same idea as the FTS5 unicode61 tokenizer: message terms match whole words,
+# case-insensitively.
+TOKEN_PATTERN = re.compile(r"\w+")
+
+archive_logger = logging.getLogger(__name__)
+if not archive_logger.handlers:
+    archive_handler = logging.StreamHandler()
+    archive_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    archive_handler.setFormatter(archive_formatter)
+    archive_logger.addHandler(archive_handler)
+    archive_logger.setLevel(logging.INFO)
+
+def message_words(message):
+    return TOKEN_PATTERN.findall(message.lower()) if isinstance(message, str) else []
+
+def entry_index_keys(columns):
+    """The bloom filter keys of one entry's build_log_columns() values."""
+    keys = {f"m:{word}" for word in message_words(columns["message"])}
+    if columns["syslog_identifier"]:
+        keys.add(f"i:{columns['syslog_identifier']}")
+    if columns["systemd_unit"]:
+        keys.add(f"u:{columns['systemd_unit']}")
+    if columns["hostname"]:
+        keys.add(f"h:{columns['hostname']}")
+    return keys
+
+def query_index_keys(terms=None, identifier=None, unit=None, hostname=None):
+    keys = {f"m:{word}" for word in message_words(terms)}
+    if identifier:
+        keys.add(f"i:{identifier}")
+    if unit:
+        keys.add(f"u:{unit}")
+    if hostname:
+        keys.add(f"h:{hostname}")
+    return keys
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+class BloomFilter:
+    """Fixed-size bloom filter over 64-bit key hashes (double hashing)."""
+
+    def __init__(self, bit_count, hash_count, bits=None):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+
+    @classmethod
+    def from_hashes(cls, hashes, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        item_count = max(len(hashes), 1)
+        bit_count = max(64, math.ceil(-item_count * math.log(false_positive_rate) / math.log(2) ** 2))
+        bloom = cls(bit_count, max(1, round(bit_count / item_count * math.log(2))))
+        for hash_value in hashes:
+            for position in bloom.positions(hash_value):
+                bloom.bits[position >> 3] |= 1 << (position & 7)
+        return bloom
+
+    def positions(self, hash_value):
+        first = hash_value & 0xFFFFFFFF
+        step = (hash_value >> 32) | 1
+        return [(first + i * step) % self.bit_count for i in range(self.hash_count)]
+
+    def might_contain(self, hash_value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(hash_value))
+
+    def to_json(self):
+        return {"bits": self.bit_count, "hashes": self.hash_count, "data": base64.b64encode(zlib.compress(bytes(self.bits))).decode("ascii")}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["bits"], data["hashes"], zlib.decompress(base64.b64decode(data["data"])))
+
+class BlockIndexer:
+    """Collects one block's line count, time range and bloom filter keys."""
+
+    def __init__(self, offset, first_line):
+        self.offset = offset
+        self.first_line = first_line
+        self.lines = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.hashes = set()
+
+    def add_line(self, line):
+        self.lines += 1
+        try:
+            log_data = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return
+        if not isinstance(log_data, dict):
+            return
+        columns = db_manager.build_log_columns(log_data)
+        timestamp = columns["timestamp"]
+        if timestamp is not None:
+            self.min_timestamp = timestamp if self.min_timestamp is None else min(self.min_timestamp, timestamp)
+            self.max_timestamp = timestamp if self.max_timestamp is None else max(self.max_timestamp, timestamp)
+        self.hashes.update(key_hash(key) for key in entry_index_keys(columns))
+
+    def finish(self, length):
+        return {
+            "offset": self.offset,
+            "length": length,
+            "first_line": self.first_line,
+            "lines": self.lines,
+            "min_timestamp": self.min_timestamp,
+            "max_timestamp": self.max_timestamp,
+            "bloom": BloomFilter.from_hashes(self.hashes).to_json(),
+        }
+
+def segment_index_document(segment_path, compressed, blocks):
+    timestamps = [block[key] for block in blocks for key in ("min_timestamp", "max_timestamp") if block[key] is not None]
+    return {
+        "version": INDEX_FORMAT_VERSION,
+        "segment": os.path.basename(segment_path),
+        "segment_size": os.path.getsize(segment_path),
+        "compressed": compressed,
+        "block_lines": INDEX_BLOCK_LINES,
+        "lines": sum(block["lines"] for block in blocks),
+        "min_timestamp": min(timestamps) if timestamps else None,
+        "max_timestamp": max(timestamps) if timestamps else None,
+        "blocks": blocks,
+    }
+
+def write_segment_index(segment_path, index):
+    index_path = f"{segment_path}{INDEX_SUFFIX}"
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as f_out:
+        json.dump(index, f_out, separators=(",", ":"))
+    os.replace(f"{index_path}.tmp", index_path)
+    return index_path
+
+def index_plain_segment(segment_path):
+    blocks = []
+    block = BlockIndexer(0, 0)
+    offset = 0
+    line_number = 0
+    with open(segment_path, "rb") as f_in:
+        for line in f_in:
+            block.add_line(line)
+            offset += len(line)
+            line_number += 1
+            if block.lines >= INDEX_BLOCK_LINES:
+                blocks.append(block.finish(offset - block.offset))
+                block = BlockIndexer(offset, line_number)
+    if block.lines:
+        blocks.append(block.finish(offset - block.offset))
+    return segment_index_document(segment_path, False, blocks)
+
+def iter_gzip_members(segment_path):
+    """(compressed offset, compressed length, decompressed bytes) per gzip member."""
+    with open(segment_path, "rb") as f_in:
+        decompressor = zlib.decompressobj(31)
+        member_offset = 0
+        consumed = 0
+        pieces = []
+        while True:
+            chunk = f_in.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            while chunk:
+                consumed += len(chunk)
+                pieces.append(decompressor.decompress(chunk))
+                if not decompressor.eof:
+                    break
+                chunk = decompressor.unused_data
+                consumed -= len(chunk)
+                yield member_offset, consumed - member_offset, b"".join(pieces)
+                member_offset = consumed
+                pieces = []
+                decompressor = zlib.decompressobj(31)
+        if consumed > member_offset:
+            raise EOFError(f"'{segment_path}' ends in the middle of a gzip member.")
+
+def index_gzip_segment(segment_path):
+    """Blocks are the gzip members: INDEX_BLOCK_LINES lines each when written by
+    compress_segment(), the whole segment for gzips written any other way."""
+    blocks = []
+    line_number = 0
+    for offset, length, data in iter_gzip_members(segment_path):
+        block = BlockIndexer(offset, line_number)
+        for line in data.splitlines():
+            block.add_line(line)
+        line_number += block.lines
+        blocks.append(block.finish(length))
+    return segment_index_document(segment_path, True, blocks)
+
+def build_segment_index(segment_path):
+    started = time.monotonic()
+    if segment_path.endswith(".gz"):
+        index = index_gzip_segment(segment_path)
+    else:
+        index = index_plain_segment(segment_path)
+    write_segment_index(segment_path, index)
+    archive_logger.info(f"Indexed archive segment '{segment_path}': {index['lines']} lines in "
+                        f"{len(index['blocks'])} block(s), {time.monotonic() - started:.1f}s.")
+    return index
+
+def compress_segment(segment_path, gz_path):
+    """Gzips a closed segment as one gzip member per block and indexes it.
+
+    Writes gz_path and its sidecar; the caller removes segment_path.
+    """
+    blocks = []
+    with open(segment_path, "rb") as f_in, open(f"{gz_path}.tmp", "wb") as f_out:
+        line_number = 0
+        while True:
+            block = BlockIndexer(f_out.tell(), line_number)
+            lines = []
+            for line in f_in:
+                lines.append(line)
+                block.add_line(line)
+                if len(lines) >= INDEX_BLOCK_LINES:
+                    break
+            if not lines:
+                break
+            f_out.write(gzip.compress(b"".join(lines), compresslevel=SEGMENT_GZIP_LEVEL, mtime=0))
+            blocks.append(block.finish(f_out.tell() - block.offset))
+            line_number += block.lines
+    os.replace(f"{gz_path}.tmp", gz_path)
+    index = segment_index_document(gz_path, True, blocks)
+    write_segment_index(gz_path, index)
+    stale_index_path = f"{segment_path}{INDEX_SUFFIX}"
+    if os.path.exists(stale_index_path):
+        os.remove(stale_index_path)
+    return index
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+def load_segment_index(segment_path):
+    """The segment's sidecar index, or None if it is missing or out of date."""
+    index_path = f"{segment_path}{INDEX_SUFFIX}"
+    try:
+        segment_size = os.path.getsize(segment_path)
+        index_mtime = os.path.getmtime(index_path)
+    except OSError:
+        return None
+    cache_key = (index_path, index_mtime)
+    with _index_cache_lock:
+        index = _index_cache.get(cache_key)
+        if index is not None:
+            _index_cache.move_to_end(cache_key)
+    if index is None:
+        try:
+            with open(index_path, "r", encoding="utf-8") as f_in:
+                index = json.load(f_in)
+        except (OSError, json.JSONDecodeError) as e:
+            archive_logger.warning(f"Ignoring unreadable archive index '{index_path}': {e}")
+            return None
+        if index.get("version") != INDEX_FORMAT_VERSION:
+            return None
+        for block in index["blocks"]:
+            block["bloom"] = BloomFilter.from_json(block["bloom"])
+        with _index_cache_lock:
+            _index_cache[cache_key] = index
+            while len(_index_cache) > INDEX_CACHE_MAX_SEGMENTS:
+                _index_cache.popitem(last=False)
+    if index["segment_size"] != segment_size:
+        return None
+    return index
+
+def ensure_segment_indexes(segment_paths, deadline=None, stop_event=None):
+    """Builds missing or stale sidecars; returns how many were built."""
+    built = 0
+    for segment_path in segment_paths:
+        if (deadline is not None and time.monotonic() >= deadline) or (stop_event is not None and stop_event.is_set()):
+            break
+        if load_segment_index(segment_path) is not None or os.path.exists(f"{segment_path}.gz.tmp"):
+            continue # Indexed already, or JsonlSink is compressing (and indexing) it right now.
+        try:
+            build_segment_index(segment_path)
+            built += 1
+        except (OSError, EOFError, zlib.error) as e:
+            archive_logger.error(f"Could not index archive segment '{segment_path}': {e}")
+    return built
+
+def remove_segment_index(segment_path):
+    try:
+        os.remove(f"{segment_path}{INDEX_SUFFIX}")
+    except FileNotFoundError:
+        pass
+
+def overlaps(min_timestamp, max_timestamp, since, until):
+    if since is None and until is None:
+        return True
+    if min_timestamp is None:
+        return False
+    return (since is None or max_timestamp >= since) and (until is None or min_timestamp < until)
+
+def read_block_lines(segment_file, segment_map, index, block):
+    if index["compressed"]:
+        segment_file.seek(block["offset"])
+        data = zlib.decompress(segment_file.read(block["length"]), 31)
+    else:
+        data = segment_map[block["offset"]:block["offset"] + block["length"]]
+    return data.splitlines()
+
+def iter_unindexed_lines(segment_path):
+    opener = gzip.open if segment_path.endswith(".gz") else open
+    with opener(segment_path, "rb") as f_in:
+        yield from f_in
+
+def match_line(line, needles, query):
+    """The matching entry's columns, or None."""
+    lowered = line.lower()
+    if any(needle not in lowered for needle in needles):
+        return None
+    try:
+        log_data = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(log_data, dict):
+        return None
+    columns = db_manager.build_log_columns(log_data)
+    if query["words"] and not query["words"] <= set(message_words(columns["message"])):
+        return None
+    for key, column in (("identifier", "syslog_identifier"), ("unit", "systemd_unit"), ("hostname", "hostname")):
+        if query[key] and columns[column] != query[key]:
+            return None
+    timestamp = columns["timestamp"]
+    if query["since"] is not None and (timestamp is None or timestamp < query["since"]):
+        return None
+    if query["until"] is not None and (timestamp is None or timestamp >= query["until"]):
+        return None
+    return columns
+
+def search_archive(segment_paths, terms=None, identifier=None, unit=None, hostname=None,
+                   since=None, until=None, limit=ARCHIVE_SEARCH_DEFAULT_LIMIT, newest_first=True):
+    """Finds archived entries without importing them into SQLite.
+
+    terms are words that must all appear in MESSAGE; identifier, unit and
+    hostname match exactly; since/until bound __REALTIME_TIMESTAMP. Segments
+    without a current sidecar are read in full, in file order.
+    """
+    started = time.monotonic()
+    query = {
+        "words": set(message_words(terms)),
+        "identifier": identifier, "unit": unit, "hostname": hostname,
+        "since": since, "until": until,
+    }
+    hashes = [key_hash(key) for key in query_index_keys(terms, identifier, unit, hostname)]
+    # Cheap byte-level prefilter before a line is parsed. Non-ASCII words are
+    # left out, since the JSON may have them \u-escaped.
+    needles = [word.encode("utf-8") for word in query["words"] if word.isascii()]
+    stats = {"segments": len(segment_paths), "segments_read": 0, "unindexed_segments": 0,
+             "blocks_read": 0, "lines_scanned": 0}
+    logs = []
+
+    ordered_paths = list(reversed(segment_paths)) if newest_first else list(segment_paths)
+    for segment_path in ordered_paths:
+        if len(logs) >= limit:
+            break
+        index = load_segment_index(segment_path)
+        if index is None:
+            stats["unindexed_segments"] += 1
+            stats["segments_read"] += 1
+            try:
+                for line_number, line in enumerate(iter_unindexed_lines(segment_path)):
+                    stats["lines_scanned"] += 1
+                    columns = match_line(line, needles, query)
+                    if columns is not None:
+                        logs.append(dict(columns, archive_segment=os.path.basename(segment_path), archive_line=line_number))
+                        if len(logs) >= limit:
+                            break
+            except (OSError, EOFError, zlib.error) as e:
+                archive_logger.error(f"Could not read archive segment '{segment_path}': {e}")
+            continue
+
+        if not overlaps(index["min_timestamp"], index["max_timestamp"], since, until):
+            continue
+        candidates = [
+            block for block in index["blocks"]
+            if overlaps(block["min_timestamp"], block["max_timestamp"], since, until)
+            and all(block["bloom"].might_contain(hash_value) for hash_value in hashes)
+        ]
+        if not candidates:
+            continue
+        if newest_first:
+            candidates.reverse()
+
+        stats["segments_read"] += 1
+        try:
+            with open(segment_path, "rb") as segment_file:
+                segment_map = None
+                if not index["compressed"] and index["segment_size"]:
+                    segment_map = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for block in candidates:
+                        stats["blocks_read"] += 1
+                        lines = read_block_lines(segment_file, segment_map, index, block)
+                        stats["lines_scanned"] += len(lines)
+                        numbered = list(enumerate(lines, block["first_line"]))
+                        if newest_first:
+                            numbered.reverse()
+                        for line_number, line in numbered:
+                            columns = match_line(line, needles, query)
+                            if columns is not None:
+                                logs.append(dict(columns, archive_segment=os.path.basename(segment_path), archive_line=line_number))
+                                if len(logs) >= limit:
+                                    break
+                        if len(logs) >= limit:
+                            break
+                finally:
+                    if segment_map is not None:
+                        segment_map.close()
+        except (OSError, zlib.error) as e:
+            archive_logger.error(f"Could not read archive segment '{segment_path}': {e}")
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return {"logs": logs, "stats": stats}
+
+if __name__ == "__main__":
+    from jsonl_sink import rotated_segment_paths
+
+    archive_segments = rotated_segment_paths(db_manager.OUTPUT_LOG_FILE_FOR_IMPORT)
+    archive_logger.info(f"Built {ensure_segment_indexes(archive_segments)} archive index(es).")
+    if sys.argv[1:]:
+        result = search_archive(archive_segments, terms=" ".join(sys.argv[1:]))
+        for entry in result["logs"]:
+            print(f"{entry['archive_segment']}:{entry['archive_line']} {entry['timestamp']} "
+                  f"{entry['syslog_identifier']}: {entry['message']}")
+        archive_logger.info(f"Archive search stats: {result['stats']}")
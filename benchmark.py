@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import platform
+import subprocess
+
+from datetime import datetime, timezone
+from itertools import islice
+
+import db_manager
+import bulk_import
+from journal_generator import JournalGenerator
+
+# End-to-end benchmark: builds a synthetic database of --rows entries, then
+# times the ingest paths and every query the API endpoints run. Results are
+# saved as JSON under BENCHMARK_RESULTS_DIRECTORY; --compare prints the change
+# against an earlier result file.
+
+BENCHMARK_WORK_DIRECTORY = "benchmark_data"
+BENCHMARK_RESULTS_DIRECTORY = "benchmark_results"
+DEFAULT_ROWS = 1_000_000
+# The JSONL ingest paths are timed on a sample; the full database is built by
+# feeding generated entries straight to the collector's batch writer.
+INGEST_SAMPLE_ROWS = 100_000
+BUILD_BATCH_SIZE = 5000
+DEFAULT_QUERY_ITERATIONS = 30
+DEEP_OFFSET = 10_000
+KEYSET_PAGES_DEEP = 20
+
+benchmark_logger = logging.getLogger(__name__)
+if not benchmark_logger.handlers:
+    benchmark_handler = logging.StreamHandler()
+    benchmark_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    benchmark_handler.setFormatter(benchmark_formatter)
+    benchmark_logger.addHandler(benchmark_handler)
+    benchmark_logger.setLevel(logging.INFO)
+    # collector (imported for the parsing benchmark) configures the root logger.
+    benchmark_logger.propagate = False
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+def summarize_latencies(samples):
+    """p50/p95/p99/mean/max of latency samples (seconds), in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def remove_database(db_path):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
+
+def database_size_bytes(db_path):
+    return sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal") if os.path.exists(db_path + suffix))
+
+def quiet_loggers(*logger_names):
+    for logger_name in logger_names:
+        logging.getLogger(logger_name).setLevel(logging.WARNING)
+
+def bench_collector_parsing(jsonl_path, sample_rows):
+    """collector.process_journal_lines on journalctl-style lines, storage off.
+
+    The collector's log output goes to /dev/null so its formatting cost is
+    still counted without flooding the terminal.
+    """
+    import collector
+
+    with open(jsonl_path, encoding='utf-8') as f_in:
+        lines = [line.rstrip("\n") for line in islice(f_in, sample_rows)]
+    saved_settings = (collector.STORE_LOGS_TO_DATABASE, collector.STORE_LOGS_TO_FILE)
+    collector.STORE_LOGS_TO_DATABASE = collector.STORE_LOGS_TO_FILE = False
+    root_logger = logging.getLogger()
+    saved_handlers = root_logger.handlers[:]
+    with open(os.devnull, 'w') as devnull:
+        root_logger.handlers = [logging.StreamHandler(devnull)]
+        try:
+            started = time.perf_counter()
+            for batch_start in range(0, len(lines), db_manager.IMPORT_BATCH_SIZE):
+                collector.process_journal_lines(lines[batch_start:batch_start + db_manager.IMPORT_BATCH_SIZE])
+            elapsed = time.perf_counter() - started
+        finally:
+            root_logger.handlers = saved_handlers
+            collector.STORE_LOGS_TO_DATABASE, collector.STORE_LOGS_TO_FILE = saved_settings
+    return {"lines": len(lines), "seconds": round(elapsed, 3), "lines_per_second": rate(len(lines), elapsed)}
+
+def bench_jsonl_imports(jsonl_path, work_directory, workers):
+    """Serial import_jsonl_to_sqlite vs bulk_import_jsonl of the same file."""
+    results = {}
+    rows = sum(1 for _ in open(jsonl_path, 'rb'))
+    serial_db = os.path.join(work_directory, "import-serial.sqlite3")
+    remove_database(serial_db)
+    started = time.perf_counter()
+    db_manager.import_jsonl_to_sqlite(jsonl_path, serial_db, resume=False)
+    elapsed = time.perf_counter() - started
+    results["serial_import"] = {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": rate(rows, elapsed)}
+
+    bulk_db = os.path.join(work_directory, "import-bulk.sqlite3")
+    remove_database(bulk_db)
+    started = time.perf_counter()
+    bulk_import.bulk_import_jsonl([jsonl_path], bulk_db, workers=workers, resume=False)
+    elapsed = time.perf_counter() - started
+    results["bulk_import"] = {"rows": rows, "seconds": round(elapsed, 3), "rows_per_second": rate(rows, elapsed), "workers": workers}
+    remove_database(serial_db)
+    remove_database(bulk_db)
+    return results
+
+def build_database(db_path, generator, rows):
+    """Writes `rows` generated entries through SqliteBatchWriter, indexes deferred."""
+    remove_database(db_path)
+    writer = db_manager.SqliteBatchWriter(db_path)
+    with writer.pool.write() as conn:
+        bulk_import.defer_indexes(conn)
+    started = time.perf_counter()
+    last_progress = started
+    written = 0
+    entries = generator.entries(rows)
+    while True:
+        batch = list(islice(entries, BUILD_BATCH_SIZE))
+        if not batch:
+            break
+        written += writer.write_batch(batch)
+        if time.perf_counter() - last_progress >= 10:
+            last_progress = time.perf_counter()
+            benchmark_logger.info(f"Built {written}/{rows} rows ({rate(written, last_progress - started)} rows/s).")
+    insert_seconds = time.perf_counter() - started
+    with writer.pool.write() as conn:
+        bulk_import.restore_indexes(conn)
+    writer.close()
+    total_seconds = time.perf_counter() - started
+    return {
+        "rows": written,
+        "insert_seconds": round(insert_seconds, 3),
+        "index_seconds": round(total_seconds - insert_seconds, 3),
+        "rows_per_second": rate(written, total_seconds),
+    }
+
+def query_cases(db_path):
+    """(name, callable) for each query an API endpoint runs, with realistic values."""
+    conn = sqlite3.connect(db_path)
+    try:
+        newest = conn.execute("SELECT MAX(timestamp) FROM logs").fetchone()[0] or time.time()
+        hostname = conn.execute("SELECT hostname FROM logs WHERE id = (SELECT MIN(id) FROM logs)").fetchone()[0]
+        rare_unit = conn.execute("SELECT systemd_unit FROM logs WHERE systemd_unit LIKE 'app-%' LIMIT 1").fetchone()
+        max_id = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0] or 1
+    finally:
+        conn.close()
+    rare_unit = rare_unit[0] if rare_unit else "sshd"
+
+    deep_page = db_manager.get_logs_page(limit=50, total_mode=db_manager.TOTAL_MODE_NONE)
+    for _ in range(KEYSET_PAGES_DEEP - 1):
+        if not deep_page["next"]:
+            break
+        deep_page = db_manager.get_logs_page(limit=50, page_token=deep_page["next"], total_mode=db_manager.TOTAL_MODE_NONE)
+    deep_token = deep_page["next"]
+    detail_ids = iter(range(max_id, 0, -max(1, max_id // 1000)))
+
+    return [
+        ("logs_offset_first_page", lambda: db_manager.get_logs_from_db(limit=50)),
+        ("logs_offset_deep", lambda: db_manager.get_logs_from_db(limit=50, offset=DEEP_OFFSET)),
+        ("logs_filter_priority", lambda: db_manager.get_logs_from_db(limit=50, filters={"priority": 3})),
+        ("logs_filter_identifier", lambda: db_manager.get_logs_from_db(limit=50, filters={"identifier": "NetworkManager"})),
+        ("logs_filter_identifier_rare", lambda: db_manager.get_logs_from_db(limit=50, filters={"identifier": rare_unit})),
+        ("logs_filter_hostname", lambda: db_manager.get_logs_from_db(limit=50, filters={"hostname": hostname})),
+        ("logs_filter_message_fts", lambda: db_manager.get_logs_from_db(limit=50, filters={"message": "timeout"})),
+        ("logs_global_search_fts", lambda: db_manager.get_logs_from_db(limit=50, filters={"global_search": "upstream 502"})),
+        ("logs_global_search_relevance", lambda: db_manager.get_logs_from_db(limit=50, filters={"global_search": "failed"}, sort="relevance")),
+        ("logs_last_hour", lambda: db_manager.get_logs_from_db(limit=50, filters={"since": newest - 3600})),
+        ("logs_keyset_first_page", lambda: db_manager.get_logs_page(limit=50)),
+        ("logs_keyset_deep_page", lambda: db_manager.get_logs_page(limit=50, page_token=deep_token)),
+        ("logs_keyset_exact_total", lambda: db_manager.get_logs_page(limit=50, filters={"priority": 4}, total_mode=db_manager.TOTAL_MODE_EXACT)),
+        ("log_detail", lambda: db_manager.get_log_detail(next(detail_ids, max_id))),
+        ("dashboard_data", lambda: db_manager.get_dashboard_data()),
+    ]
+
+def clear_count_cache():
+    # Each iteration should pay for its COUNT(*) like a first page load does.
+    with db_manager._count_cache_lock:
+        db_manager._count_cache.clear()
+
+def bench_queries(db_path, iterations):
+    results = {}
+    for name, query in query_cases(db_path):
+        query()
+        samples = []
+        for _ in range(iterations):
+            clear_count_cache()
+            started = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - started)
+        results[name] = summarize_latencies(samples)
+        benchmark_logger.info(f"{name}: p50 {results[name]['p50_ms']} ms, p95 {results[name]['p95_ms']} ms, p99 {results[name]['p99_ms']} ms")
+    return results
+
+def run_benchmark(rows=DEFAULT_ROWS, work_directory=BENCHMARK_WORK_DIRECTORY, iterations=DEFAULT_QUERY_ITERATIONS,
+                  workers=None, reuse=False, seed=1):
+    os.makedirs(work_directory, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    db_path = os.path.join(work_directory, f"bench-{rows}.sqlite3")
+    sample_path = os.path.join(work_directory, f"sample-{INGEST_SAMPLE_ROWS}.jsonl")
+    quiet_loggers("db_manager", "db_migrations", "bulk_import")
+
+    result = {
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {"rows": rows, "ingest_sample_rows": INGEST_SAMPLE_ROWS, "iterations": iterations, "workers": workers, "seed": seed},
+        "ingest": {},
+    }
+
+    if not (reuse and os.path.exists(sample_path)):
+        JournalGenerator(seed=seed + 1).write_jsonl(sample_path, INGEST_SAMPLE_ROWS)
+    benchmark_logger.info("Timing collector parsing and JSONL imports...")
+    result["ingest"]["collector_parsing"] = bench_collector_parsing(sample_path, INGEST_SAMPLE_ROWS)
+    result["ingest"].update(bench_jsonl_imports(sample_path, work_directory, workers))
+
+    if reuse and os.path.exists(db_path):
+        benchmark_logger.info(f"Reusing '{db_path}'.")
+    else:
+        benchmark_logger.info(f"Building a {rows}-row database at '{db_path}'...")
+        result["ingest"]["database_build"] = build_database(db_path, JournalGenerator(seed=seed), rows)
+
+    saved_settings = (db_manager.DATABASE_NAME, db_manager.SHARD_INTERVAL_SECONDS)
+    db_manager.DATABASE_NAME, db_manager.SHARD_INTERVAL_SECONDS = db_path, None
+    try:
+        result["queries"] = bench_queries(db_path, iterations)
+    finally:
+        db_manager.DATABASE_NAME, db_manager.SHARD_INTERVAL_SECONDS = saved_settings
+
+    conn = sqlite3.connect(db_path)
+    try:
+        result["database"] = {
+            "rows": conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0],
+            "size_bytes": database_size_bytes(db_path),
+            "raw_log_bytes": conn.execute("SELECT SUM(LENGTH(raw_log)) FROM logs").fetchone()[0],
+        }
+    finally:
+        conn.close()
+    return result
+
+def save_result(result, results_directory=BENCHMARK_RESULTS_DIRECTORY):
+    os.makedirs(results_directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(results_directory, f"{stamp}-{result['revision']}-{result['config']['rows']}.json")
+    with open(path, 'w', encoding='utf-8') as f_out:
+        json.dump(result, f_out, indent=2)
+    return path
+
+def compare_results(baseline, current):
+    """Lines describing the change of every throughput and latency metric."""
+    def change(old, new):
+        if not old or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = [f"{baseline['revision']} -> {current['revision']}"]
+    for name, stats in current.get("ingest", {}).items():
+        old_stats = baseline.get("ingest", {}).get(name, {})
+        key = "rows_per_second" if "rows_per_second" in stats else "lines_per_second"
+        lines.append(f"  ingest {name:<28} {old_stats.get(key)!s:>12} -> {stats.get(key)!s:>12} /s  {change(old_stats.get(key), stats.get(key))}")
+    for name, stats in current.get("queries", {}).items():
+        old_stats = baseline.get("queries", {}).get(name, {})
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            lines.append(f"  query  {name:<28} {key:<6} {old_stats.get(key)!s:>10} -> {stats.get(key)!s:>10} ms  {change(old_stats.get(key), stats.get(key))}")
+    old_size = baseline.get("database", {}).get("size_bytes")
+    new_size = current.get("database", {}).get("size_bytes")
+    lines.append(f"  database size {old_size} -> {new_size} bytes  {change(old_size, new_size)}")
+    return lines
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="pyLog end-to-end benchmark")
+    argument_parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="rows in the benchmark database (1M-50M)")
+    argument_parser.add_argument("--iterations", type=int, default=DEFAULT_QUERY_ITERATIONS, help="timed runs per query")
+    argument_parser.add_argument("--workers", type=int, default=None, help="bulk import processes (default: CPU count)")
+    argument_parser.add_argument("--work-dir", default=BENCHMARK_WORK_DIRECTORY)
+    argument_parser.add_argument("--reuse", action="store_true", help="reuse an existing database of the same size")
+    argument_parser.add_argument("--compare", metavar="RESULT_JSON", help="print the change against an earlier result")
+    arguments = argument_parser.parse_args()
+
+    benchmark_result = run_benchmark(arguments.rows, arguments.work_dir, arguments.iterations, arguments.workers, arguments.reuse)
+    result_path = save_result(benchmark_result)
+    benchmark_logger.info(f"Results saved to '{result_path}'.")
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as f_in:
+            print("\n".join(compare_results(json.load(f_in), benchmark_result)))
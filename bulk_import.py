@@ -0,0 +1,277 @@
+import os
+import sys
+import gzip
+import json
+import mmap
+import multiprocessing
+import sqlite3
+import logging
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import db_manager
+import db_migrations
+import raw_log_codec
+from jsonl_sink import rotated_segment_paths
+
+# Parallel backfill of large JSONL archives. The parent splits each file into
+# newline-aligned byte ranges, worker processes parse them into LOG_INSERT_SQL
+# rows, and the parent inserts the chunks in file order, so ids, duplicate
+# handling (first cursor wins) and rows match import_jsonl_to_sqlite.
+
+BULK_CHUNK_BYTES = 8 * 1024 * 1024
+# Parsed chunks waiting for the writer, per worker; bounds memory use.
+BULK_PENDING_CHUNKS_PER_WORKER = 2
+BULK_PROGRESS_INTERVAL_SECONDS = 5
+
+bulk_logger = logging.getLogger(__name__)
+if not bulk_logger.handlers:
+    bulk_handler = logging.StreamHandler()
+    bulk_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    bulk_handler.setFormatter(bulk_formatter)
+    bulk_logger.addHandler(bulk_handler)
+    bulk_logger.setLevel(logging.INFO)
+
+_worker_codec = None
+
+def init_worker(dictionaries, lock_fd=None):
+    global _worker_codec
+    _worker_codec = raw_log_codec.RawLogCodec(dictionaries)
+    if lock_fd is not None:
+        # A forked worker shares the parent's bulk import lock; closing its copy
+        # lets the lock go with the parent even if orphaned workers linger.
+        os.close(lock_fd)
+
+def parse_chunk(task):
+    """Worker: parses one chunk into rows. Returns (rows, lines, failed, task)."""
+    file_path, start, end, data = task
+    if data is None:
+        with open(file_path, 'rb') as f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = mapped[start:end]
+
+    rows = []
+    line_count = 0
+    failed_count = 0
+    line_offset = start
+    for line_bytes in data.split(b'\n')[:-1]:
+        line_count += 1
+        stripped_line = line_bytes.decode('utf-8', errors='replace').strip()
+        if stripped_line:
+            try:
+                rows.append(db_manager.build_log_row(json.loads(stripped_line), codec=_worker_codec))
+            except json.JSONDecodeError as je:
+                bulk_logger.warning(f"Skipping line at byte {line_offset} in {file_path} due to JSON decode error: {je}. Line: {stripped_line[:200]}")
+                failed_count += 1
+            except Exception as e:
+                bulk_logger.error(f"Skipping line at byte {line_offset} in {file_path} due to unexpected error: {e}. Line: {stripped_line[:200]}")
+                failed_count += 1
+        line_offset += len(line_bytes) + 1
+    return rows, line_count, failed_count, (file_path, start, end, None)
+
+def iter_chunk_tasks(file_path, start_offset=0):
+    """Yields (file_path, start, end, data) tasks covering whole lines.
+
+    Plain files are mmapped and only the byte range is sent to the worker;
+    gzipped segments are decompressed here and the data is sent along. An
+    incomplete trailing line is left out, as in the serial import.
+    """
+    if file_path.endswith('.gz'):
+        with gzip.open(file_path, 'rb') as f_in:
+            carry = b''
+            position = 0
+            while True:
+                block = f_in.read(BULK_CHUNK_BYTES)
+                if not block:
+                    break
+                data = carry + block
+                cut = data.rfind(b'\n') + 1
+                if cut:
+                    yield file_path, position, position + cut, data[:cut]
+                    position += cut
+                carry = data[cut:]
+        return
+
+    with open(file_path, 'rb') as f_in:
+        size = os.fstat(f_in.fileno()).st_size
+        if size <= start_offset:
+            return
+        with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start_offset
+            while position < size:
+                newline = mapped.find(b'\n', min(position + BULK_CHUNK_BYTES, size) - 1)
+                if newline == -1:
+                    break
+                yield file_path, position, newline + 1, None
+                position = newline + 1
+
+def sample_log_entries(file_paths, sample_rows=raw_log_codec.DICTIONARY_SAMPLE_ROWS):
+    """(entry, columns) pairs from the first lines of the input, for dictionary training."""
+    samples = []
+    for file_path in file_paths:
+        opener = gzip.open if file_path.endswith('.gz') else open
+        with opener(file_path, 'rb') as f_in:
+            for line_bytes in f_in:
+                try:
+                    log_data = json.loads(line_bytes)
+                except ValueError:
+                    continue
+                if isinstance(log_data, dict):
+                    samples.append((log_data, db_manager.build_log_columns(log_data)))
+                if len(samples) >= sample_rows:
+                    return samples
+    return samples
+
+def prepare_raw_log_codec(conn, db_path, file_paths):
+    """Makes sure a compression dictionary exists before the workers copy it.
+
+    The serial import trains one after its first batch; here it is trained up
+    front, from existing rows or else from the head of the input.
+    """
+    codec = db_manager.get_raw_log_codec(conn, db_path)
+    if codec.active_dictionary_id == raw_log_codec.NO_DICTIONARY_ID:
+        with conn:
+            codec.reload(conn)
+            if codec.active_dictionary_id == raw_log_codec.NO_DICTIONARY_ID:
+                dictionary_id = codec.train_from_logs(conn)
+                if dictionary_id is None:
+                    dictionary_id = codec.train_from_entries(conn, sample_log_entries(file_paths))
+                if dictionary_id is not None:
+                    bulk_logger.info(f"Trained raw_log compression dictionary {dictionary_id}.")
+    return codec
+
+def defer_indexes(conn):
+    """Drops the secondary indexes and the full-text insert trigger.
+
+    Records the highest existing id in deferred_indexes (an earlier, interrupted
+    import's mark is kept); rows above it get their full-text entries in
+    restore_indexes. Readers see slower queries until then. If the process
+    dies first, setup_database or the next import restores them.
+    """
+    with conn:
+        for index_name, _ in db_migrations.QUERY_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        conn.execute("DROP TRIGGER IF EXISTS logs_fts_after_insert")
+        conn.execute("INSERT OR IGNORE INTO deferred_indexes (id, last_indexed_id, deferred_at) "
+                     "SELECT 1, COALESCE(MAX(id), 0), ? FROM logs", (time.time(),))
+        return conn.execute("SELECT last_indexed_id FROM deferred_indexes WHERE id = 1").fetchone()[0]
+
+def restore_indexes(conn):
+    started = time.monotonic()
+    with conn:
+        restored = db_migrations.restore_deferred_indexes(conn)
+    if restored:
+        bulk_logger.info(f"Rebuilt deferred indexes in {time.monotonic() - started:.1f}s.")
+
+def insert_chunk(conn, rows, checkpoint):
+    """Inserts one parsed chunk in a transaction. Returns (inserted, failed)."""
+    try:
+        with conn:
+            inserted = conn.executemany(db_manager.LOG_INSERT_SQL, rows).rowcount
+            if checkpoint:
+                db_manager.save_import_checkpoint(conn, *checkpoint)
+        return inserted, 0
+    except sqlite3.Error as e:
+        bulk_logger.warning(f"Chunk insert failed ({e}). Retrying {len(rows)} row(s) one by one.")
+    inserted = 0
+    failed = 0
+    with conn:
+        for row in rows:
+            try:
+                inserted += conn.execute(db_manager.LOG_INSERT_SQL, row).rowcount
+            except sqlite3.Error as row_error:
+                bulk_logger.warning(f"Skipping row due to DB insert error: {row_error}")
+                failed += 1
+        if checkpoint:
+            db_manager.save_import_checkpoint(conn, *checkpoint)
+    return inserted, failed
+
+def bulk_import_jsonl(file_paths, db_path=db_manager.DATABASE_NAME, workers=None, resume=True, deferred_indexes=True):
+    """Imports JSONL files (plain or .gz) with a process pool. Returns a stats dict.
+
+    Plain files share import_jsonl_to_sqlite's checkpoints, so either importer
+    continues where the other stopped. With deferred_indexes, the secondary
+    and full-text indexes are brought up to date once at the end.
+    """
+    file_paths = [file_path for file_path in file_paths if os.path.exists(file_path)]
+    workers = workers or os.cpu_count() or 1
+    stats = {"files": 0, "lines": 0, "bytes": 0, "inserted": 0, "already_present": 0, "failed": 0}
+    if not file_paths:
+        bulk_logger.error("No JSONL files to import.")
+        return stats
+
+    # Held for the whole import: setup_database only repairs deferred indexes
+    # when no import holds it.
+    lock_file = db_manager.acquire_bulk_import_lock(db_path)
+    if lock_file is None:
+        bulk_logger.error(f"Another bulk import into '{db_path}' is running.")
+        return stats
+    db_manager.setup_database(db_path)
+    conn = sqlite3.connect(db_path, timeout=db_manager.INGEST_BUSY_TIMEOUT_SECONDS)
+    db_manager.configure_ingest_connection(conn)
+    started = time.monotonic()
+    last_progress = started
+    try:
+        codec = prepare_raw_log_codec(conn, db_path, file_paths)
+        # Templates are mined here in the parent, in file order, so every
+        # chunk shares one parse tree.
+        miner = db_manager.get_template_miner(conn, db_path) if db_manager.MINE_LOG_TEMPLATES else None
+        if deferred_indexes:
+            defer_indexes(conn)
+
+        inherited_lock_fd = lock_file.fileno() if multiprocessing.get_start_method() == "fork" else None
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(codec.dictionaries, inherited_lock_fd)) as executor:
+            for file_path in file_paths:
+                with open(file_path, 'rb') as f_in:
+                    is_plain = not file_path.endswith('.gz')
+                    start_offset = db_manager.load_import_checkpoint(conn, file_path, f_in) if resume and is_plain else 0
+                    bulk_logger.info(f"Bulk importing '{file_path}' (byte offset {start_offset}) with {workers} worker(s).")
+
+                    pending = deque()
+                    tasks = iter_chunk_tasks(file_path, start_offset)
+                    while True:
+                        for task in tasks:
+                            pending.append(executor.submit(parse_chunk, task))
+                            if len(pending) >= workers * BULK_PENDING_CHUNKS_PER_WORKER:
+                                break
+                        if not pending:
+                            break
+
+                        rows, line_count, failed_count, (_, start, end, _) = pending.popleft().result()
+                        checkpoint = (file_path, f_in, end) if is_plain else None
+                        row_count = len(rows)
+                        if miner is not None:
+                            rows = db_manager.drop_stored_rows(conn, rows)
+                            rows = db_manager.assign_template_ids(rows, miner, lambda: conn)
+                        inserted, insert_failed = insert_chunk(conn, rows, checkpoint)
+                        stats["lines"] += line_count
+                        stats["bytes"] += end - start
+                        stats["inserted"] += inserted
+                        stats["failed"] += failed_count + insert_failed
+                        stats["already_present"] += row_count - inserted - insert_failed
+
+                        now = time.monotonic()
+                        if now - last_progress >= BULK_PROGRESS_INTERVAL_SECONDS:
+                            elapsed = now - started
+                            bulk_logger.info(f"Processed {stats['lines']} lines ({stats['lines'] / elapsed:.0f} lines/s, "
+                                             f"{stats['bytes'] / elapsed / 1e6:.1f} MB/s). Inserted: {stats['inserted']}, "
+                                             f"Already present: {stats['already_present']}, Failed: {stats['failed']}.")
+                            last_progress = now
+                stats["files"] += 1
+    finally:
+        # Also finishes what an interrupted earlier import deferred.
+        restore_indexes(conn)
+        conn.close()
+        lock_file.close()
+
+    elapsed = time.monotonic() - started
+    stats["seconds"] = round(elapsed, 3)
+    bulk_logger.info(f"Bulk import finished in {elapsed:.1f}s ({stats['lines'] / max(elapsed, 1e-9):.0f} lines/s, "
+                     f"{stats['bytes'] / max(elapsed, 1e-9) / 1e6:.1f} MB/s). {stats}")
+    return stats
+
+if __name__ == "__main__":
+    import_paths = sys.argv[1:] or rotated_segment_paths(db_manager.OUTPUT_LOG_FILE_FOR_IMPORT) + [db_manager.OUTPUT_LOG_FILE_FOR_IMPORT]
+    bulk_import_jsonl(import_paths)
@@ -2,19 +2,64 @@ import subprocess
 import json
 import logging
 import os
+import queue
+import signal
+import threading
 import time
 
 from datetime import datetime, timezone
 
+import db_manager
+import journal_spool
+import maintenance
+import metrics
+import watchlist
+
+from jsonl_sink import JsonlSink, FSYNC_ON_ROTATE
+
 JOURNALCTL_INITIAL_SINCE = "5 minutes ago"
 JOURNALCTL_POLL_INTERVAL_SECONDS = 5
 JOURNALCTL_OUTPUT_FORMAT = "json"
 JOURNALCTL_COMMAND_TIMEOUT = 30
+JOURNALCTL_BINARY = "journalctl"
+
+# Follow mode keeps one `journalctl --follow` process alive and consumes its
+# stdout line by line instead of forking a new journalctl every poll.
+JOURNALCTL_FOLLOW_MODE = True
+JOURNALCTL_FOLLOW_BATCH_SIZE = 500
+JOURNALCTL_FOLLOW_BATCH_WAIT_SECONDS = 0.05
+JOURNALCTL_FOLLOW_QUEUE_SIZE = 5000
+JOURNALCTL_RESTART_BACKOFF_SECONDS = 1
+JOURNALCTL_MAX_RESTART_BACKOFF_SECONDS = 30
+JOURNAL_CURSOR_FILE = "journal_cursor.state"
+
+# Reading and storing run in separate threads joined by a durable spool (see
+# journal_spool.py): a slow or locked database no longer stalls journalctl,
+# and the journal cursor is only acknowledged once its batch is committed.
+SPOOL_JOURNAL_ENTRIES = True
+SPOOL_DIRECTORY = "journal_spool"
+STORAGE_BATCH_SIZE = 500
+STORAGE_RETRY_BACKOFF_SECONDS = 1
+STORAGE_MAX_RETRY_BACKOFF_SECONDS = 30
 
 STORE_LOGS_TO_FILE = True
 OUTPUT_LOG_FILE = "collected_journal_logs.jsonl"
-
-DATABASE_NAME = "logs_db.db"
+OUTPUT_FLUSH_MAX_BYTES = 256 * 1024
+OUTPUT_FLUSH_INTERVAL_SECONDS = 1.0
+OUTPUT_FSYNC_POLICY = FSYNC_ON_ROTATE # "never", "flush" or "rotate"
+OUTPUT_ROTATE_MAX_BYTES = 256 * 1024 * 1024
+OUTPUT_ROTATE_INTERVAL_SECONDS = 24 * 3600
+OUTPUT_COMPRESS_ROTATED = True
+
+STORE_LOGS_TO_DATABASE = True
+# Retention, rollup downsampling and incremental vacuum (see maintenance.py).
+RUN_MAINTENANCE_IN_BACKGROUND = True
+DATABASE_NAME = db_manager.DATABASE_NAME
+# Prometheus /metrics for this process (the web app serves its own); None disables.
+COLLECTOR_METRICS_PORT = 9465
+COLLECTOR_METRICS_HOST = "127.0.0.1"
+# Evaluate watchlist rules on every batch (see watchlist.py).
+EVALUATE_WATCHLIST = True
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,10 +68,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+entries_read_total = metrics.counter("pylog_collector_entries_total", "Journal entries read by the collector.")
+invalid_lines_total = metrics.counter("pylog_collector_invalid_lines_total", "journalctl output lines that were not valid JSON.")
+batch_entries = metrics.histogram(
+    "pylog_collector_batch_entries", "Journal entries per poll (or per follow-mode batch).", buckets=metrics.SIZE_BUCKETS)
+ingest_lag_seconds = metrics.histogram(
+    "pylog_collector_ingest_lag_seconds", "Time from an entry's __REALTIME_TIMESTAMP until the collector read it.",
+    buckets=metrics.LAG_BUCKETS_SECONDS)
+
 def check_journalctl_availability():
     try:
         process = subprocess.run(
-            ['journalctl', '--version'],
+            [JOURNALCTL_BINARY, '--version'],
             check=True,
             capture_output=True,
             text=True,
@@ -47,25 +100,125 @@ def check_journalctl_availability():
         logger.error(f"An unexpected error occurred while checking journalctl availability: {e}", exc_info=True)
         return False
 
-def write_log_entry_to_file(log_entry_dict):
+output_sink = None
+
+def get_output_sink():
+    global output_sink
     if not STORE_LOGS_TO_FILE or not OUTPUT_LOG_FILE:
+        return None
+    if output_sink is None:
+        output_sink = JsonlSink(
+            OUTPUT_LOG_FILE,
+            flush_max_bytes=OUTPUT_FLUSH_MAX_BYTES,
+            flush_interval=OUTPUT_FLUSH_INTERVAL_SECONDS,
+            fsync_policy=OUTPUT_FSYNC_POLICY,
+            rotate_max_bytes=OUTPUT_ROTATE_MAX_BYTES,
+            rotate_interval=OUTPUT_ROTATE_INTERVAL_SECONDS,
+            compress_rotated=OUTPUT_COMPRESS_ROTATED
+        )
+    return output_sink
+
+def close_output_sink():
+    global output_sink
+    if output_sink is not None:
+        try:
+            output_sink.close()
+        except Exception as e:
+            logger.error(f"Error closing output sink for {OUTPUT_LOG_FILE}: {e}", exc_info=True)
+        output_sink = None
+
+database_writer = None
+
+def get_database_writer():
+    global database_writer
+    if not STORE_LOGS_TO_DATABASE or not DATABASE_NAME:
+        return None
+    if database_writer is None:
+        database_writer = db_manager.create_batch_writer(DATABASE_NAME)
+    return database_writer
+
+def close_database_writer():
+    global database_writer
+    if database_writer is not None:
+        database_writer.close()
+        database_writer = None
+
+def write_log_batch_to_database(log_entries):
+    """Raises if the write fails, so that the caller keeps its previous cursor."""
+    if not log_entries:
+        return
+
+    try:
+        writer = get_database_writer()
+        if writer:
+            writer.write_batch(log_entries)
+    except Exception as e:
+        logger.error(f"Failed to store {len(log_entries)} log entries in database {DATABASE_NAME}: {e}", exc_info=True)
+        raise
+
+watchlist_engine = None
+
+def evaluate_watchlist(log_entries):
+    global watchlist_engine
+    if not EVALUATE_WATCHLIST or not log_entries:
+        return
+    try:
+        if watchlist_engine is None:
+            watchlist_engine = watchlist.WatchlistEngine()
+        watchlist_engine.evaluate_batch(log_entries)
+    except Exception as e:
+        logger.error(f"Failed to evaluate watchlist rules for {len(log_entries)} log entries: {e}", exc_info=True)
+
+def write_log_batch_to_file(log_entries):
+    if not log_entries:
         return
 
     try:
-        with open(OUTPUT_LOG_FILE, 'a', encoding='utf-8') as f_out:
-            json.dump(log_entry_dict, f_out, ensure_ascii=False)
-            f_out.write('\n')
+        sink = get_output_sink()
+        if sink:
+            sink.write_batch(log_entries)
     except IOError as ioe:
-        logger.error(f"Failed to write log entry to {OUTPUT_LOG_FILE}: {ioe}")
+        logger.error(f"Failed to write {len(log_entries)} log entries to {OUTPUT_LOG_FILE}: {ioe}")
     except Exception as e:
-        logger.error(f"Unexpected error writing log entry to {OUTPUT_LOG_FILE}: {e}", exc_info=True)
+        logger.error(f"Unexpected error writing log entries to {OUTPUT_LOG_FILE}: {e}", exc_info=True)
 
-def fetch_journal_logs(current_cursor=None):
-    logger.debug(f"Fetching journal logs. Current cursor: {current_cursor}")
-    new_logs_found_in_journal = False
-    next_cursor_to_return = current_cursor
+def write_log_entry_to_file(log_entry_dict):
+    write_log_batch_to_file([log_entry_dict])
+
+def flush_output_if_idle():
+    if output_sink is not None:
+        try:
+            output_sink.maybe_flush()
+        except Exception as e:
+            logger.error(f"Error flushing output sink for {OUTPUT_LOG_FILE}: {e}", exc_info=True)
+
+def load_journal_cursor():
+    if not JOURNAL_CURSOR_FILE or not os.path.exists(JOURNAL_CURSOR_FILE):
+        return None
+    try:
+        with open(JOURNAL_CURSOR_FILE, 'r', encoding='utf-8') as f_in:
+            cursor = f_in.read().strip()
+        return cursor or None
+    except IOError as ioe:
+        logger.error(f"Failed to read journal cursor from {JOURNAL_CURSOR_FILE}: {ioe}")
+        return None
+
+def save_journal_cursor(cursor):
+    if not JOURNAL_CURSOR_FILE or not cursor:
+        return
 
-    cmd_command = ['journalctl', '--no-pager', '-o', JOURNALCTL_OUTPUT_FORMAT]
+    temp_path = f"{JOURNAL_CURSOR_FILE}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f_out:
+            f_out.write(cursor)
+        os.replace(temp_path, JOURNAL_CURSOR_FILE)
+    except IOError as ioe:
+        logger.error(f"Failed to persist journal cursor to {JOURNAL_CURSOR_FILE}: {ioe}")
+
+def build_journalctl_command(current_cursor=None, follow=False):
+    cmd_command = [JOURNALCTL_BINARY, '--no-pager', '-o', JOURNALCTL_OUTPUT_FORMAT]
+    if follow:
+        cmd_command.append('--follow')
     if current_cursor:
         cmd_command.extend(['--after-cursor', current_cursor])
     elif JOURNALCTL_INITIAL_SINCE:
@@ -73,6 +226,149 @@ def fetch_journal_logs(current_cursor=None):
         logger.info(f"No cursor. Fetching logs since '{JOURNALCTL_INITIAL_SINCE}'.")
     else:
         logger.info("No cursor and no initial 'since' period. Fetching most recent logs.")
+    return cmd_command
+
+def is_invalid_cursor_error(stderr_output):
+    return "Invalid cursor" in stderr_output or "Cannot seek to cursor" in stderr_output
+
+def parse_journal_lines(lines):
+    """Returns (parsed entries, last __CURSOR among them, whether any line was non-empty)."""
+    new_logs_found_in_journal = False
+    last_valid_cursor_in_batch = None
+    parsed_entries = []
+    # Echoing every entry costs more than parsing it, so it is DEBUG-only.
+    log_each_entry = logger.isEnabledFor(logging.DEBUG)
+    read_at = time.time()
+
+    for line_number, line_text in enumerate(lines):
+        if not line_text.strip():
+            continue
+        new_logs_found_in_journal = True
+        try:
+            log_entry = json.loads(line_text)
+            timestamp_usec_str = log_entry.get("__REALTIME_TIMESTAMP")
+            timestamp_sec_float = None
+            if timestamp_usec_str:
+                try:
+                    timestamp_sec_float = int(timestamp_usec_str) / 1_000_000
+                    ingest_lag_seconds.observe(max(0.0, read_at - timestamp_sec_float))
+                except (ValueError, TypeError):
+                    logger.warning(f"Could not parse timestamp: {timestamp_usec_str} for line: {line_text[:100]}...")
+
+            if log_each_entry:
+                msg = log_entry.get("MESSAGE", "")
+                identifier = log_entry.get("SYSLOG_IDENTIFIER", log_entry.get("_COMM", "unknown_process"))
+                dt_obj_str = "NO_TIMESTAMP"
+                if timestamp_sec_float is not None:
+                    try:
+                        # 'datetime' artık doğru şekilde datetime.datetime sınıfına işaret ediyor
+                        dt_obj_utc = datetime.fromtimestamp(timestamp_sec_float, timezone.utc)
+                        dt_obj_local = dt_obj_utc.astimezone()
+                        dt_obj_str = dt_obj_local.strftime('%Y-%m-%d %H:%M:%S %Z')
+                    except (ValueError, OverflowError, OSError):
+                        pass
+                logger.debug(f"[JOURNAL_LOG][{dt_obj_str}][{identifier}] {msg}")
+
+            parsed_entries.append(log_entry)
+
+            if "__CURSOR" in log_entry:
+                last_valid_cursor_in_batch = log_entry["__CURSOR"]
+            else:
+                logger.warning(f"Log entry missing '__CURSOR' field: {line_text[:200]}...")
+
+        except json.JSONDecodeError as je:
+            invalid_lines_total.inc()
+            logger.warning(f"Journal log line not JSON or corrupt (line {line_number+1}): {line_text[:200]}... - Error: {je}")
+        except Exception as e:
+            logger.warning(f"Error processing journal log line (line {line_number+1}): {line_text[:200]}... - Error: {e}", exc_info=True)
+
+    entries_read_total.inc(len(parsed_entries))
+    batch_entries.observe(len(parsed_entries))
+    return parsed_entries, last_valid_cursor_in_batch, new_logs_found_in_journal
+
+def process_journal_lines(lines, current_cursor=None):
+    """Stores a batch inline; raises (before the cursor moves) if the database write fails."""
+    next_cursor_to_return = current_cursor
+    parsed_entries, last_valid_cursor_in_batch, new_logs_found_in_journal = parse_journal_lines(lines)
+
+    write_log_batch_to_database(parsed_entries)
+    write_log_batch_to_file(parsed_entries)
+    evaluate_watchlist(parsed_entries)
+
+    if last_valid_cursor_in_batch:
+        next_cursor_to_return = last_valid_cursor_in_batch
+        logger.debug(f"New journal cursor SET: {next_cursor_to_return}")
+    elif new_logs_found_in_journal:
+        logger.warning("Logs processed, but no new cursor obtained from this batch.")
+
+    return new_logs_found_in_journal, next_cursor_to_return
+
+entry_spool = None
+
+def deliver_journal_lines(lines, current_cursor=None):
+    """Hands read lines to storage: through the spool when it is open, inline otherwise.
+
+    Returns (new logs found, cursor to continue reading from).
+    """
+    if entry_spool is None:
+        return process_journal_lines(lines, current_cursor)
+    return bool(lines), entry_spool.append(lines) or current_cursor
+
+def store_spooled_lines(lines, replayed=False):
+    """Stores one spooled batch and returns its last cursor.
+
+    Raises if the database write fails, so that the batch is retried. For a
+    replayed batch, entries whose cursor is already in the database were
+    stored by the previous run and are skipped entirely, so they are not
+    archived or alerted on twice.
+    """
+    parsed_entries, last_valid_cursor_in_batch, _ = parse_journal_lines(lines)
+    writer = get_database_writer()
+    if writer and parsed_entries and replayed:
+        stored_cursors = db_manager.find_stored_journal_cursors(parsed_entries)
+        if stored_cursors:
+            logger.info(f"Skipping {len(stored_cursors)} replayed spool entries that are already stored.")
+            parsed_entries = [entry for entry in parsed_entries if entry.get("__CURSOR") not in stored_cursors]
+    if writer and parsed_entries:
+        writer.write_batch(parsed_entries)
+    write_log_batch_to_file(parsed_entries)
+    evaluate_watchlist(parsed_entries)
+    return last_valid_cursor_in_batch
+
+def storage_loop(spool, stop_event):
+    retry_backoff = STORAGE_RETRY_BACKOFF_SECONDS
+    while not stop_event.is_set():
+        batch = spool.read_batch(STORAGE_BATCH_SIZE, timeout=0.5)
+        if batch is None:
+            flush_output_if_idle()
+            continue
+
+        while True:
+            try:
+                cursor = store_spooled_lines(batch.lines, batch.replayed)
+                break
+            except Exception as e:
+                logger.error(f"Failed to store {len(batch.lines)} spooled journal entries; retrying in {retry_backoff} second(s): {e}")
+                if stop_event.wait(retry_backoff):
+                    return # Not acknowledged, so it is replayed from the spool on the next start.
+                retry_backoff = min(retry_backoff * 2, STORAGE_MAX_RETRY_BACKOFF_SECONDS)
+        retry_backoff = STORAGE_RETRY_BACKOFF_SECONDS
+
+        try:
+            spool.ack(batch, cursor)
+        except OSError as e:
+            # The batch is replayed after a restart; the database ignores cursors it already has.
+            logger.error(f"Failed to acknowledge a stored spool batch: {e}")
+            continue
+        if cursor:
+            save_journal_cursor(cursor)
+
+def fetch_journal_logs(current_cursor=None):
+    logger.debug(f"Fetching journal logs. Current cursor: {current_cursor}")
+    new_logs_found_in_journal = False
+    next_cursor_to_return = current_cursor
+
+    cmd_command = build_journalctl_command(current_cursor)
 
     try:
         logger.debug(f"Executing command: {' '.join(cmd_command)}")
@@ -84,7 +380,7 @@ def fetch_journal_logs(current_cursor=None):
         if process.returncode != 0:
             stderr_output = process.stderr.strip()
             logger.error(f"journalctl command failed (Code {process.returncode}): {stderr_output}")
-            if "Invalid cursor" in stderr_output or "Cannot seek to cursor" in stderr_output:
+            if is_invalid_cursor_error(stderr_output):
                 logger.warning("Journal cursor was invalid. Resetting to None.")
                 next_cursor_to_return = None
             return False, next_cursor_to_return
@@ -93,47 +389,8 @@ def fetch_journal_logs(current_cursor=None):
         if stdout_output:
             lines = [line for line in stdout_output.split('\n') if line.strip()]
             if lines:
-                new_logs_found_in_journal = True
-                last_valid_cursor_in_batch = None
                 logger.debug(f"Received {len(lines)} new log line(s) from journalctl.")
-
-                for line_number, line_text in enumerate(lines):
-                    try:
-                        log_entry = json.loads(line_text)
-                        msg = log_entry.get("MESSAGE", "")
-                        identifier = log_entry.get("SYSLOG_IDENTIFIER", log_entry.get("_COMM", "unknown_process"))
-                        timestamp_usec_str = log_entry.get("__REALTIME_TIMESTAMP")
-                        dt_obj_str = "NO_TIMESTAMP"
-
-                        if timestamp_usec_str:
-                            try:
-                                timestamp_sec_float = int(timestamp_usec_str) / 1_000_000
-                                # 'datetime' artık doğru şekilde datetime.datetime sınıfına işaret ediyor
-                                dt_obj_utc = datetime.fromtimestamp(timestamp_sec_float, timezone.utc)
-                                dt_obj_local = dt_obj_utc.astimezone()
-                                dt_obj_str = dt_obj_local.strftime('%Y-%m-%d %H:%M:%S %Z')
-                            except (ValueError, OverflowError, TypeError):
-                                logger.warning(f"Could not parse timestamp: {timestamp_usec_str} for line: {line_text[:100]}...")
-
-                        logger.info(f"[JOURNAL_LOG][{dt_obj_str}][{identifier}] {msg}")
-
-                        write_log_entry_to_file(log_entry) # Existing call
-
-                        if "__CURSOR" in log_entry:
-                            last_valid_cursor_in_batch = log_entry["__CURSOR"]
-                        else:
-                            logger.warning(f"Log entry missing '__CURSOR' field: {line_text[:200]}...")
-
-                    except json.JSONDecodeError as je:
-                        logger.warning(f"Journal log line not JSON or corrupt (line {line_number+1}): {line_text[:200]}... - Error: {je}")
-                    except Exception as e:
-                        logger.warning(f"Error processing journal log line (line {line_number+1}): {line_text[:200]}... - Error: {e}", exc_info=True)
-
-                if last_valid_cursor_in_batch:
-                    next_cursor_to_return = last_valid_cursor_in_batch
-                    logger.debug(f"New journal cursor SET: {next_cursor_to_return}")
-                elif new_logs_found_in_journal:
-                    logger.warning("Logs processed, but no new cursor obtained from this batch.")
+                new_logs_found_in_journal, next_cursor_to_return = deliver_journal_lines(lines, current_cursor)
             else:
                 logger.debug("No new log lines found in journalctl output (after stripping/splitting).")
         else:
@@ -152,7 +409,178 @@ def fetch_journal_logs(current_cursor=None):
     logger.debug(f"fetch_journal_logs completed. New logs: {new_logs_found_in_journal}. Next cursor: {next_cursor_to_return}")
     return new_logs_found_in_journal, next_cursor_to_return
 
+class JournalFollower:
+    """Owns a long-lived `journalctl --follow` process.
+
+    A reader thread pushes stdout lines into a bounded queue, so a burst of
+    entries blocks journalctl on its pipe instead of growing our memory.
+    When the process exits, a sentinel is queued behind the last line it
+    produced; the consumer then restarts it from the cursor it has processed.
+    """
+
+    _PROCESS_EXITED = object()
+
+    def __init__(self, queue_size=JOURNALCTL_FOLLOW_QUEUE_SIZE):
+        self.process = None
+        self.lines = queue.Queue(maxsize=queue_size)
+        self.reader_thread = None
+        self.stopping = threading.Event()
+
+    def start(self, current_cursor=None):
+        cmd_command = build_journalctl_command(current_cursor, follow=True)
+        logger.info(f"Starting journal follower: {' '.join(cmd_command)}")
+        self.stopping.clear()
+        # Each process gets its own queue, so nothing a stopped one read is delivered after a restart.
+        self.lines = queue.Queue(maxsize=self.lines.maxsize)
+        self.process = subprocess.Popen(
+            cmd_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='replace'
+        )
+        self.reader_thread = threading.Thread(
+            target=self._read_stdout, args=(self.process, self.lines),
+            name="journalctl-follow-reader", daemon=True
+        )
+        self.reader_thread.start()
+
+    def _read_stdout(self, process, lines):
+        try:
+            for line_text in process.stdout:
+                if self.stopping.is_set():
+                    break
+                self._put(lines, line_text)
+        except (ValueError, OSError) as e:
+            if not self.stopping.is_set():
+                logger.error(f"Error reading journalctl output: {e}")
+        finally:
+            self._put(lines, self._PROCESS_EXITED)
+
+    def _put(self, lines, item):
+        while not self.stopping.is_set():
+            try:
+                lines.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def read_batch(self, max_entries=JOURNALCTL_FOLLOW_BATCH_SIZE, timeout=JOURNALCTL_POLL_INTERVAL_SECONDS):
+        """Returns (lines, process_exited) with at most max_entries lines.
+
+        Blocks up to `timeout` for the first line, then gathers whatever else
+        arrives within JOURNALCTL_FOLLOW_BATCH_WAIT_SECONDS.
+        """
+        batch = []
+        try:
+            item = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return batch, False
+
+        deadline = time.monotonic() + JOURNALCTL_FOLLOW_BATCH_WAIT_SECONDS
+        while True:
+            if item is self._PROCESS_EXITED:
+                return batch, True
+            batch.append(item)
+            if len(batch) >= max_entries:
+                return batch, False
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.lines.get(timeout=remaining) if remaining > 0 else self.lines.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def exit_status(self):
+        """Reaps the exited process and returns (returncode, stderr_output)."""
+        if not self.process:
+            return None, ""
+        stderr_output = ""
+        try:
+            stderr_output = self.process.stderr.read().strip()
+        except (ValueError, OSError):
+            pass
+        returncode = self.process.wait()
+        self.process.stdout.close()
+        self.process.stderr.close()
+        self.process = None
+        return returncode, stderr_output
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        process = self.process
+        if process and process.poll() is None:
+            logger.info("Stopping journal follower process.")
+            process.terminate()
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning("journalctl did not exit after SIGTERM. Killing it.")
+                process.kill()
+                process.wait()
+        if self.reader_thread:
+            self.reader_thread.join(timeout=timeout)
+            self.reader_thread = None
+        if process:
+            for stream in (process.stdout, process.stderr):
+                try:
+                    stream.close()
+                except (ValueError, OSError):
+                    pass
+        self.process = None
+
+def follow_journal_logs(current_cursor=None, stop_event=None):
+    stop_event = stop_event or threading.Event()
+    follower = JournalFollower()
+    restart_backoff = JOURNALCTL_RESTART_BACKOFF_SECONDS
+
+    try:
+        follower.start(current_cursor)
+        while not stop_event.is_set():
+            lines, process_exited = follower.read_batch(timeout=0.5)
+            flush_output_if_idle()
+            if lines:
+                logger.debug(f"Received {len(lines)} new log line(s) from journal follower.")
+                try:
+                    logs_found, new_cursor = deliver_journal_lines(lines, current_cursor)
+                except Exception as e:
+                    # Later entries must not be stored past a failed batch: re-read
+                    # from the last stored cursor instead.
+                    logger.error(f"Failed to store {len(lines)} journal entries ({e}). Re-reading them from "
+                                 f"cursor {current_cursor} in {restart_backoff} second(s).")
+                    follower.stop()
+                    if stop_event.wait(restart_backoff):
+                        break
+                    restart_backoff = min(restart_backoff * 2, JOURNALCTL_MAX_RESTART_BACKOFF_SECONDS)
+                    follower.start(current_cursor)
+                    continue
+                if new_cursor and new_cursor != current_cursor:
+                    current_cursor = new_cursor
+                    if entry_spool is None: # Otherwise saved once the batch is stored.
+                        save_journal_cursor(current_cursor)
+                    restart_backoff = JOURNALCTL_RESTART_BACKOFF_SECONDS
+
+            if not process_exited:
+                continue
+
+            returncode, stderr_output = follower.exit_status()
+            if stop_event.is_set():
+                break
+            logger.error(f"journalctl follower exited (Code {returncode}): {stderr_output}")
+            if is_invalid_cursor_error(stderr_output):
+                logger.warning("Journal cursor was invalid. Resetting to None.")
+                current_cursor = None
+
+            logger.info(f"Restarting journal follower in {restart_backoff} second(s) from cursor: {current_cursor}")
+            if stop_event.wait(restart_backoff):
+                break
+            restart_backoff = min(restart_backoff * 2, JOURNALCTL_MAX_RESTART_BACKOFF_SECONDS)
+            follower.start(current_cursor)
+    except FileNotFoundError:
+        logger.error("`journalctl` command not found.")
+    finally:
+        follower.stop()
+
+    return current_cursor
+
 def collect_logs():
+    global entry_spool
     logger.info("Linux Log Collector (Journald) Starting...")
     if STORE_LOGS_TO_FILE and OUTPUT_LOG_FILE:
         try:
@@ -167,6 +595,10 @@ def collect_logs():
     else:
         logger.info("File storage for raw journal logs is disabled.")
 
+    if STORE_LOGS_TO_DATABASE and db_manager.get_shard_store() is not None:
+        logger.info(f"Journal entries will be ingested into per-{db_manager.SHARD_INTERVAL_SECONDS}s SQLite shards under: {os.path.abspath(db_manager.SHARD_DIRECTORY)}")
+    elif STORE_LOGS_TO_DATABASE:
+        logger.info(f"Journal entries will be ingested directly into SQLite database: {os.path.abspath(DATABASE_NAME)}")
 
     logger.warning("This script may require root (sudo) privileges to access the full system journal.")
 
@@ -174,28 +606,68 @@ def collect_logs():
         logger.fatal("journalctl is not available. Terminating script.")
         return
 
+    stop_event = threading.Event()
+    storage_stop_event = threading.Event()
+    storage_thread = None
+
     current_journal_cursor = None
+    if SPOOL_JOURNAL_ENTRIES:
+        entry_spool = journal_spool.JournalSpool(SPOOL_DIRECTORY)
+        current_journal_cursor = entry_spool.last_cursor()
+        if current_journal_cursor:
+            logger.info(f"Resuming after the last spooled journal entry in {os.path.abspath(SPOOL_DIRECTORY)}.")
+        storage_thread = threading.Thread(target=storage_loop, args=(entry_spool, storage_stop_event),
+                                          name="journal-storage", daemon=True)
+        storage_thread.start()
+    if not current_journal_cursor:
+        current_journal_cursor = load_journal_cursor()
+        if current_journal_cursor:
+            logger.info(f"Resuming from persisted journal cursor in {JOURNAL_CURSOR_FILE}.")
+
+    def request_stop(signum, frame):
+        logger.info(f"Received signal {signum}. Stopping log collector.")
+        stop_event.set()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, request_stop)
+
+    if COLLECTOR_METRICS_PORT is not None:
+        try:
+            metrics.start_metrics_server(COLLECTOR_METRICS_PORT, COLLECTOR_METRICS_HOST)
+        except OSError as e:
+            logger.error(f"Could not serve metrics on {COLLECTOR_METRICS_HOST}:{COLLECTOR_METRICS_PORT}: {e}")
+
+    if STORE_LOGS_TO_DATABASE and RUN_MAINTENANCE_IN_BACKGROUND:
+        maintenance.start_maintenance_thread(OUTPUT_LOG_FILE if STORE_LOGS_TO_FILE else None, stop_event)
+
     last_successful_check_time = time.monotonic()
 
     try:
-        while True:
+        if JOURNALCTL_FOLLOW_MODE:
+            follow_journal_logs(current_journal_cursor, stop_event)
+            return
+
+        while not stop_event.is_set():
             current_time = time.monotonic()
             time_since_last_check = current_time - last_successful_check_time
 
             if time_since_last_check >= JOURNALCTL_POLL_INTERVAL_SECONDS:
                 logger.debug(f"Polling journal for new logs (Interval: {JOURNALCTL_POLL_INTERVAL_SECONDS}s).")
                 logs_found, new_cursor = fetch_journal_logs(current_journal_cursor)
+                if new_cursor != current_journal_cursor and entry_spool is None:
+                    save_journal_cursor(new_cursor)
                 current_journal_cursor = new_cursor
                 last_successful_check_time = time.monotonic() # Reset timer after a check
 
                 time_to_next_poll = JOURNALCTL_POLL_INTERVAL_SECONDS
                 sleep_duration = max(0.1, time_to_next_poll) # Ensure at least a tiny sleep
                 logger.debug(f"Sleeping for {sleep_duration:.2f} seconds until next poll.")
-                time.sleep(sleep_duration)
+                stop_event.wait(sleep_duration)
             else:
                 sleep_duration = max(0.1, JOURNALCTL_POLL_INTERVAL_SECONDS - time_since_last_check)
                 logger.debug(f"Loop iteration before poll interval. Sleeping for {sleep_duration:.2f} seconds.")
-                time.sleep(sleep_duration)
+                stop_event.wait(sleep_duration)
+            flush_output_if_idle()
 
 
     except KeyboardInterrupt:
@@ -203,4 +675,15 @@ def collect_logs():
     except Exception as e:
         logger.critical(f"An unhandled exception occurred in the main loop: {e}", exc_info=True)
     finally:
+        # The reader has stopped; whatever storage has not acknowledged stays in the spool.
+        if storage_thread is not None:
+            storage_stop_event.set()
+            storage_thread.join()
+        if entry_spool is not None:
+            entry_spool.close()
+            entry_spool = None
+        close_output_sink()
+        close_database_writer()
+        if watchlist_engine is not None:
+            watchlist_engine.close()
         logger.info("Log collector exited.")
\ No newline at end of file
@@ -2,11 +2,66 @@ import sqlite3
 import os
 import logging
 import json
+import base64
+import fcntl
+import hashlib
+import re
+import threading
 import time
+import zlib
+
+import db_migrations
+import db_pool
+import metrics
+import raw_log_codec
+import shard_store
+import template_miner
+
+from collections import Counter, OrderedDict
 
 DATABASE_NAME = "logs_db.sqlite3" 
 OUTPUT_LOG_FILE_FOR_IMPORT = "collected_journal_logs.jsonl" 
 
+# Partitioned storage: with SHARD_INTERVAL_SECONDS set, logs are written to
+# one database per interval under SHARD_DIRECTORY instead of DATABASE_NAME,
+# and shards older than SHARD_RETENTION_SECONDS are deleted (None keeps all).
+SHARD_INTERVAL_SECONDS = None
+SHARD_DIRECTORY = "log_shards"
+SHARD_RETENTION_SECONDS = None
+
+INGEST_BUSY_TIMEOUT_SECONDS = 10
+INGEST_CACHE_SIZE_KIB = 64 * 1024
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FINGERPRINT_BYTES = 1024
+
+# Rows carry the journal __CURSOR in a UNIQUE column, so re-importing or
+# re-collecting an entry that is already stored is silently ignored.
+LOG_INSERT_SQL = '''
+    INSERT OR IGNORE INTO logs (
+        timestamp, hostname, syslog_identifier, pid, uid, gid,
+        message, facility, priority, transport, source_ip, raw_log,
+        category, journal_cursor, systemd_unit, boot_id, comm, template_id
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Positions in build_log_row's tuples; template_id is always last.
+LOG_ROW_MESSAGE_INDEX = 6
+LOG_ROW_JOURNAL_CURSOR_INDEX = 13
+
+# Assign every new row a Drain template (template_miner.py) while writing.
+MINE_LOG_TEMPLATES = True
+
+# Everything but raw_log: list views never need the full journal entry, which
+# is only decompressed by get_log_detail.
+LOG_LIST_COLUMNS = [name for name, _ in db_migrations.LOGS_TABLE_COLUMNS if name != "raw_log"] + list(db_migrations.PROMOTED_JOURNAL_FIELDS) + ["template_id"]
+LOG_LIST_SELECT = ", ".join(f"logs.{name}" for name in LOG_LIST_COLUMNS)
+
+batch_commit_seconds = metrics.histogram(
+    "pylog_db_batch_commit_seconds", "Duration of one batch insert transaction.", ["writer"])
+rows_written_total = metrics.counter(
+    "pylog_db_rows_written_total", "Rows offered to the batch writers, by outcome.", ["writer", "result"])
+
 db_logger = logging.getLogger(__name__)
 if not db_logger.handlers:
     db_handler = logging.StreamHandler()
@@ -40,78 +95,404 @@ def safe_int_convert(value, default=None):
     except (ValueError, TypeError):
         return default
 
+BULK_IMPORT_LOCK_SUFFIX = "-bulk-import.lock"
+
+def acquire_bulk_import_lock(db_path):
+    """Exclusively locks db_path's bulk import lock file and returns it (close to release).
+
+    Returns None if another process holds it. The lock goes away with the
+    process, so a killed import never leaves it behind.
+    """
+    lock_file = open(db_path + BULK_IMPORT_LOCK_SUFFIX, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def repair_deferred_indexes(conn, db_path):
+    """Rebuilds indexes left dropped by a bulk import that did not finish."""
+    if conn.execute("SELECT 1 FROM deferred_indexes").fetchone() is None:
+        return
+    lock_file = acquire_bulk_import_lock(db_path)
+    if lock_file is None:
+        db_logger.info(f"A bulk import into '{db_path}' is running; its deferred indexes are left to it.")
+        return
+    try:
+        started = time.monotonic()
+        with conn:
+            restored = db_migrations.restore_deferred_indexes(conn)
+        if restored:
+            db_logger.warning(f"Rebuilt the indexes an interrupted bulk import left dropped in '{db_path}' "
+                              f"in {time.monotonic() - started:.1f}s.")
+    finally:
+        lock_file.close()
+
 def setup_database(db_path=DATABASE_NAME):
     conn = None
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp REAL,
-                hostname TEXT,
-                syslog_identifier TEXT,
-                pid INTEGER,
-                uid INTEGER,
-                gid INTEGER,
-                message TEXT,
-                facility INTEGER,
-                priority INTEGER,
-                transport TEXT,
-                source_ip TEXT,
-                raw_log TEXT
-            )
-        ''')
-        conn.commit()
-        db_logger.info(f"Database '{db_path}' and table 'logs' ensured/created.")
+        conn = sqlite3.connect(db_path, timeout=INGEST_BUSY_TIMEOUT_SECONDS)
+        schema_version = db_migrations.apply_migrations(conn)
+        repair_deferred_indexes(conn, db_path)
+        db_logger.info(f"Database '{db_path}' and table 'logs' ensured/created (schema version {schema_version}).")
     except sqlite3.Error as e:
         db_logger.error(f"Database error during setup for '{db_path}': {e}")
     finally:
         if conn:
             conn.close()
 
-def insert_log_to_db(conn, log_data, raw_json_line):
-    cursor = conn.cursor()
-    db_timestamp = None
+def configure_ingest_connection(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{INGEST_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def parse_realtime_timestamp(log_data):
+    """__REALTIME_TIMESTAMP (microseconds) as epoch seconds, or None."""
     timestamp_usec_str = log_data.get("__REALTIME_TIMESTAMP")
     if timestamp_usec_str:
         try:
-            db_timestamp = int(timestamp_usec_str) / 1_000_000.0
+            return int(timestamp_usec_str) / 1_000_000.0
         except (ValueError, TypeError):
             db_logger.warning(f"__REALTIME_TIMESTAMP '{timestamp_usec_str}' değeri float'a dönüştürülemedi.")
+    return None
+
+def build_log_columns(log_data):
+    """The `logs` column values (raw_log and category aside) of a journal entry."""
+    return {
+        "timestamp": parse_realtime_timestamp(log_data),
+        "hostname": log_data.get('_HOSTNAME'),
+        "syslog_identifier": log_data.get('SYSLOG_IDENTIFIER', log_data.get("_COMM")),
+        "pid": safe_int_convert(log_data.get('_PID')),
+        "uid": safe_int_convert(log_data.get('_UID')),
+        "gid": safe_int_convert(log_data.get('_GID')),
+        "message": log_data.get('MESSAGE'),
+        "facility": safe_int_convert(log_data.get('SYSLOG_FACILITY')),
+        "priority": safe_int_convert(log_data.get('PRIORITY')),
+        "transport": log_data.get('_TRANSPORT'),
+        "source_ip": log_data.get('source_ip'),
+        "journal_cursor": log_data.get('__CURSOR'),
+        "systemd_unit": log_data.get('_SYSTEMD_UNIT'),
+        "boot_id": log_data.get('_BOOT_ID'),
+        "comm": log_data.get('_COMM'),
+    }
+
+def build_log_row(log_data, raw_json_line=None, codec=None, template_id=None):
+    """Maps a journal entry onto the LOG_INSERT_SQL parameters.
 
-    priority_str = log_data.get('PRIORITY')
-    log_category = determine_log_category(priority_str)
+    With a RawLogCodec, raw_log is stored compacted; otherwise raw_json_line is
+    stored as-is. template_id is usually filled in later by assign_template_ids.
+    """
+    columns = build_log_columns(log_data)
+    log_category = determine_log_category(log_data.get('PRIORITY'))
+    if codec is not None:
+        raw_log = codec.encode(log_data, columns)
+    else:
+        raw_log = raw_json_line if raw_json_line is not None else json.dumps(log_data, ensure_ascii=False)
+
+    return (
+        columns["timestamp"],
+        columns["hostname"],
+        columns["syslog_identifier"],
+        columns["pid"],
+        columns["uid"],
+        columns["gid"],
+        columns["message"],
+        columns["facility"],
+        columns["priority"],
+        columns["transport"],
+        columns["source_ip"],
+        raw_log,
+        log_category,
+        columns["journal_cursor"],
+        columns["systemd_unit"],
+        columns["boot_id"],
+        columns["comm"],
+        template_id
+    )
 
+def insert_log_to_db(conn, log_data, raw_json_line):
+    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO logs (
-                timestamp, hostname, syslog_identifier, pid, uid, gid,
-                message, facility, priority, transport, source_ip, raw_log,
-                category  -- <<< YENİ KATEGORİ ALANI
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) -- <<< YENİ SORGU İŞARETİ
-        ''',
-        (
-            db_timestamp,
-            log_data.get('_HOSTNAME'),
-            log_data.get('SYSLOG_IDENTIFIER', log_data.get("_COMM")),
-            safe_int_convert(log_data.get('_PID')), 
-            safe_int_convert(log_data.get('_UID')),
-            safe_int_convert(log_data.get('_GID')),
-            log_data.get('MESSAGE'),
-            safe_int_convert(log_data.get('SYSLOG_FACILITY')),
-            safe_int_convert(priority_str),
-            log_data.get('_TRANSPORT'),
-            log_data.get('source_ip'),
-            raw_json_line,
-            log_category  
-        ))
+        cursor.execute(LOG_INSERT_SQL, build_log_row(log_data, raw_json_line))
     except sqlite3.Error as e:
         db_logger.error(f"Log veritabanına eklenirken hata: {e}. Log verisi (ilk 100 karakter): {str(log_data)[:100]}")
         raise 
 
-def import_jsonl_to_sqlite(jsonl_filepath=OUTPUT_LOG_FILE_FOR_IMPORT, db_path=DATABASE_NAME):
+def insert_log_batch(conn, rows):
+    """Inserts prepared rows (see build_log_row) in a single transaction."""
+    if not rows:
+        return 0
+    with conn:
+        conn.executemany(LOG_INSERT_SQL, rows)
+    return len(rows)
+
+_raw_log_codecs = {}
+_raw_log_codecs_lock = threading.Lock()
+
+def get_raw_log_codec(conn, db_path):
+    """The process-wide RawLogCodec for db_path, loaded on first use."""
+    with _raw_log_codecs_lock:
+        codec = _raw_log_codecs.get(db_path)
+        if codec is None:
+            codec = raw_log_codec.RawLogCodec.load(conn)
+            _raw_log_codecs[db_path] = codec
+        return codec
+
+_template_miners = {}
+_template_miners_lock = threading.Lock()
+
+def get_template_miner(conn, db_path):
+    """The process-wide DrainTemplateMiner for db_path, loaded on first use."""
+    with _template_miners_lock:
+        miner = _template_miners.get(db_path)
+        if miner is None:
+            miner = template_miner.DrainTemplateMiner.load(conn)
+            _template_miners[db_path] = miner
+        return miner
+
+def drop_stored_rows(conn, rows, key=None):
+    """rows without those whose journal_cursor is stored or came earlier in rows.
+
+    INSERT OR IGNORE would skip them anyway; dropping them before
+    assign_template_ids keeps re-read entries from changing the templates.
+    key(item) gives the build_log_row tuple when rows holds something else.
+    """
+    journal_cursor_of = lambda item: (key(item) if key else item)[LOG_ROW_JOURNAL_CURSOR_INDEX]
+    journal_cursors = [journal_cursor_of(item) for item in rows if journal_cursor_of(item) is not None]
+    if not journal_cursors:
+        return rows
+    seen_cursors = stored_journal_cursors(conn, journal_cursors)
+    new_rows = []
+    for item in rows:
+        journal_cursor = journal_cursor_of(item)
+        if journal_cursor is not None:
+            if journal_cursor in seen_cursors:
+                continue
+            seen_cursors.add(journal_cursor)
+        new_rows.append(item)
+    return new_rows
+
+def assign_template_ids(rows, miner, write_transaction):
+    """Returns build_log_row tuples with their template_id filled in.
+
+    New or generalized templates are saved first, through write_transaction()
+    (a context manager yielding a connection in a write transaction), so a
+    failed row insert cannot roll back ids the miner has already handed out.
+    If saving fails, the rows keep template_id NULL and ingest goes on.
+    """
+    with _template_miners_lock:
+        templates = miner.add_messages([row[LOG_ROW_MESSAGE_INDEX] for row in rows])
+        if miner.has_pending_changes():
+            try:
+                with write_transaction() as conn:
+                    miner.persist(conn)
+            except sqlite3.Error as e:
+                miner.forget_unsaved()
+                db_logger.error(f"Could not save mined log templates: {e}")
+    return [row[:-1] + (template.id if template is not None else None,) for row, template in zip(rows, templates)]
+
+def maybe_train_raw_log_dictionary(conn, codec):
+    """Trains the first compression dictionary once enough rows exist.
+
+    Rows written before that are compressed without a dictionary and stay so.
+    """
+    if codec.active_dictionary_id != raw_log_codec.NO_DICTIONARY_ID:
+        return
+    with conn:
+        codec.reload(conn)
+        if codec.active_dictionary_id == raw_log_codec.NO_DICTIONARY_ID:
+            dictionary_id = codec.train_from_logs(conn)
+            if dictionary_id is not None:
+                db_logger.info(f"Trained raw_log compression dictionary {dictionary_id}.")
+
+def decode_raw_log(conn, db_path, row):
+    """Reconstructs the full journal entry of a `logs` row (a mapping)."""
+    codec = get_raw_log_codec(conn, db_path)
+    columns = {name: row[name] for name in raw_log_codec.RAW_LOG_SOURCE_COLUMNS}
+    try:
+        return codec.decode(row['raw_log'], columns)
+    except KeyError:
+        # Dictionary trained by another process after we loaded ours.
+        codec.reload(conn)
+        return codec.decode(row['raw_log'], columns)
+
+class SqliteBatchWriter:
+    """Writes journal entry batches straight into the `logs` table.
+
+    Uses the pool's single WAL-mode writer connection and commits each batch
+    as one executemany transaction. Returns the number of rows inserted.
+    """
+
+    def __init__(self, db_path=DATABASE_NAME):
+        self.db_path = db_path
+        setup_database(db_path)
+        self.pool = db_pool.get_pool(db_path)
+        with self.pool.write() as conn:
+            self.codec = get_raw_log_codec(conn, db_path)
+            self.template_miner = get_template_miner(conn, db_path) if MINE_LOG_TEMPLATES else None
+
+    def write_batch(self, log_entries):
+        rows = [build_log_row(log_entry, codec=self.codec) for log_entry in log_entries]
+        if not rows:
+            return 0
+        row_count = len(rows)
+        try:
+            if self.template_miner is not None:
+                with self.pool.read() as conn:
+                    rows = drop_stored_rows(conn, rows)
+                rows = assign_template_ids(rows, self.template_miner, self.pool.write)
+            with batch_commit_seconds.time(writer="batch"), self.pool.write() as conn:
+                inserted = conn.executemany(LOG_INSERT_SQL, rows).rowcount
+            rows_written_total.inc(inserted, writer="batch", result="inserted")
+            rows_written_total.inc(row_count - inserted, writer="batch", result="duplicate")
+            if self.codec.active_dictionary_id == raw_log_codec.NO_DICTIONARY_ID:
+                with self.pool.write() as conn:
+                    maybe_train_raw_log_dictionary(conn, self.codec)
+            return inserted
+        except sqlite3.Error as e:
+            db_logger.error(f"Failed to insert batch of {row_count} log(s) into '{self.db_path}': {e}")
+            raise
+
+    def close(self):
+        self.pool.close_writer()
+
+SHARD_OPEN_WRITERS = 4
+
+class ShardedBatchWriter:
+    """SqliteBatchWriter counterpart for a ShardStore.
+
+    Routes each entry to the shard of its timestamp (entries without one go to
+    the current shard) and keeps writers for the few most recently used shards
+    open. Expired shards are dropped whenever a new shard is opened.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.writers = OrderedDict()
+
+    def get_writer(self, shard_number):
+        writer = self.writers.get(shard_number)
+        if writer is not None:
+            self.writers.move_to_end(shard_number)
+            return writer
+        for dropped_shard in self.store.drop_expired_shards():
+            dropped_writer = self.writers.pop(dropped_shard, None)
+            if dropped_writer is not None:
+                dropped_writer.close()
+        writer = SqliteBatchWriter(self.store.ensure_shard(shard_number))
+        self.writers[shard_number] = writer
+        while len(self.writers) > SHARD_OPEN_WRITERS:
+            self.writers.popitem(last=False)[1].close()
+        return writer
+
+    def write_batch(self, log_entries):
+        entries_by_shard = {}
+        ingest_time = time.time()
+        for log_entry in log_entries:
+            timestamp = parse_realtime_timestamp(log_entry)
+            shard_number = self.store.shard_number(timestamp if timestamp is not None else ingest_time)
+            entries_by_shard.setdefault(shard_number, []).append(log_entry)
+
+        inserted = 0
+        for shard_number in sorted(entries_by_shard):
+            inserted += self.get_writer(shard_number).write_batch(entries_by_shard[shard_number])
+        return inserted
+
+    def close(self):
+        while self.writers:
+            self.writers.popitem(last=False)[1].close()
+
+# Stays below SQLite's default limit of 999 host parameters per statement.
+CURSOR_LOOKUP_CHUNK_SIZE = 500
+
+def find_stored_journal_cursors(log_entries):
+    """The __CURSOR values of log_entries that are already in the database."""
+    store = get_shard_store()
+    cursors_by_database = {}
+    for log_entry in log_entries:
+        journal_cursor = log_entry.get("__CURSOR")
+        if not journal_cursor:
+            continue
+        if store is None:
+            db_paths = [DATABASE_NAME]
+        else:
+            # Same routing as ShardedBatchWriter; without a timestamp it could be in any shard.
+            timestamp = parse_realtime_timestamp(log_entry)
+            db_paths = [store.shard_path(store.shard_number(timestamp))] if timestamp is not None else log_databases_for_range()
+        for db_path in db_paths:
+            cursors_by_database.setdefault(db_path, []).append(journal_cursor)
+
+    stored_cursors = set()
+    for db_path, journal_cursors in cursors_by_database.items():
+        if not os.path.exists(db_path):
+            continue
+        with db_pool.get_pool(db_path).read() as conn:
+            stored_cursors |= stored_journal_cursors(conn, journal_cursors)
+    return stored_cursors
+
+def stored_journal_cursors(conn, journal_cursors):
+    """The subset of journal_cursors present in conn's logs table."""
+    stored_cursors = set()
+    for start in range(0, len(journal_cursors), CURSOR_LOOKUP_CHUNK_SIZE):
+        chunk = journal_cursors[start:start + CURSOR_LOOKUP_CHUNK_SIZE]
+        cursor = conn.execute(
+            f"SELECT journal_cursor FROM logs WHERE journal_cursor IN ({', '.join('?' * len(chunk))})", chunk)
+        stored_cursors.update(row[0] for row in cursor)
+    return stored_cursors
+
+def create_batch_writer(db_path=None):
+    """The batch writer for the configured storage: sharded or a single file."""
+    store = get_shard_store()
+    if store is not None:
+        return ShardedBatchWriter(store)
+    return SqliteBatchWriter(db_path or DATABASE_NAME)
+
+def file_fingerprint(f_in, length):
+    f_in.seek(0)
+    return hashlib.sha1(f_in.read(length)).hexdigest()
+
+def load_import_checkpoint(conn, jsonl_filepath, f_in):
+    """Returns the byte offset already imported from this exact file, or 0.
+
+    The file must still have the same device/inode and the same leading bytes,
+    and must not have shrunk; otherwise it was rotated or rewritten and is
+    imported from the start.
+    """
+    row = conn.execute(
+        "SELECT device, inode, fingerprint, fingerprint_length, byte_offset FROM import_checkpoints WHERE file_path = ?",
+        (os.path.abspath(jsonl_filepath),)
+    ).fetchone()
+    if not row:
+        return 0
+
+    device, inode, fingerprint, fingerprint_length, byte_offset = row
+    file_stat = os.fstat(f_in.fileno())
+    if (device, inode) != (file_stat.st_dev, file_stat.st_ino) or file_stat.st_size < byte_offset:
+        db_logger.info(f"'{jsonl_filepath}' was replaced or truncated since the last import. Importing from the start.")
+        return 0
+    if file_fingerprint(f_in, fingerprint_length) != fingerprint:
+        db_logger.info(f"Leading bytes of '{jsonl_filepath}' changed since the last import. Importing from the start.")
+        return 0
+    return byte_offset
+
+def save_import_checkpoint(conn, jsonl_filepath, f_in, byte_offset):
+    file_stat = os.fstat(f_in.fileno())
+    fingerprint_length = min(byte_offset, IMPORT_FINGERPRINT_BYTES)
+    read_position = f_in.tell()
+    fingerprint = file_fingerprint(f_in, fingerprint_length)
+    f_in.seek(read_position)
+    conn.execute('''
+        INSERT OR REPLACE INTO import_checkpoints (
+            file_path, device, inode, fingerprint, fingerprint_length, byte_offset, updated_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (os.path.abspath(jsonl_filepath), file_stat.st_dev, file_stat.st_ino,
+          fingerprint, fingerprint_length, byte_offset, time.time()))
+
+def import_jsonl_to_sqlite(jsonl_filepath=OUTPUT_LOG_FILE_FOR_IMPORT, db_path=DATABASE_NAME, resume=True):
     if not os.path.exists(jsonl_filepath):
         db_logger.error(f"JSONL file not found: {jsonl_filepath}. Cannot import to SQLite.")
         return False
@@ -120,37 +501,90 @@ def import_jsonl_to_sqlite(jsonl_filepath=OUTPUT_LOG_FILE_FOR_IMPORT, db_path=DA
 
     conn = None
     inserted_count = 0
+    duplicate_count = 0
     failed_count = 0
     line_number = 0
     try:
-        conn = sqlite3.connect(db_path)
-        db_logger.info(f"Starting import from '{jsonl_filepath}' to '{db_path}'.")
-        with open(jsonl_filepath, 'r', encoding='utf-8') as f_in:
-            for line_number, line_text in enumerate(f_in):
-                stripped_line = line_text.strip()
-                if not stripped_line:
-                    continue
+        conn = sqlite3.connect(db_path, timeout=INGEST_BUSY_TIMEOUT_SECONDS)
+        configure_ingest_connection(conn)
+        codec = get_raw_log_codec(conn, db_path)
+        miner = get_template_miner(conn, db_path) if MINE_LOG_TEMPLATES else None
+        with open(jsonl_filepath, 'rb') as f_in:
+            start_offset = load_import_checkpoint(conn, jsonl_filepath, f_in) if resume else 0
+            f_in.seek(start_offset)
+            committed_offset = start_offset
+            db_logger.info(f"Starting import from '{jsonl_filepath}' (byte offset {start_offset}) to '{db_path}'.")
 
+            pending_rows = []
+            pending_offset = committed_offset
+
+            def commit_pending_rows():
+                nonlocal inserted_count, duplicate_count, failed_count, committed_offset
+                batch_failed = 0
+                batch_size = len(pending_rows)
+                commit_started = time.perf_counter()
+                if miner is not None:
+                    pending_rows[:] = drop_stored_rows(conn, pending_rows, key=lambda pending_row: pending_row[1])
+                    mined_rows = assign_template_ids([row for _, row in pending_rows], miner, lambda: conn)
+                    pending_rows[:] = [(batch_line_number, row) for (batch_line_number, _), row in zip(pending_rows, mined_rows)]
                 try:
-                    log_entry_dict = json.loads(stripped_line)
-                    insert_log_to_db(conn, log_entry_dict, stripped_line)
-                    inserted_count += 1
-                except json.JSONDecodeError as je:
-                    db_logger.warning(f"Skipping line {line_number + 1} in {jsonl_filepath} due to JSON decode error: {je}. Line: {stripped_line[:200]}")
-                    failed_count +=1
-                except sqlite3.Error:
-                    db_logger.warning(f"Skipping line {line_number + 1} due to DB insert error (see previous error).")
-                    failed_count += 1
-                except Exception as e:
-                    db_logger.error(f"Skipping line {line_number + 1} due to unexpected error: {e}. Line: {stripped_line[:200]}", exc_info=False)
-                    failed_count +=1
-
-                if (inserted_count + failed_count) % 1000 == 0 and (inserted_count + failed_count) > 0 :
-                    conn.commit()
-                    db_logger.info(f"Processed {inserted_count + failed_count} lines. Inserted: {inserted_count}, Failed: {failed_count}. Committed to DB.")
-
-        conn.commit() 
-        db_logger.info(f"Import finished. Total lines processed: {line_number + 1}. Successfully inserted: {inserted_count}. Failed/skipped: {failed_count}.")
+                    with conn:
+                        inserted = conn.executemany(LOG_INSERT_SQL, [row for _, row in pending_rows]).rowcount
+                        save_import_checkpoint(conn, jsonl_filepath, f_in, pending_offset)
+                except sqlite3.Error as e:
+                    db_logger.warning(f"Batch insert failed ({e}). Retrying {len(pending_rows)} line(s) one by one.")
+                    inserted = 0
+                    with conn:
+                        for batch_line_number, row in pending_rows:
+                            try:
+                                inserted += conn.execute(LOG_INSERT_SQL, row).rowcount
+                            except sqlite3.Error as row_error:
+                                db_logger.warning(f"Skipping line {batch_line_number} due to DB insert error: {row_error}")
+                                batch_failed += 1
+                        save_import_checkpoint(conn, jsonl_filepath, f_in, pending_offset)
+                batch_commit_seconds.observe(time.perf_counter() - commit_started, writer="import")
+                rows_written_total.inc(inserted, writer="import", result="inserted")
+                rows_written_total.inc(batch_size - inserted - batch_failed, writer="import", result="duplicate")
+                rows_written_total.inc(batch_failed, writer="import", result="failed")
+                inserted_count += inserted
+                failed_count += batch_failed
+                duplicate_count += batch_size - inserted - batch_failed
+                committed_offset = pending_offset
+                pending_rows.clear()
+                maybe_train_raw_log_dictionary(conn, codec)
+
+            while True:
+                line_bytes = f_in.readline()
+                if not line_bytes:
+                    break
+                if not line_bytes.endswith(b'\n'):
+                    db_logger.info(f"Leaving incomplete trailing line in '{jsonl_filepath}' for the next import.")
+                    break
+                line_number += 1
+                pending_offset += len(line_bytes)
+
+                stripped_line = line_bytes.decode('utf-8', errors='replace').strip()
+                if stripped_line:
+                    try:
+                        log_entry_dict = json.loads(stripped_line)
+                        pending_rows.append((line_number, build_log_row(log_entry_dict, codec=codec)))
+                    except json.JSONDecodeError as je:
+                        db_logger.warning(f"Skipping line {line_number} after offset {start_offset} in {jsonl_filepath} due to JSON decode error: {je}. Line: {stripped_line[:200]}")
+                        failed_count +=1
+                        rows_written_total.inc(writer="import", result="invalid")
+                    except Exception as e:
+                        db_logger.error(f"Skipping line {line_number} after offset {start_offset} due to unexpected error: {e}. Line: {stripped_line[:200]}", exc_info=False)
+                        failed_count +=1
+                        rows_written_total.inc(writer="import", result="invalid")
+
+                if len(pending_rows) >= IMPORT_BATCH_SIZE:
+                    commit_pending_rows()
+                    db_logger.info(f"Processed {line_number} lines. Inserted: {inserted_count}, Already present: {duplicate_count}, Failed: {failed_count}. Committed to DB.")
+
+            if pending_rows or pending_offset != committed_offset:
+                commit_pending_rows()
+
+        db_logger.info(f"Import finished. Lines processed: {line_number} (from byte {start_offset} to {committed_offset}). Successfully inserted: {inserted_count}. Already present: {duplicate_count}. Failed/skipped: {failed_count}.")
         return True
 
     except sqlite3.Error as e:
@@ -165,156 +599,828 @@ def import_jsonl_to_sqlite(jsonl_filepath=OUTPUT_LOG_FILE_FOR_IMPORT, db_path=DA
     return False
 
 def print_all_logs_from_db(db_path=DATABASE_NAME):
-    conn = None
-    try:
-        if not os.path.exists(db_path):
-            db_logger.error(f"Database file '{db_path}' not found. Cannot print logs.")
-            print(f"Error: Database file '{db_path}' not found.")
-            return
-
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        db_logger.info(f"Fetching all logs from table 'logs' in '{db_path}'...")
-        cursor.execute("SELECT * FROM logs ORDER BY id")
-        rows = cursor.fetchall()
-
-        if not rows:
-            db_logger.info(f"No logs found in the database '{db_path}'.")
-            print(f"No logs found in the database: {db_path}")
-            return
+    if not os.path.exists(db_path):
+        db_logger.error(f"Database file '{db_path}' not found. Cannot print logs.")
+        print(f"Error: Database file '{db_path}' not found.")
+        return
 
-        column_names = [description[0] for description in cursor.description]
-        print(f"\n--- Logs from Database: {db_path} ---")
-        print(f"Found {len(rows)} log entries.\n")
-
-        for i, row_data in enumerate(rows):
-            print(f"--- Log Entry {i + 1} (ID: {row_data[column_names.index('id')] if 'id' in column_names else 'N/A'}) ---")
-            for col_name, value in zip(column_names, row_data):
+    # Rows are streamed from iter_logs() instead of fetched all at once.
+    printed = 0
+    try:
+        db_logger.info(f"Streaming all logs from table 'logs' in '{db_path}'...")
+        for row_data in iter_logs(newest_first=False, include_raw_log=True, db_paths=[db_path]):
+            if printed == 0:
+                print(f"\n--- Logs from Database: {db_path} ---\n")
+            printed += 1
+            print(f"--- Log Entry {printed} (ID: {row_data.get('id', 'N/A')}) ---")
+            for col_name, value in row_data.items():
+                if col_name == 'raw_log' and value:
+                    value = json.dumps(value, ensure_ascii=False)
                 if col_name == 'raw_log' and value and len(str(value)) > 150:
                     print(f"  {col_name.upper()}: {str(value)[:150]}... (truncated)")
                 else:
                     print(f"  {col_name.upper()}: {value}")
             print("-" * 20)
 
+        if printed == 0:
+            db_logger.info(f"No logs found in the database '{db_path}'.")
+            print(f"No logs found in the database: {db_path}")
+        else:
+            print(f"Printed {printed} log entries.")
+
     except sqlite3.Error as e:
         db_logger.error(f"Database error while trying to print logs from '{db_path}': {e}")
         print(f"Database error: {e}")
     except Exception as e:
         db_logger.error(f"An unexpected error occurred while printing logs from '{db_path}': {e}", exc_info=True)
         print(f"An unexpected error occurred: {e}")
-    finally:
-        if conn:
-            conn.close()
-            db_logger.debug(f"Database connection for '{db_path}' closed after printing logs.")
 
-def get_logs_from_db(limit=50, offset=0, filters=None):
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+_shard_store = None
+_shard_store_lock = threading.Lock()
+
+def get_shard_store():
+    """The ShardStore for the SHARD_* settings, or None when sharding is off."""
+    global _shard_store
+    if not SHARD_INTERVAL_SECONDS:
+        return None
+    with _shard_store_lock:
+        if _shard_store is None or (_shard_store.directory, _shard_store.interval_seconds) != (SHARD_DIRECTORY, SHARD_INTERVAL_SECONDS):
+            _shard_store = shard_store.ShardStore(SHARD_DIRECTORY, SHARD_INTERVAL_SECONDS, SHARD_RETENTION_SECONDS)
+        return _shard_store
+
+def log_databases_for_range(since=None, until=None, newest_first=True):
+    """Database files that can hold entries with since <= timestamp <= until.
 
-    query = "SELECT * FROM logs"
+    DATABASE_NAME, or with sharding enabled the overlapping shards in time order.
+    """
+    store = get_shard_store()
+    if store is None:
+        return [DATABASE_NAME]
+    return [store.shard_path(shard_number) for shard_number in store.shards_for_range(since, until, newest_first)]
+
+def ensure_log_databases():
+    """Brings DATABASE_NAME, or every existing shard, up to the latest schema."""
+    store = get_shard_store()
+    if store is None:
+        setup_database(DATABASE_NAME)
+        return
+    for shard_number in store.list_shards():
+        store.ensure_shard(shard_number)
+
+def get_tail_databases():
+    """The databases new entries can land in, newest first, for the live tail.
+
+    With sharding that is every shard: entries are routed by their own
+    timestamp, so late ones are written to older shards.
+    """
+    store = get_shard_store()
+    if store is None:
+        return [DATABASE_NAME]
+    shard_numbers = store.list_shards()
+    if not shard_numbers:
+        shard_numbers = [store.shard_number(time.time())]
+        store.ensure_shard(shard_numbers[0])
+    return [store.shard_path(shard_number) for shard_number in reversed(shard_numbers)]
+
+FTS_QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+FTS_SNIPPET_TOKENS = 12
+# message_snippet is plain log text with each match between these control
+# characters (STX/ETX); clients escape the text, then turn them into markup.
+FTS_SNIPPET_MATCH_START = "\x02"
+FTS_SNIPPET_MATCH_END = "\x03"
+
+def build_fts_match_expression(search_text, column=None):
+    """Turns user search text into an FTS5 MATCH expression, or None.
+
+    "quoted text" is matched as an exact phrase; every other word must appear
+    (implicit AND) as the start of a token, so `deactivat` finds
+    "deactivating" and `wpa_supp` finds "wpa_supplicant" (split into the
+    phrase wpa + supp*). Text inside a word ("activat") does not match. All
+    terms are quoted so FTS5 operators typed by the user are treated as
+    plain text; a trailing * is accepted and changes nothing.
+    """
+    terms = []
+    for phrase, word in FTS_QUERY_TOKEN_PATTERN.findall(search_text or ""):
+        text = phrase if phrase else word.rstrip('*')
+        if not any(character.isalnum() for character in text):
+            continue
+        quoted = '"' + text.replace('"', '""') + '"'
+        terms.append(quoted if phrase else quoted + ' *')
+
+    if not terms:
+        return None
+    expression = " AND ".join(terms)
+    return f"{column} : ({expression})" if column else expression
+
+FILTER_MATCH_EXACT = "exact"
+FILTER_MATCH_CONTAINS = "contains"
+
+def build_log_filter_clause(filters):
+    """Returns (conditions, params, fts_expression) for the /api/logs filters.
+
+    Conditions are qualified with `logs.` so they can be combined with a join
+    against logs_fts when fts_expression is not None.
+    """
+    conditions = []
     params = []
+    fts_terms = []
+    if not filters:
+        return conditions, params, None
 
-    if filters:
-        conditions = []
-        if filters.get('priority'):
-            conditions.append("priority = ?")
-            params.append(filters['priority'])
-        if filters.get('identifier'):
-            conditions.append("(syslog_identifier LIKE ? OR raw_log LIKE ?)") 
+    if filters.get('since') is not None:
+        conditions.append("logs.timestamp >= ?")
+        params.append(filters['since'])
+    if filters.get('until') is not None:
+        conditions.append("logs.timestamp < ?")
+        params.append(filters['until'])
+    if filters.get('priority'):
+        conditions.append("logs.priority = ?")
+        params.append(filters['priority'])
+    # Substring matches by default; with match=exact (values picked from
+    # /api/facets) they become equality tests that can use the column indexes.
+    exact_match = filters.get('match') == FILTER_MATCH_EXACT
+    if filters.get('identifier'):
+        if exact_match:
+            conditions.append("(logs.syslog_identifier = ? OR logs.systemd_unit = ?)")
+            params.extend([filters['identifier'], filters['identifier']])
+        else:
+            conditions.append("(logs.syslog_identifier LIKE ? OR logs.systemd_unit LIKE ?)") 
             params.append(f"%{filters['identifier']}%")
-            params.append(f"%_SYSTEMD_UNIT\":\"{filters['identifier']}%") 
-        if filters.get('hostname'):
-            conditions.append("hostname LIKE ?")
+            params.append(f"%{filters['identifier']}%") 
+    if filters.get('unit'):
+        conditions.append("logs.systemd_unit = ?")
+        params.append(filters['unit'])
+    if filters.get('hostname'):
+        if exact_match:
+            conditions.append("logs.hostname = ?")
+            params.append(filters['hostname'])
+        else:
+            conditions.append("logs.hostname LIKE ?")
             params.append(f"%{filters['hostname']}%")
-        if filters.get('message'):
-            conditions.append("message LIKE ?")
+    if filters.get('template_id') is not None:
+        # Template ids are per database file (each shard mines its own).
+        conditions.append("logs.template_id = ?")
+        params.append(filters['template_id'])
+    if filters.get('message'):
+        message_expression = build_fts_match_expression(filters['message'], column="message")
+        if message_expression:
+            fts_terms.append(message_expression)
+        else:
+            conditions.append("logs.message LIKE ?")
             params.append(f"%{filters['message']}%")
-        if filters.get('global_search'):
+    if filters.get('global_search'):
+        search_expression = build_fts_match_expression(filters['global_search'])
+        if search_expression:
+            fts_terms.append(search_expression)
+        else:
             search_term = f"%{filters['global_search']}%"
-            conditions.append("(message LIKE ? OR syslog_identifier LIKE ? OR hostname LIKE ? OR raw_log LIKE ?)")
+            conditions.append("(logs.message LIKE ? OR logs.syslog_identifier LIKE ? OR logs.hostname LIKE ? OR logs.systemd_unit LIKE ?)")
             params.extend([search_term, search_term, search_term, search_term])
 
+    fts_expression = " AND ".join(f"({term})" for term in fts_terms) if fts_terms else None
+    return conditions, params, fts_expression
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+PAGE_DIRECTION_NEXT = "next"
+PAGE_DIRECTION_PREV = "prev"
 
-    query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+TOTAL_MODE_EXACT = "exact"
+TOTAL_MODE_ESTIMATE = "estimate"
+TOTAL_MODE_NONE = "none"
 
-    cursor.execute(query, tuple(params))
-    logs = [dict(row) for row in cursor.fetchall()]
+COUNT_CACHE_TTL_SECONDS = 30
+COUNT_CACHE_MAX_ENTRIES = 256
 
-    count_query = "SELECT COUNT(*) FROM logs"
-    if filters and conditions:
-        count_query += " WHERE " + " AND ".join(conditions[:-2])
-        cursor.execute(count_query, tuple(params[:-2]))
-    else:
-        cursor.execute(count_query)
+# Rows pulled from SQLite per fetchmany() call by iter_logs().
+LOG_STREAM_FETCH_ROWS = 1000
+
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+def encode_page_token(timestamp, log_id, direction):
+    payload = json.dumps([timestamp, log_id, direction], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_page_token(token):
+    """Returns (timestamp, id, direction) or raises ValueError for a bad token."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, log_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid page token: {token!r}") from e
+    if direction not in (PAGE_DIRECTION_NEXT, PAGE_DIRECTION_PREV) or not isinstance(log_id, int) or not isinstance(timestamp, (int, float, type(None))):
+        raise ValueError(f"Invalid page token: {token!r}")
+    return timestamp, log_id, direction
 
+def count_logs_cached(cursor, db_path, from_clause, where_clause, params, max_age=COUNT_CACHE_TTL_SECONDS):
+    cache_key = (db_path, from_clause, where_clause, tuple(params))
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
+
+    cursor.execute(f"SELECT COUNT(*) FROM {from_clause}{where_clause}", tuple(params))
     total_logs = cursor.fetchone()[0]
 
-    conn.close()
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.pop(next(iter(_count_cache)))
+        _count_cache[cache_key] = (total_logs, now)
+    return total_logs
+
+def build_log_query(filters, with_snippet=True):
+    """Returns (select_columns, from_clause, conditions, params, is_search) for the filters."""
+    conditions, params, fts_expression = build_log_filter_clause(filters)
+    from_clause = "logs"
+    select_columns = LOG_LIST_SELECT
+    if fts_expression:
+        from_clause = "logs_fts JOIN logs ON logs.id = logs_fts.rowid"
+        if with_snippet:
+            select_columns += (
+                f", snippet(logs_fts, 0, char({ord(FTS_SNIPPET_MATCH_START)}), char({ord(FTS_SNIPPET_MATCH_END)}),"
+                f" '…', {FTS_SNIPPET_TOKENS}) AS message_snippet"
+            )
+        conditions = ["logs_fts MATCH ?"] + conditions
+        params = [fts_expression] + params
+    return select_columns, from_clause, conditions, params, fts_expression is not None
+
+def get_logs_from_db(limit=50, offset=0, filters=None, sort="time"):
+    filters = filters or {}
+    select_columns, from_clause, conditions, params, is_search = build_log_query(filters)
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    by_relevance = is_search and sort == "relevance"
+    if by_relevance:
+        select_columns += ", logs_fts.rank AS search_rank"
+        order_clause = "logs_fts.rank, logs.timestamp DESC"
+    else:
+        order_clause = "logs.timestamp DESC"
+    query = f"SELECT {select_columns} FROM {from_clause}{where_clause} ORDER BY {order_clause} LIMIT ? OFFSET ?"
+
+    # Databases are walked newest first; per-database counts let the offset
+    # skip whole shards without reading their rows. A skip needs the exact
+    # count (a stale cached one would shift the page), the total alone may
+    # come from the cache.
+    db_paths = log_databases_for_range(filters.get('since'), filters.get('until'))
+    logs = []
+    total_logs = 0
+    remaining_offset = offset
+    for db_path in db_paths:
+        with db_pool.get_pool(db_path).read() as conn:
+            cursor = conn.cursor()
+            may_skip = not by_relevance and len(logs) < limit and remaining_offset > 0 and db_path != db_paths[-1]
+            database_total = count_logs_cached(cursor, db_path, from_clause, where_clause, params,
+                                               max_age=0 if may_skip else COUNT_CACHE_TTL_SECONDS)
+            total_logs += database_total
+            if by_relevance:
+                cursor.execute(query, tuple(params) + (offset + limit, 0))
+                logs.extend(dict(row) for row in cursor.fetchall())
+            elif len(logs) < limit:
+                if remaining_offset >= database_total and db_path != db_paths[-1]:
+                    remaining_offset -= database_total
+                    continue
+                cursor.execute(query, tuple(params) + (limit - len(logs), remaining_offset))
+                logs.extend(dict(row) for row in cursor.fetchall())
+                remaining_offset = 0
+
+    if by_relevance:
+        # bm25 ranks from different shards are merged as they are.
+        logs.sort(key=lambda row: row['search_rank'])
+        logs = logs[offset:offset + limit]
+        for row in logs:
+            del row['search_rank']
     return logs, total_logs
 
-def get_dashboard_data():
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+def untimestamped_log_databases(token_id=None, newest_first=True):
+    """Databases to page rows without a timestamp from, in (shard, id) order.
 
-    one_hour_ago_epoch = time.time() - 3600 
-
-    cursor.execute("SELECT COUNT(*) FROM logs WHERE priority <= 3 AND timestamp >= ?", (one_hour_ago_epoch,))
-    error_log_count = cursor.fetchone()[0]
-
-    cursor.execute("""
-        SELECT COALESCE(syslog_identifier, SUBSTR(SUBSTR(raw_log, INSTR(raw_log, '"_SYSTEMD_UNIT":"') + LENGTH('"_SYSTEMD_UNIT":"')), 1, INSTR(SUBSTR(raw_log, INSTR(raw_log, '"_SYSTEMD_UNIT":"') + LENGTH('"_SYSTEMD_UNIT":"')), '"') -1 ), 'unknown') as identifier,
-               COUNT(*) as count
-        FROM logs
-        GROUP BY identifier
-        ORDER BY count DESC
-        LIMIT 5
-    """)
-    log_identifiers = [dict(row) for row in cursor.fetchall()]
-
-
-    cursor.execute("""
-        SELECT priority, COUNT(*) as count
-        FROM logs
-        GROUP BY priority
-        ORDER BY priority ASC
-    """)
-    logs_by_priority = [dict(row) for row in cursor.fetchall()]
-
-    cursor.execute("""
-        SELECT DISTINCT SUBSTR(raw_log, INSTR(raw_log, '"_BOOT_ID":"') + LENGTH('"_BOOT_ID":"'), 32) as boot_id,
-               MIN(timestamp) as first_occurrence
-        FROM logs
-        WHERE raw_log LIKE '%"_BOOT_ID":"%'
-        GROUP BY boot_id
-        ORDER BY first_occurrence DESC
-        LIMIT 3
-    """)
+    Those rows live in the shard of their ingest time, so every shard may hold
+    some; past a page token, shards on the far side of the token's are skipped.
+    """
+    store = get_shard_store()
+    if store is None:
+        return [DATABASE_NAME]
+    shard_numbers = store.shards_for_range(newest_first=newest_first)
+    if token_id is not None:
+        token_shard = store.shard_number_of_id(token_id)
+        shard_numbers = [shard_number for shard_number in shard_numbers
+                         if (shard_number <= token_shard if newest_first else shard_number >= token_shard)]
+    return [store.shard_path(shard_number) for shard_number in shard_numbers]
 
-    recent_boots = []
-    boot_rows = cursor.fetchall()
-    for row in boot_rows:
-        boot_id_full = row['boot_id']
+def get_logs_page(limit=50, filters=None, page_token=None, total_mode=TOTAL_MODE_ESTIMATE):
+    """Keyset pagination over (timestamp, id), newest first.
+
+    Pages are addressed by opaque tokens instead of OFFSET, so every page costs
+    the same as the first. Returns a dict with the rows, `next`/`prev` tokens
+    (None at either end) and an optional total according to total_mode.
+    """
+    filters = filters or {}
+    select_columns, from_clause, conditions, params, _ = build_log_query(filters)
+    filter_where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    # Rows without a timestamp sort after every timestamped row (NULL is the
+    # smallest value) and never match the (timestamp, id) tuple comparison,
+    # so they are paged as a segment of their own, ordered by id. With
+    # sharding that order is by shard (the ingest time the row was routed
+    # by), then by id within the shard: ids are shard_number << 32 plus the
+    # shard's own rowid, so the token's id alone tells where to resume.
+    direction = PAGE_DIRECTION_NEXT
+    since, until = filters.get('since'), filters.get('until')
+    untimestamped_token_id = None
+    timestamped_segment = ["logs.timestamp IS NOT NULL", [], since, until]
+    untimestamped_segment = ["logs.timestamp IS NULL", []]
+    if page_token:
+        token_timestamp, token_id, direction = decode_page_token(page_token)
+        comparison = "<" if direction == PAGE_DIRECTION_NEXT else ">"
+        if token_timestamp is None:
+            untimestamped_segment[0] = f"logs.timestamp IS NULL AND logs.id {comparison} ?"
+            untimestamped_segment[1] = [token_id]
+            untimestamped_token_id = token_id
+            if direction == PAGE_DIRECTION_NEXT:
+                timestamped_segment = None
+        else:
+            timestamped_segment[0] = f"(logs.timestamp, logs.id) {comparison} (?, ?)"
+            timestamped_segment[1] = [token_timestamp, token_id]
+            if direction == PAGE_DIRECTION_NEXT:
+                timestamped_segment[3] = token_timestamp if until is None else min(until, token_timestamp)
+            else:
+                timestamped_segment[2] = token_timestamp if since is None else max(since, token_timestamp)
+                untimestamped_segment = None
+    if since is not None or until is not None:
+        untimestamped_segment = None # The time range filter already excludes them.
+    newest_first = direction == PAGE_DIRECTION_NEXT
+    segments = [] # (condition, params, databases in page order)
+    if timestamped_segment is not None:
+        segment_condition, segment_params, segment_since, segment_until = timestamped_segment
+        segments.append((segment_condition, segment_params, log_databases_for_range(segment_since, segment_until, newest_first)))
+    if untimestamped_segment is not None:
+        segment_condition, segment_params = untimestamped_segment
+        segments.append((segment_condition, segment_params, untimestamped_log_databases(untimestamped_token_id, newest_first)))
+    if not newest_first:
+        segments.reverse()
+    order = "DESC" if newest_first else "ASC"
+
+    # One extra row tells us whether another page exists in this direction.
+    # Shards are time ranges, so walking them in page order and stopping once
+    # the page is full keeps recent pages on the newest shard only.
+    logs = []
+    for segment_condition, segment_params, segment_db_paths in segments:
+        where_clause = " WHERE " + " AND ".join(conditions + [segment_condition])
+        query = (
+            f"SELECT {select_columns} FROM {from_clause}{where_clause} "
+            f"ORDER BY logs.timestamp {order}, logs.id {order} LIMIT ?"
+        )
+        for db_path in segment_db_paths:
+            if len(logs) > limit:
+                break
+            with db_pool.get_pool(db_path).read() as conn:
+                cursor = conn.execute(query, tuple(params) + tuple(segment_params) + (limit + 1 - len(logs),))
+                logs.extend(dict(row) for row in cursor.fetchall())
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+    if direction == PAGE_DIRECTION_PREV:
+        logs.reverse()
+
+    next_token = prev_token = None
+    if logs:
+        has_next = has_more if direction == PAGE_DIRECTION_NEXT else True
+        has_prev = has_more if direction == PAGE_DIRECTION_PREV else page_token is not None
+        if has_next:
+            next_token = encode_page_token(logs[-1]['timestamp'], logs[-1]['id'], PAGE_DIRECTION_NEXT)
+        if has_prev:
+            prev_token = encode_page_token(logs[0]['timestamp'], logs[0]['id'], PAGE_DIRECTION_PREV)
+
+    total_logs = None
+    total_is_estimate = False
+    if total_mode in (TOTAL_MODE_EXACT, TOTAL_MODE_ESTIMATE):
+        total_is_estimate = total_mode == TOTAL_MODE_ESTIMATE and not conditions
+        total_logs = 0
+        for db_path in log_databases_for_range(filters.get('since'), filters.get('until')):
+            with db_pool.get_pool(db_path).read() as conn:
+                cursor = conn.cursor()
+                if total_is_estimate:
+                    # With AUTOINCREMENT ids, the id span is an O(1) upper bound on the row count.
+                    cursor.execute("SELECT COALESCE(MAX(id) - MIN(id) + 1, 0) FROM logs")
+                    total_logs += cursor.fetchone()[0]
+                else:
+                    total_logs += count_logs_cached(cursor, db_path, from_clause, filter_where_clause, params)
+
+    return {
+        "logs": logs,
+        "next": next_token,
+        "prev": prev_token,
+        "total_logs": total_logs,
+        "total_is_estimate": total_is_estimate,
+    }
+
+def iter_logs(filters=None, newest_first=True, include_raw_log=False, db_paths=None):
+    """Yields every row matching the filters as a dict, in timestamp order.
+
+    Unlike the paged queries this has no LIMIT: each database is read through
+    one open cursor, LOG_STREAM_FETCH_ROWS rows at a time, so memory stays flat
+    however many rows match. The read transaction (and its pooled connection)
+    is held until that database is exhausted or the generator is closed.
+    """
+    filters = filters or {}
+    select_columns, from_clause, conditions, params, _ = build_log_query(filters, with_snippet=False)
+    if include_raw_log:
+        select_columns += ", logs.raw_log"
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    order = "DESC" if newest_first else "ASC"
+    query = f"SELECT {select_columns} FROM {from_clause}{where_clause} ORDER BY logs.timestamp {order}, logs.id {order}"
+
+    if db_paths is None:
+        db_paths = log_databases_for_range(filters.get('since'), filters.get('until'), newest_first)
+    for db_path in db_paths:
+        with db_pool.get_pool(db_path).read() as conn:
+            cursor = conn.execute(query, tuple(params))
+            while True:
+                rows = cursor.fetchmany(LOG_STREAM_FETCH_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    log = dict(row)
+                    if include_raw_log and row['raw_log'] is not None:
+                        log['raw_log'] = decode_raw_log(conn, db_path, row)
+                    yield log
+
+def get_log_detail(log_id):
+    """One full row with raw_log decoded back to the journal entry, or None."""
+    store = get_shard_store()
+    db_path = store.shard_path(store.shard_number_of_id(log_id)) if store else DATABASE_NAME
+    if not os.path.exists(db_path):
+        return None
+    with db_pool.get_pool(db_path).read() as conn:
+        row = conn.execute("SELECT * FROM logs WHERE id = ?", (log_id,)).fetchone()
+        if row is None:
+            return None
+        log_detail = dict(row)
+        try:
+            journal_fields = decode_raw_log(conn, db_path, row)
+            log_detail['raw_log'] = json.dumps(journal_fields, ensure_ascii=False)
+        except (ValueError, KeyError, zlib.error) as e:
+            db_logger.warning(f"Could not decode raw_log of log {log_id}: {e}")
+            log_detail['raw_log'] = None
+        log_detail['template'] = None
+        log_detail['template_parameters'] = None
+        if row['template_id'] is not None:
+            template_row = conn.execute("SELECT template FROM log_templates WHERE id = ?", (row['template_id'],)).fetchone()
+            if template_row is not None and isinstance(row['message'], str):
+                log_detail['template'] = template_row['template']
+                log_detail['template_parameters'] = template_miner.extract_parameters(template_row['template'], row['message'])
+    return log_detail
 
+INGEST_WATERMARK_SQL = """
+    SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'logs'), 0)
+         + COALESCE((SELECT deleted_rows FROM retention_state WHERE id = 1), 0)
+"""
+
+def get_ingest_watermark(db_path=None):
+    """Monotonic marker of the last row ingested into `logs`.
+
+    Read from sqlite_sequence (AUTOINCREMENT) plus the number of rows deleted
+    by retention, so it is a single-row lookup that moves on every insert and
+    every retention delete and never goes backwards. With sharding enabled it
+    is an opaque value that changes whenever any shard does.
+    """
+    store = get_shard_store() if db_path is None else None
+    if store is not None:
+        return store.ingest_watermark()
+    try:
+        with db_pool.get_pool(db_path or DATABASE_NAME).read() as conn:
+            row = conn.execute(INGEST_WATERMARK_SQL).fetchone()
+            return row[0] if row else 0
+    except sqlite3.OperationalError:
+        return 0
+
+def rebuild_search_index(db_path=DATABASE_NAME):
+    """Re-populates logs_fts from the logs table, e.g. after a bulk load."""
+    setup_database(db_path)
+    conn = sqlite3.connect(db_path, timeout=INGEST_BUSY_TIMEOUT_SECONDS)
+    try:
+        with conn:
+            db_migrations.rebuild_full_text_index(conn)
+        db_logger.info(f"Full-text search index rebuilt for '{db_path}'.")
+    finally:
+        conn.close()
+
+DASHBOARD_WINDOW_SECONDS = 24 * 3600
+DASHBOARD_ERROR_WINDOW_SECONDS = 3600
+
+# Maintenance folds old minute rollups into hourly ones; every count is in
+# exactly one of the two tables.
+DASHBOARD_ROLLUP_SOURCE = "(SELECT * FROM log_rollup_minute UNION ALL SELECT * FROM log_rollup_hour)"
+
+def rollup_window_start(window_seconds, now=None):
+    """First rollup bucket that falls inside the last window_seconds."""
+    window_start = (now if now is not None else time.time()) - window_seconds
+    return int(window_start // db_migrations.ROLLUP_BUCKET_SECONDS) * db_migrations.ROLLUP_BUCKET_SECONDS
+
+def get_dashboard_data(window_seconds=DASHBOARD_WINDOW_SECONDS):
+    # Everything here reads the per-minute rollups and boot_sessions tables that
+    # are maintained on insert, so cost depends on the window, not on table size.
+    # With sharding, each shard overlapping the window is aggregated and merged.
+    # Top identifiers and priorities cover the last window_seconds, or all time
+    # when it is 0 (older history is read from the hourly rollups); the error
+    # count always covers DASHBOARD_ERROR_WINDOW_SECONDS.
+    error_window_start = rollup_window_start(DASHBOARD_ERROR_WINDOW_SECONDS)
+    if window_seconds > 0:
+        window_start = rollup_window_start(window_seconds)
+        db_paths = log_databases_for_range(since=min(error_window_start, window_start))
+    else:
+        window_start = 0
+        db_paths = log_databases_for_range()
+    identifier_limit = 5 if len(db_paths) == 1 else -1
+
+    error_log_count = 0
+    identifier_counts = Counter()
+    priority_counts = Counter()
+    boots = {}
+    for db_path in db_paths:
+        with db_pool.get_pool(db_path).read() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT COALESCE(SUM(count), 0) FROM log_rollup_minute
+                WHERE bucket >= ? AND priority BETWEEN 0 AND 3
+            """, (error_window_start,))
+            error_log_count += cursor.fetchone()[0]
+
+            cursor.execute(f"""
+                SELECT identifier, SUM(count) as count
+                FROM {DASHBOARD_ROLLUP_SOURCE}
+                WHERE bucket >= ?
+                GROUP BY identifier
+                ORDER BY count DESC
+                LIMIT ?
+            """, (window_start, identifier_limit))
+            for row in cursor.fetchall():
+                identifier_counts[row['identifier']] += row['count']
+
+            cursor.execute(f"""
+                SELECT priority, SUM(count) as count
+                FROM {DASHBOARD_ROLLUP_SOURCE}
+                WHERE bucket >= ?
+                GROUP BY priority
+            """, (window_start,))
+            for row in cursor.fetchall():
+                priority_counts[row['priority']] += row['count']
+
+            cursor.execute("""
+                SELECT boot_id, first_seen, last_seen
+                FROM boot_sessions
+                ORDER BY first_seen DESC
+                LIMIT 3
+            """)
+            for row in cursor.fetchall():
+                first_seen, last_seen = boots.get(row['boot_id'], (row['first_seen'], row['last_seen']))
+                boots[row['boot_id']] = (min(first_seen, row['first_seen']), max(last_seen, row['last_seen']))
+
+    log_identifiers = [{'identifier': identifier, 'count': count} for identifier, count in identifier_counts.most_common(5)]
+    logs_by_priority = [
+        {'priority': None if priority == db_migrations.ROLLUP_UNKNOWN_PRIORITY else priority, 'count': count}
+        for priority, count in sorted(priority_counts.items())
+    ]
+
+    recent_boots = []
+    for boot_id_full, (first_seen, last_seen) in sorted(boots.items(), key=lambda item: item[1][0], reverse=True)[:3]:
         if boot_id_full:
              recent_boots.append({
                 'boot_id': boot_id_full[:8] + "...",
-                'timestamp': row['first_occurrence']
+                'timestamp': first_seen,
+                'last_seen': last_seen
             })
 
-
-    conn.close()
     return {
         "error_log_count": error_log_count,
         "log_identifiers": log_identifiers,
         "logs_by_priority": logs_by_priority,
-        "recent_boots": recent_boots
+        "recent_boots": recent_boots,
+        "window_seconds": window_seconds
+    }
+
+TEMPLATE_ROLLUP_SOURCE = "(SELECT * FROM log_template_rollup_minute UNION ALL SELECT * FROM log_template_rollup_hour)"
+TOP_TEMPLATES_DEFAULT_LIMIT = 10
+
+def get_top_templates(window_seconds=DASHBOARD_WINDOW_SECONDS, limit=TOP_TEMPLATES_DEFAULT_LIMIT):
+    """The most frequent log templates of the last window_seconds, from the template rollups.
+
+    Each database mines its own templates, so with sharding they are merged
+    by template text; template_id is the id in the newest shard having it.
+    """
+    window_start = rollup_window_start(window_seconds)
+    db_paths = log_databases_for_range(since=window_start)
+    per_database_limit = limit if len(db_paths) == 1 else -1
+    counts = Counter()
+    template_ids = {}
+    for db_path in db_paths:
+        with db_pool.get_pool(db_path).read() as conn:
+            rows = conn.execute(f"""
+                SELECT rollup.template_id, log_templates.template, SUM(rollup.count) AS count
+                FROM {TEMPLATE_ROLLUP_SOURCE} AS rollup
+                JOIN log_templates ON log_templates.id = rollup.template_id
+                WHERE rollup.bucket >= ?
+                GROUP BY rollup.template_id
+                ORDER BY count DESC
+                LIMIT ?
+            """, (window_start, per_database_limit)).fetchall()
+        for row in rows:
+            counts[row['template']] += row['count']
+            template_ids.setdefault(row['template'], row['template_id'])
+
+    return {
+        "window_seconds": window_seconds,
+        "templates": [
+            {"template_id": template_ids[template], "template": template, "count": count}
+            for template, count in counts.most_common(limit)
+        ],
+    }
+
+FACET_ROLLUP_SOURCE = "(SELECT * FROM log_facet_rollup_minute UNION ALL SELECT * FROM log_facet_rollup_hour)"
+FACET_NAMES = tuple(db_migrations.FACET_COLUMNS)
+FACET_DEFAULT_LIMIT = 20
+FACET_MAX_LIMIT = 1000
+# Above every character, so `value < prefix + FACET_PREFIX_UPPER_BOUND` ends a prefix range.
+FACET_PREFIX_UPPER_BOUND = "\U0010ffff"
+
+def facet_filter_conditions(filters, skip_facet):
+    """/api/logs-style filters as conditions on the facet rollup columns."""
+    conditions = []
+    params = []
+    exact_match = filters.get('match') == FILTER_MATCH_EXACT
+    if filters.get('priority') not in (None, '') and skip_facet != "priority":
+        conditions.append("priority = ?")
+        params.append(int(filters['priority']))
+    if filters.get('identifier') and skip_facet not in ("identifier", "unit"):
+        if exact_match:
+            conditions.append("(syslog_identifier = ? OR systemd_unit = ?)")
+            params.extend([filters['identifier'], filters['identifier']])
+        else:
+            conditions.append("(syslog_identifier LIKE ? OR systemd_unit LIKE ?)")
+            params.extend([f"%{filters['identifier']}%", f"%{filters['identifier']}%"])
+    if filters.get('unit') and skip_facet != "unit":
+        conditions.append("systemd_unit = ?")
+        params.append(filters['unit'])
+    if filters.get('hostname') and skip_facet != "hostname":
+        if exact_match:
+            conditions.append("hostname = ?")
+            params.append(filters['hostname'])
+        else:
+            conditions.append("hostname LIKE ?")
+            params.append(f"%{filters['hostname']}%")
+    return conditions, params
+
+def get_facets(facets=None, filters=None, since=None, until=None, prefix=None, limit=FACET_DEFAULT_LIMIT):
+    """Distinct identifiers, units, hostnames and priorities with their counts.
+
+    Each facet is counted under the other active filters (its own filter is
+    left out, so alternatives stay visible) and, optionally, only for values
+    starting with prefix. With neither a time range nor other filters, values
+    come from the all-time log_facet_values dictionary; otherwise from the
+    facet rollups. message/global_search filters are not applied here.
+    """
+    facets = facets or list(FACET_NAMES)
+    filters = filters or {}
+    use_dictionary = since is None and until is None and not any(
+        filters.get(key) not in (None, '') for key in ("priority", "identifier", "unit", "hostname"))
+    db_paths = log_databases_for_range() if use_dictionary else log_databases_for_range(since=since, until=until)
+    per_database_limit = limit if len(db_paths) == 1 else -1
+    counts = {facet: Counter() for facet in facets}
+
+    for db_path in db_paths:
+        with db_pool.get_pool(db_path).read() as conn:
+            for facet in facets:
+                column = db_migrations.FACET_COLUMNS[facet]
+                if use_dictionary:
+                    conditions, params = ["facet = ?"], [facet]
+                    value_column, count_column, source = "value", "count", "log_facet_values"
+                else:
+                    conditions, params = facet_filter_conditions(filters, facet)
+                    conditions.append(f"{column} != ?")
+                    params.append(db_migrations.ROLLUP_UNKNOWN_PRIORITY if facet == "priority" else db_migrations.FACET_UNKNOWN_VALUE)
+                    if since is not None:
+                        conditions.append("bucket >= ?")
+                        params.append(int(since // db_migrations.ROLLUP_BUCKET_SECONDS * db_migrations.ROLLUP_BUCKET_SECONDS))
+                    if until is not None:
+                        conditions.append("bucket < ?")
+                        params.append(until)
+                    value_column, count_column, source = column, "SUM(count)", FACET_ROLLUP_SOURCE
+                if prefix and facet != "priority":
+                    conditions.append(f"{value_column} >= ? AND {value_column} < ?")
+                    params.extend([prefix, prefix + FACET_PREFIX_UPPER_BOUND])
+                rows = conn.execute(f"""
+                    SELECT {value_column} AS value, {count_column} AS count
+                    FROM {source}
+                    WHERE {" AND ".join(conditions)}
+                    {"" if use_dictionary else f"GROUP BY {column}"}
+                    ORDER BY count DESC
+                    LIMIT ?
+                """, params + [per_database_limit]).fetchall()
+                for row in rows:
+                    if row['value'] not in (db_migrations.FACET_UNKNOWN_VALUE, db_migrations.ROLLUP_UNKNOWN_PRIORITY):
+                        counts[facet][row['value']] += row['count']
+
+    return {
+        "since": since,
+        "until": until,
+        "facets": {
+            facet: [
+                {"value": int(value) if facet == "priority" else value, "count": count}
+                for value, count in counts[facet].most_common(limit)
+            ]
+            for facet in facets
+        },
+    }
+
+HISTOGRAM_DEFAULT_WINDOW_SECONDS = 24 * 3600
+HISTOGRAM_DEFAULT_BUCKETS = 120
+HISTOGRAM_MAX_POINTS = 1000
+# Bucket sizes picked automatically; larger spans use whole multiples of a day.
+HISTOGRAM_BUCKET_STEPS_SECONDS = (60, 120, 300, 600, 900, 1800, 3600, 2 * 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400)
+
+def choose_histogram_bucket_seconds(span_seconds, bucket_seconds=None, bucket_count=HISTOGRAM_DEFAULT_BUCKETS):
+    """A bucket size (whole rollup minutes) giving at most HISTOGRAM_MAX_POINTS buckets."""
+    bucket_count = max(1, min(bucket_count, HISTOGRAM_MAX_POINTS))
+    smallest = max(span_seconds / HISTOGRAM_MAX_POINTS, db_migrations.ROLLUP_BUCKET_SECONDS)
+    if bucket_seconds:
+        target = max(bucket_seconds, smallest)
+        return -(-int(target) // db_migrations.ROLLUP_BUCKET_SECONDS) * db_migrations.ROLLUP_BUCKET_SECONDS
+    target = max(span_seconds / bucket_count, smallest)
+    for step in HISTOGRAM_BUCKET_STEPS_SECONDS:
+        if step >= target:
+            return step
+    return -(-int(target) // 86400) * 86400
+
+def get_log_histogram(since=None, until=None, bucket_seconds=None, bucket_count=HISTOGRAM_DEFAULT_BUCKETS, filters=None):
+    """Log volume per time bucket, split by priority, for charting.
+
+    Reads only the minute/hour rollup tables (primary key leads with bucket),
+    so the cost depends on the number of rollup rows in the range, never on
+    the number of log rows. Priority matches exactly; identifier and hostname
+    are substring matches like /api/logs, with identifier matched against the
+    rollup key COALESCE(syslog_identifier, systemd_unit). A unit filter (exact,
+    like /api/logs) needs systemd_unit on its own, so it reads the facet
+    rollups instead and applies all filters the way /api/facets does. Ranges
+    that were already folded into hourly rollups cannot be split finer than an
+    hour; their counts land in the bucket holding the start of the hour.
+    """
+    filters = filters or {}
+    until = time.time() if until is None else until
+    since = until - HISTOGRAM_DEFAULT_WINDOW_SECONDS if since is None else since
+    if until <= since:
+        raise ValueError("'until' must be after 'since'.")
+    bucket_seconds = choose_histogram_bucket_seconds(until - since, bucket_seconds, bucket_count)
+    first_bucket = int(since // bucket_seconds) * bucket_seconds
+    point_count = int(-(-(until - first_bucket) // bucket_seconds))
+
+    if filters.get('unit'):
+        minute_table, hour_table = "log_facet_rollup_minute", "log_facet_rollup_hour"
+        filter_conditions, params = facet_filter_conditions(filters, skip_facet=None)
+    else:
+        minute_table, hour_table = "log_rollup_minute", "log_rollup_hour"
+        filter_conditions, params = [], []
+        if filters.get('priority') not in (None, ''):
+            filter_conditions.append("priority = ?")
+            params.append(int(filters['priority']))
+        if filters.get('identifier'):
+            filter_conditions.append("identifier LIKE ?")
+            params.append(f"%{filters['identifier']}%")
+        if filters.get('hostname'):
+            filter_conditions.append("hostname LIKE ?")
+            params.append(f"%{filters['hostname']}%")
+    conditions = ["bucket >= ?", "bucket < ?"] + filter_conditions
+    # Hour rows start at the top of the hour, which may precede `since`.
+    minute_start = int(since // db_migrations.ROLLUP_BUCKET_SECONDS) * db_migrations.ROLLUP_BUCKET_SECONDS
+    hour_start = int(since // db_migrations.ROLLUP_HOUR_SECONDS) * db_migrations.ROLLUP_HOUR_SECONDS
+    queries = [
+        (minute_table, conditions, [minute_start, until] + params),
+        (hour_table, conditions, [hour_start, until] + params),
+    ]
+
+    totals = [0] * point_count
+    by_priority = {}
+    for db_path in log_databases_for_range(since, until):
+        with db_pool.get_pool(db_path).read() as conn:
+            for table, table_conditions, table_params in queries:
+                cursor = conn.execute(f"""
+                    SELECT (MAX(bucket, ?) - ?) / ? AS slot, priority, SUM(count) AS count
+                    FROM {table}
+                    WHERE {" AND ".join(table_conditions)}
+                    GROUP BY slot, priority
+                """, (first_bucket, first_bucket, bucket_seconds, *table_params))
+                for slot, priority, count in cursor:
+                    slot = min(int(slot), point_count - 1)
+                    priority_key = "unknown" if priority == db_migrations.ROLLUP_UNKNOWN_PRIORITY else str(priority)
+                    series = by_priority.setdefault(priority_key, [0] * point_count)
+                    series[slot] += count
+                    totals[slot] += count
+
+    return {
+        "since": since,
+        "until": until,
+        "bucket_seconds": bucket_seconds,
+        "buckets": [first_bucket + i * bucket_seconds for i in range(point_count)],
+        "totals": totals,
+        "by_priority": dict(sorted(by_priority.items())),
     }
 
 if __name__ == "__main__":
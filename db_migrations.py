@@ -0,0 +1,567 @@
+import sqlite3
+import logging
+import json
+
+import raw_log_codec
+import template_miner
+
+migration_logger = logging.getLogger(__name__)
+
+LOGS_TABLE_COLUMNS = [
+    ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("timestamp", "REAL"),
+    ("hostname", "TEXT"),
+    ("syslog_identifier", "TEXT"),
+    ("pid", "INTEGER"),
+    ("uid", "INTEGER"),
+    ("gid", "INTEGER"),
+    ("message", "TEXT"),
+    ("facility", "INTEGER"),
+    ("priority", "INTEGER"),
+    ("transport", "TEXT"),
+    ("source_ip", "TEXT"),
+    # Plain JSON text in old rows, a raw_log_codec blob since migration 6.
+    ("raw_log", "TEXT"),
+    ("category", "TEXT"),
+    ("journal_cursor", "TEXT"),
+]
+
+# Journal fields copied out of raw_log into their own indexed columns.
+PROMOTED_JOURNAL_FIELDS = {
+    "systemd_unit": "_SYSTEMD_UNIT",
+    "boot_id": "_BOOT_ID",
+    "comm": "_COMM",
+}
+
+def table_exists(conn, table_name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+    return row is not None
+
+def table_columns(conn, table_name):
+    """Returns {column_name: (declared_type, not_null)} for table_name."""
+    return {row[1]: (row[2].upper(), bool(row[3])) for row in conn.execute(f"PRAGMA table_info({table_name})")}
+
+def logs_table_sql(table_name="logs"):
+    column_sql = ",\n    ".join(f"{name} {declaration}" for name, declaration in LOGS_TABLE_COLUMNS)
+    return f"CREATE TABLE {table_name} (\n    {column_sql}\n)"
+
+def migration_001_unify_logs_schema(conn):
+    """Creates `logs` with one canonical schema, rebuilding older variants.
+
+    create_db.py used to declare `timestamp TEXT NOT NULL` while db_manager used
+    REAL and had no `category`; both kinds of database end up identical here.
+    """
+    if not table_exists(conn, "logs"):
+        conn.execute(logs_table_sql())
+    else:
+        existing_columns = table_columns(conn, "logs")
+        expected_columns = [name for name, _ in LOGS_TABLE_COLUMNS]
+        timestamp_declaration = existing_columns.get("timestamp", ("", False))
+        if timestamp_declaration != ("REAL", False) or any(name not in existing_columns for name in expected_columns):
+            migration_logger.info("Rebuilding 'logs' table with the unified schema.")
+            conn.execute("DROP TABLE IF EXISTS logs_migrating")
+            conn.execute(logs_table_sql("logs_migrating"))
+            select_expressions = []
+            for name in expected_columns:
+                if name not in existing_columns:
+                    select_expressions.append("NULL")
+                elif name == "timestamp":
+                    select_expressions.append("CAST(timestamp AS REAL)")
+                else:
+                    select_expressions.append(name)
+            conn.execute(
+                f"INSERT INTO logs_migrating ({', '.join(expected_columns)}) "
+                f"SELECT {', '.join(select_expressions)} FROM logs"
+            )
+            conn.execute("DROP TABLE logs")
+            conn.execute("ALTER TABLE logs_migrating RENAME TO logs")
+
+    conn.execute("""
+        UPDATE logs SET category = CASE
+            WHEN priority <= 2 THEN 'CRITICAL'
+            WHEN priority = 3 THEN 'ERROR'
+            WHEN priority = 4 THEN 'WARNING'
+            ELSE 'INFO'
+        END
+        WHERE category IS NULL
+    """)
+    conn.execute("""
+        UPDATE logs SET journal_cursor = json_extract(raw_log, '$.__CURSOR')
+        WHERE journal_cursor IS NULL AND json_valid(raw_log)
+    """)
+    removed = conn.execute("""
+        DELETE FROM logs WHERE journal_cursor IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM logs WHERE journal_cursor IS NOT NULL GROUP BY journal_cursor
+        )
+    """).rowcount
+    if removed:
+        migration_logger.info(f"Removed {removed} duplicate row(s) sharing a journal cursor.")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_logs_journal_cursor ON logs(journal_cursor)")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            file_path TEXT PRIMARY KEY,
+            device INTEGER,
+            inode INTEGER,
+            fingerprint TEXT,
+            fingerprint_length INTEGER,
+            byte_offset INTEGER NOT NULL,
+            updated_at REAL
+        )
+    ''')
+
+def migration_002_promote_journal_fields(conn):
+    existing_columns = table_columns(conn, "logs")
+    for column_name in PROMOTED_JOURNAL_FIELDS:
+        if column_name not in existing_columns:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {column_name} TEXT")
+
+    assignments = ", ".join(
+        f"{column_name} = json_extract(raw_log, '$.{journal_field}')"
+        for column_name, journal_field in PROMOTED_JOURNAL_FIELDS.items()
+    )
+    backfilled = conn.execute(f"UPDATE logs SET {assignments} WHERE json_valid(raw_log)").rowcount
+    migration_logger.info(f"Backfilled promoted journal fields for {backfilled} row(s).")
+
+# Secondary indexes on `logs` as (name, indexed columns). The journal cursor
+# index is not among them: INSERT OR IGNORE relies on it.
+QUERY_INDEXES = [
+    ("idx_logs_timestamp", "timestamp"),
+    ("idx_logs_priority_timestamp", "priority, timestamp"),
+    ("idx_logs_identifier_timestamp", "syslog_identifier, timestamp"),
+    ("idx_logs_unit_timestamp", "systemd_unit, timestamp"),
+    ("idx_logs_boot_timestamp", "boot_id, timestamp"),
+    ("idx_logs_hostname_timestamp", "hostname, timestamp"),
+]
+
+def create_query_indexes(conn):
+    for index_name, indexed_columns in QUERY_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON logs({indexed_columns})")
+
+def migration_003_add_query_indexes(conn):
+    create_query_indexes(conn)
+
+# Columns indexed by the logs_fts full-text table, in FTS column order.
+FTS_COLUMNS = ["message", "syslog_identifier", "systemd_unit", "hostname"]
+# Plain unicode61 splits identifiers such as wpa_supplicant or CTRL-EVENT-SCAN
+# into words, so searches match their parts; the prefix indexes keep the
+# prefix queries every search term becomes cheap.
+FTS_TOKENIZER = "unicode61"
+FTS_PREFIX_LENGTHS = "2 3"
+
+def create_full_text_table(conn):
+    column_list = ", ".join(FTS_COLUMNS)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+            {column_list},
+            content='logs', content_rowid='id',
+            tokenize="{FTS_TOKENIZER}", prefix='{FTS_PREFIX_LENGTHS}'
+        )
+    """)
+
+def migration_004_add_full_text_search(conn):
+    create_full_text_table(conn)
+    create_full_text_triggers(conn)
+    rebuild_full_text_index(conn)
+
+def create_full_text_triggers(conn):
+    column_list = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+    # External-content FTS5 table: the triggers keep it in sync with `logs`.
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_fts_after_insert AFTER INSERT ON logs BEGIN
+            INSERT INTO logs_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_fts_after_delete AFTER DELETE ON logs BEGIN
+            INSERT INTO logs_fts(logs_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_fts_after_update AFTER UPDATE OF {column_list} ON logs BEGIN
+            INSERT INTO logs_fts(logs_fts, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO logs_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+
+def rebuild_full_text_index(conn):
+    conn.execute("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+
+ROLLUP_BUCKET_SECONDS = 60
+# Rollup keys cannot be NULL; these stand in for missing values.
+ROLLUP_UNKNOWN_PRIORITY = -1
+ROLLUP_UNKNOWN_IDENTIFIER = "unknown"
+ROLLUP_UNKNOWN_HOSTNAME = ""
+
+def rollup_key_sql(row_alias):
+    """SQL expressions for the (bucket, priority, identifier, hostname) rollup key."""
+    return (
+        f"CAST({row_alias}timestamp / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS}",
+        f"COALESCE({row_alias}priority, {ROLLUP_UNKNOWN_PRIORITY})",
+        f"COALESCE({row_alias}syslog_identifier, {row_alias}systemd_unit, '{ROLLUP_UNKNOWN_IDENTIFIER}')",
+        f"COALESCE({row_alias}hostname, '{ROLLUP_UNKNOWN_HOSTNAME}')",
+    )
+
+def migration_005_add_dashboard_rollups(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollup_minute (
+            bucket INTEGER NOT NULL,
+            priority INTEGER NOT NULL,
+            identifier TEXT NOT NULL,
+            hostname TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (bucket, priority, identifier, hostname)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS boot_sessions (
+            boot_id TEXT PRIMARY KEY,
+            hostname TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            entry_count INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_boot_sessions_first_seen ON boot_sessions(first_seen)")
+
+    # Rollups are maintained by trigger so every ingest path (collector, JSONL
+    # import, network receiver) counts exactly the rows it actually inserted;
+    # INSERT OR IGNORE duplicates never fire it. Deleting detail rows does not
+    # decrement them, so they double as the downsampled history.
+    new_key = ", ".join(rollup_key_sql("new."))
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_rollup_after_insert AFTER INSERT ON logs
+        WHEN new.timestamp IS NOT NULL BEGIN
+            INSERT INTO log_rollup_minute (bucket, priority, identifier, hostname, count)
+            VALUES ({new_key}, 1)
+            ON CONFLICT (bucket, priority, identifier, hostname) DO UPDATE SET count = count + 1;
+            INSERT INTO boot_sessions (boot_id, hostname, first_seen, last_seen, entry_count)
+            SELECT new.boot_id, new.hostname, new.timestamp, new.timestamp, 1 WHERE new.boot_id IS NOT NULL
+            ON CONFLICT (boot_id) DO UPDATE SET
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen),
+                entry_count = entry_count + 1;
+        END
+    """)
+
+    conn.execute("DELETE FROM log_rollup_minute")
+    conn.execute("DELETE FROM boot_sessions")
+    bucket, priority, identifier, hostname = rollup_key_sql("")
+    conn.execute(f"""
+        INSERT INTO log_rollup_minute (bucket, priority, identifier, hostname, count)
+        SELECT {bucket}, {priority}, {identifier}, {hostname}, COUNT(*)
+        FROM logs WHERE timestamp IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """)
+    conn.execute("""
+        INSERT INTO boot_sessions (boot_id, hostname, first_seen, last_seen, entry_count)
+        SELECT boot_id, MIN(hostname), MIN(timestamp), MAX(timestamp), COUNT(*)
+        FROM logs WHERE boot_id IS NOT NULL AND timestamp IS NOT NULL
+        GROUP BY boot_id
+    """)
+
+RAW_LOG_COMPACTION_BATCH_SIZE = 5000
+
+def migration_006_compact_raw_log(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS raw_log_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            sample_count INTEGER NOT NULL,
+            dictionary BLOB NOT NULL
+        )
+    ''')
+    codec = raw_log_codec.RawLogCodec.load(conn)
+    if codec.active_dictionary_id == raw_log_codec.NO_DICTIONARY_ID:
+        codec.train_from_logs(conn)
+
+    column_names = raw_log_codec.RAW_LOG_SOURCE_COLUMNS
+    last_id = 0
+    compacted = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, raw_log, {', '.join(column_names)} FROM logs "
+            "WHERE id > ? AND typeof(raw_log) = 'text' AND json_valid(raw_log) ORDER BY id LIMIT ?",
+            (last_id, RAW_LOG_COMPACTION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            columns = dict(zip(column_names, row[2:]))
+            updates.append((codec.encode(json.loads(row[1]), columns), row[0]))
+        conn.executemany("UPDATE logs SET raw_log = ? WHERE id = ?", updates)
+        compacted += len(updates)
+        last_id = rows[-1][0]
+    migration_logger.info(f"Compacted raw_log of {compacted} row(s). Run VACUUM to return the freed pages to the filesystem.")
+
+ROLLUP_HOUR_SECONDS = 3600
+
+def migration_007_add_retention_tables(conn):
+    # Minute rollups older than the maintenance horizon are folded into hourly
+    # ones; dashboard queries read both, as each count lives in exactly one.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollup_hour (
+            bucket INTEGER NOT NULL,
+            priority INTEGER NOT NULL,
+            identifier TEXT NOT NULL,
+            hostname TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (bucket, priority, identifier, hostname)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS retention_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            deleted_rows INTEGER NOT NULL,
+            last_run REAL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO retention_state (id, deleted_rows, last_run) VALUES (1, 0, NULL)")
+
+TEMPLATE_BACKFILL_BATCH_SIZE = 5000
+
+def migration_008_add_log_templates(conn):
+    # Drain templates mined at ingest (template_miner.py); rows reference them
+    # by template_id and per-minute template counts are kept like log_rollup_minute.
+    if "template_id" not in table_columns(conn, "logs"):
+        conn.execute("ALTER TABLE logs ADD COLUMN template_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_template_timestamp ON logs(template_id, timestamp)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template TEXT NOT NULL,
+            token_count INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    for table_name in ("log_template_rollup_minute", "log_template_rollup_hour"):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                bucket INTEGER NOT NULL,
+                template_id INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, template_id)
+            ) WITHOUT ROWID
+        ''')
+    bucket = rollup_key_sql("new.")[0]
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_template_rollup_after_insert AFTER INSERT ON logs
+        WHEN new.template_id IS NOT NULL AND new.timestamp IS NOT NULL BEGIN
+            INSERT INTO log_template_rollup_minute (bucket, template_id, count)
+            VALUES ({bucket}, new.template_id, 1)
+            ON CONFLICT (bucket, template_id) DO UPDATE SET count = count + 1;
+        END
+    """)
+
+    miner = template_miner.DrainTemplateMiner()
+    last_id = 0
+    mined_rows = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, message FROM logs WHERE id > ? AND template_id IS NULL ORDER BY id LIMIT ?",
+            (last_id, TEMPLATE_BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        templates = miner.add_messages([row[1] for row in rows])
+        miner.persist(conn)
+        conn.executemany("UPDATE logs SET template_id = ? WHERE id = ?",
+                         [(template.id, row[0]) for row, template in zip(rows, templates) if template is not None])
+        mined_rows += len(rows)
+        last_id = rows[-1][0]
+
+    bucket = rollup_key_sql("")[0]
+    conn.execute(f"""
+        INSERT INTO log_template_rollup_minute (bucket, template_id, count)
+        SELECT {bucket}, template_id, COUNT(*)
+        FROM logs WHERE template_id IS NOT NULL AND timestamp IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, template_id) DO UPDATE SET count = count + excluded.count
+    """)
+    migration_logger.info(f"Assigned {len(miner.templates)} log template(s) to {mined_rows} existing row(s).")
+
+# Facet name -> logs column, for log_facet_values and the facet rollups.
+FACET_COLUMNS = {
+    "identifier": "syslog_identifier",
+    "unit": "systemd_unit",
+    "hostname": "hostname",
+    "priority": "priority",
+}
+FACET_UNKNOWN_VALUE = ""
+
+def facet_rollup_key_sql(row_alias):
+    """SQL expressions for the (bucket, priority, syslog_identifier, systemd_unit, hostname) facet rollup key."""
+    return (
+        rollup_key_sql(row_alias)[0],
+        f"COALESCE({row_alias}priority, {ROLLUP_UNKNOWN_PRIORITY})",
+        f"COALESCE({row_alias}syslog_identifier, '{FACET_UNKNOWN_VALUE}')",
+        f"COALESCE({row_alias}systemd_unit, '{FACET_UNKNOWN_VALUE}')",
+        f"COALESCE({row_alias}hostname, '{FACET_UNKNOWN_VALUE}')",
+    )
+
+def migration_009_add_facets(conn):
+    # Filter values for /api/facets. log_facet_values is an all-time dictionary
+    # per facet whose primary key serves prefix lookups; the facet rollups count
+    # each (priority, identifier, unit, hostname) combination per minute/hour,
+    # so windowed counts can apply the other active filters.
+    create_query_indexes(conn)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_facet_values (
+            facet TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (facet, value)
+        ) WITHOUT ROWID
+    ''')
+    for table_name in ("log_facet_rollup_minute", "log_facet_rollup_hour"):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                bucket INTEGER NOT NULL,
+                priority INTEGER NOT NULL,
+                syslog_identifier TEXT NOT NULL,
+                systemd_unit TEXT NOT NULL,
+                hostname TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, priority, syslog_identifier, systemd_unit, hostname)
+            ) WITHOUT ROWID
+        ''')
+
+    new_facet_values = " UNION ALL ".join(
+        f"SELECT '{facet}', CAST(new.{column} AS TEXT), 1, new.timestamp WHERE new.{column} IS NOT NULL"
+        for facet, column in FACET_COLUMNS.items()
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS logs_facets_after_insert AFTER INSERT ON logs
+        WHEN new.timestamp IS NOT NULL BEGIN
+            INSERT INTO log_facet_rollup_minute (bucket, priority, syslog_identifier, systemd_unit, hostname, count)
+            VALUES ({", ".join(facet_rollup_key_sql("new."))}, 1)
+            ON CONFLICT (bucket, priority, syslog_identifier, systemd_unit, hostname) DO UPDATE SET count = count + 1;
+            INSERT INTO log_facet_values (facet, value, count, last_seen)
+            {new_facet_values}
+            ON CONFLICT (facet, value) DO UPDATE SET
+                count = count + 1,
+                last_seen = MAX(last_seen, excluded.last_seen);
+        END
+    """)
+
+    conn.execute(f"""
+        INSERT INTO log_facet_rollup_minute (bucket, priority, syslog_identifier, systemd_unit, hostname, count)
+        SELECT {", ".join(facet_rollup_key_sql(""))}, COUNT(*)
+        FROM logs WHERE timestamp IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (bucket, priority, syslog_identifier, systemd_unit, hostname) DO UPDATE SET count = count + excluded.count
+    """)
+    for facet, column in FACET_COLUMNS.items():
+        conn.execute(f"""
+            INSERT INTO log_facet_values (facet, value, count, last_seen)
+            SELECT '{facet}', CAST({column} AS TEXT), COUNT(*), MAX(timestamp)
+            FROM logs WHERE {column} IS NOT NULL AND timestamp IS NOT NULL
+            GROUP BY 2
+            ON CONFLICT (facet, value) DO UPDATE SET
+                count = count + excluded.count,
+                last_seen = MAX(last_seen, excluded.last_seen)
+        """)
+
+def migration_010_add_deferred_index_marker(conn):
+    # Present while a bulk import has the secondary indexes and the full-text
+    # trigger dropped; an interrupted import is repaired from it later.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS deferred_indexes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_indexed_id INTEGER NOT NULL,
+            deferred_at REAL NOT NULL
+        )
+    ''')
+
+def restore_deferred_indexes(conn):
+    """Re-creates what a bulk import deferred (the caller commits).
+
+    Rows above the recorded id get their full-text entries, then the trigger
+    and indexes are recreated and the marker removed. Returns False when
+    nothing was deferred.
+    """
+    row = conn.execute("SELECT last_indexed_id FROM deferred_indexes WHERE id = 1").fetchone()
+    if row is None:
+        return False
+    column_list = ", ".join(FTS_COLUMNS)
+    # The trigger is recreated in the same write transaction, so no
+    # concurrently inserted row can miss its full-text entry.
+    conn.execute(f"INSERT INTO logs_fts(rowid, {column_list}) SELECT id, {column_list} FROM logs WHERE id > ?", (row[0],))
+    create_full_text_triggers(conn)
+    create_query_indexes(conn)
+    conn.execute("DELETE FROM deferred_indexes")
+    return True
+
+def migration_011_split_full_text_tokens(conn):
+    # Databases created before FTS_TOKENIZER kept '_' and '-' inside tokens,
+    # so only whole identifiers matched; rebuild logs_fts with the current
+    # tokenizer and prefix indexes.
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'logs_fts'").fetchone()
+    if row is not None and "tokenchars" not in row[0]:
+        return
+    for trigger_name in ("logs_fts_after_insert", "logs_fts_after_delete", "logs_fts_after_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+    conn.execute("DROP TABLE IF EXISTS logs_fts")
+    create_full_text_table(conn)
+    create_full_text_triggers(conn)
+    rebuild_full_text_index(conn)
+    # The rebuild indexed every row, including those of an interrupted bulk import.
+    conn.execute("UPDATE deferred_indexes SET last_indexed_id = (SELECT COALESCE(MAX(id), 0) FROM logs)")
+
+# (version, description, function). Versions are stored in PRAGMA user_version;
+# append new migrations to the end and never renumber applied ones.
+MIGRATIONS = [
+    (1, "unify logs schema and add journal cursor/import checkpoints", migration_001_unify_logs_schema),
+    (2, "promote _SYSTEMD_UNIT, _BOOT_ID and _COMM to columns", migration_002_promote_journal_fields),
+    (3, "add timestamp, priority, identifier, unit and boot indexes", migration_003_add_query_indexes),
+    (4, "add logs_fts full-text index over message, identifier, unit and hostname", migration_004_add_full_text_search),
+    (5, "add per-minute rollups and boot sessions for the dashboard", migration_005_add_dashboard_rollups),
+    (6, "store raw_log without promoted fields, compressed with a trained dictionary", migration_006_compact_raw_log),
+    (7, "add hourly rollups and retention bookkeeping", migration_007_add_retention_tables),
+    (8, "add mined log templates, template_id and per-template rollups", migration_008_add_log_templates),
+    (9, "add facet value dictionary, facet rollups and the hostname index", migration_009_add_facets),
+    (10, "add the deferred index marker for bulk imports", migration_010_add_deferred_index_marker),
+    (11, "rebuild logs_fts so '_' and '-' separate words, with prefix indexes", migration_011_split_full_text_tokens),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    """Brings the database up to LATEST_SCHEMA_VERSION. Returns the new version.
+
+    Each migration runs in its own IMMEDIATE transaction together with the
+    user_version bump, so a failed migration leaves the previous version intact
+    and concurrent processes apply each step only once.
+    """
+    current_version = get_schema_version(conn)
+    if current_version == 0 and not table_exists(conn, "logs"):
+        # Only takes effect before the first table is created; existing
+        # databases are converted with `python maintenance.py --enable-incremental-vacuum`.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migration_logger.info(f"Applying schema migration {version}: {description}")
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            migration_logger.error(f"Schema migration {version} failed; database left at version {get_schema_version(conn)}.")
+            raise
+        current_version = version
+    return current_version
@@ -0,0 +1,182 @@
+import sqlite3
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+
+import metrics
+
+READ_POOL_MAX_CONNECTIONS = 16
+READ_POOL_ACQUIRE_TIMEOUT_SECONDS = 10
+READ_CACHE_SIZE_KIB = 64 * 1024
+READ_MMAP_SIZE_BYTES = 256 * 1024 * 1024
+WRITE_CACHE_SIZE_KIB = 64 * 1024
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_SECONDS = 10
+
+pool_logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """Reusable, pre-tuned SQLite connections for one database file.
+
+    Read connections are query_only, memory-mapped and keep a large page cache
+    plus sqlite3's prepared-statement cache warm between requests. They are
+    handed out LIFO so the hottest connection is reused first, which works the
+    same under thread-per-request servers and fixed worker threads. A single
+    writer connection is serialized behind a lock.
+    """
+
+    def __init__(self, db_path, max_read_connections=READ_POOL_MAX_CONNECTIONS):
+        self.db_path = db_path
+        self.max_read_connections = max_read_connections
+        self._idle = []
+        self._checked_out = set()
+        self._open_read_connections = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stats = {
+            "read_connections_created": 0,
+            "read_acquisitions": 0,
+            "read_reuses": 0,
+            "read_wait_seconds": 0.0,
+            "read_in_use_peak": 0,
+            "write_acquisitions": 0,
+            "write_wait_seconds": 0.0,
+        }
+
+    def _connect_reader(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=metrics.InstrumentedConnection,
+                               cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA cache_size=-{READ_CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE_BYTES}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def read(self):
+        started = time.monotonic()
+        with self._condition:
+            while not self._idle and self._open_read_connections >= self.max_read_connections:
+                remaining = READ_POOL_ACQUIRE_TIMEOUT_SECONDS - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"Timed out waiting for a read connection to '{self.db_path}'.")
+                self._condition.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+                self._checked_out.add(conn)
+                self._stats["read_reuses"] += 1
+            else:
+                conn = None
+                self._open_read_connections += 1
+            self._stats["read_acquisitions"] += 1
+            self._stats["read_wait_seconds"] += time.monotonic() - started
+            in_use = self._open_read_connections - len(self._idle)
+            self._stats["read_in_use_peak"] = max(self._stats["read_in_use_peak"], in_use)
+
+        if conn is None:
+            try:
+                conn = self._connect_reader()
+            except sqlite3.Error:
+                with self._condition:
+                    self._open_read_connections -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._checked_out.add(conn)
+                self._stats["read_connections_created"] += 1
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._condition:
+                self._checked_out.discard(conn)
+                if self._closed:
+                    # The pool was closed while this connection was in use.
+                    conn.close()
+                    self._open_read_connections -= 1
+                else:
+                    self._idle.append(conn)
+                self._condition.notify()
+
+    @contextmanager
+    def write(self):
+        """The single writer connection, in WAL mode; commits on success."""
+        started = time.monotonic()
+        with self._writer_lock:
+            self._stats["write_acquisitions"] += 1
+            self._stats["write_wait_seconds"] += time.monotonic() - started
+            if self._writer is None:
+                self._writer = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, factory=metrics.InstrumentedConnection,
+                                               cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+                self._writer.row_factory = sqlite3.Row
+                self._writer.execute("PRAGMA journal_mode=WAL")
+                self._writer.execute("PRAGMA synchronous=NORMAL")
+                self._writer.execute(f"PRAGMA cache_size=-{WRITE_CACHE_SIZE_KIB}")
+                self._writer.execute("PRAGMA temp_store=MEMORY")
+            try:
+                with self._writer:
+                    yield self._writer
+            except sqlite3.Error:
+                pool_logger.error(f"Write transaction on '{self.db_path}' failed and was rolled back.")
+                raise
+            finally:
+                if self._closed:
+                    self._writer.close()
+                    self._writer = None
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats["read_connections_open"] = self._open_read_connections
+            stats["read_connections_idle"] = len(self._idle)
+            stats["read_connections_in_use"] = len(self._checked_out)
+            stats["max_read_connections"] = self.max_read_connections
+        stats["writer_open"] = self._writer is not None
+        stats["db_path"] = self.db_path
+        return stats
+
+    def close_writer(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def close(self):
+        """Closes idle connections now and checked-out ones as they are returned."""
+        with self._condition:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+            self._open_read_connections -= len(self._idle)
+            self._idle = []
+        self.close_writer()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+def all_pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+def close_pool(db_path):
+    """Closes and forgets db_path's pool, e.g. before deleting the file."""
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,383 @@
+import asyncio
+import gzip
+import json
+import logging
+import signal
+import socket
+import sqlite3
+import time
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+import db_manager
+import watchlist
+from parser import parse_syslog_message, normalize_json_entry
+
+INGEST_BIND_HOST = "0.0.0.0"
+SYSLOG_UDP_PORT = 5514
+SYSLOG_TCP_PORT = 5514
+HTTP_INGEST_PORT = 8514
+
+INGEST_QUEUE_MAX_ENTRIES = 50000
+WRITE_BATCH_MAX_ENTRIES = 5000
+WRITE_BATCH_MAX_DELAY_SECONDS = 0.2
+TCP_READ_CHUNK_BYTES = 64 * 1024
+TCP_MAX_FRAME_BYTES = 64 * 1024
+UDP_RECEIVE_BUFFER_BYTES = 8 * 1024 * 1024
+HTTP_MAX_BODY_BYTES = 16 * 1024 * 1024
+HTTP_ENQUEUE_TIMEOUT_SECONDS = 5
+STATS_LOG_INTERVAL_SECONDS = 60
+EVALUATE_WATCHLIST = True
+
+ingest_logger = logging.getLogger(__name__)
+if not ingest_logger.handlers:
+    ingest_handler = logging.StreamHandler()
+    ingest_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ingest_handler.setFormatter(ingest_formatter)
+    ingest_logger.addHandler(ingest_handler)
+    ingest_logger.setLevel(logging.INFO)
+
+HTTP_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 415: "Unsupported Media Type", 503: "Service Unavailable",
+}
+
+class SyslogFramingError(ValueError):
+    pass
+
+def split_syslog_frames(buffer, final=False):
+    """Splits a TCP byte buffer into syslog frames.
+
+    Supports both RFC 6587 framings: octet counting ("<len> <msg>") and
+    newline-delimited. Returns (frames, number of bytes consumed); what is
+    left is never longer than a frame of TCP_MAX_FRAME_BYTES plus its length
+    prefix. Raises SyslogFramingError for an octet count above
+    TCP_MAX_FRAME_BYTES, after which the stream cannot be resynchronized.
+    """
+    frames = []
+    position = 0
+    length = len(buffer)
+    while position < length:
+        if buffer[position:position + 1].isdigit():
+            space = buffer.find(b" ", position, position + 12)
+            if space != -1 and buffer[position:space].isdigit():
+                frame_length = int(buffer[position:space])
+                if frame_length > TCP_MAX_FRAME_BYTES:
+                    raise SyslogFramingError(f"Octet-counted frame of {frame_length} bytes exceeds {TCP_MAX_FRAME_BYTES}.")
+                frame_end = space + 1 + frame_length
+                if frame_end > length:
+                    break
+                frames.append(bytes(buffer[space + 1:frame_end]))
+                position = frame_end
+                continue
+        newline = buffer.find(b"\n", position)
+        if newline == -1:
+            if final or length - position > TCP_MAX_FRAME_BYTES:
+                frames.append(bytes(buffer[position:position + TCP_MAX_FRAME_BYTES]))
+                position = length
+            break
+        if newline > position:
+            frames.append(bytes(buffer[position:newline]))
+        position = newline + 1
+    return frames, position
+
+class SyslogUdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        try:
+            entry = parse_syslog_message(data, addr[0] if addr else None)
+        except Exception:
+            self.server.stats["parse_errors"] += 1
+            return
+        # UDP senders cannot be slowed down, so a full queue drops the message.
+        self.server.enqueue_nowait(entry)
+
+class IngestServer:
+    """Network log receiver: syslog over UDP/TCP and NDJSON over HTTP POST.
+
+    Every message is normalized into a journal-style dict and put on one
+    bounded queue; a single task drains it into batches for the same
+    database writer the collector uses (run in a worker thread). When the
+    queue is full, TCP connections stop being read and HTTP requests get a
+    503, so backpressure reaches the senders; UDP messages are dropped.
+    """
+
+    def __init__(self, host=INGEST_BIND_HOST, udp_port=SYSLOG_UDP_PORT, tcp_port=SYSLOG_TCP_PORT,
+                 http_port=HTTP_INGEST_PORT, queue_size=INGEST_QUEUE_MAX_ENTRIES, db_writer=None):
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.http_port = http_port
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.db_writer = db_writer
+        self.watchlist_engine = None
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer")
+        self.udp_transport = None
+        self.servers = []
+        self.tasks = []
+        self.stats = {
+            "received": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "parse_errors": 0,
+            "written": 0,
+            "write_errors": 0,
+            "batches": 0,
+        }
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.db_writer is None:
+            self.db_writer = await loop.run_in_executor(self.write_executor, db_manager.create_batch_writer)
+        if EVALUATE_WATCHLIST:
+            self.watchlist_engine = await loop.run_in_executor(self.write_executor, watchlist.WatchlistEngine)
+        self.tasks.append(asyncio.create_task(self.write_batches()))
+        self.tasks.append(asyncio.create_task(self.log_stats_periodically()))
+
+        if self.udp_port is not None:
+            udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER_BYTES)
+            udp_socket.bind((self.host, self.udp_port))
+            self.udp_transport, _ = await loop.create_datagram_endpoint(lambda: SyslogUdpProtocol(self), sock=udp_socket)
+            self.udp_port = udp_socket.getsockname()[1]
+        if self.tcp_port is not None:
+            tcp_server = await asyncio.start_server(self.handle_syslog_tcp, self.host, self.tcp_port)
+            self.tcp_port = tcp_server.sockets[0].getsockname()[1]
+            self.servers.append(tcp_server)
+        if self.http_port is not None:
+            http_server = await asyncio.start_server(self.handle_http, self.host, self.http_port)
+            self.http_port = http_server.sockets[0].getsockname()[1]
+            self.servers.append(http_server)
+        ingest_logger.info(f"Ingest server listening on {self.host}: syslog UDP {self.udp_port}, syslog TCP {self.tcp_port}, HTTP {self.http_port}.")
+
+    async def stop(self):
+        """Stops accepting messages, writes everything queued and closes the writer."""
+        if self.udp_transport is not None:
+            self.udp_transport.close()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(self.write_executor, self.db_writer.close)
+        if self.watchlist_engine is not None:
+            await asyncio.get_running_loop().run_in_executor(self.write_executor, self.watchlist_engine.close)
+        self.write_executor.shutdown()
+        ingest_logger.info(f"Ingest server stopped. {self.stats}")
+
+    def enqueue_nowait(self, entry):
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["received"] += 1
+        return True
+
+    async def enqueue(self, entry, timeout=None):
+        """Waits for queue space (the backpressure point); False on timeout."""
+        if not self.queue.full():
+            self.queue.put_nowait(entry)
+        else:
+            try:
+                await asyncio.wait_for(self.queue.put(entry), timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                return False
+        self.stats["received"] += 1
+        return True
+
+    async def write_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + WRITE_BATCH_MAX_DELAY_SECONDS
+            while len(batch) < WRITE_BATCH_MAX_ENTRIES:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # task_done() must run for every entry whatever fails, or the queue
+            # fills up for good and stop() waits forever in queue.join().
+            try:
+                try:
+                    await loop.run_in_executor(self.write_executor, self.db_writer.write_batch, batch)
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                except (sqlite3.Error, OSError) as e:
+                    self.stats["write_errors"] += len(batch)
+                    ingest_logger.error(f"Failed to write a batch of {len(batch)} received log(s): {e}")
+                except Exception:
+                    self.stats["write_errors"] += len(batch)
+                    ingest_logger.exception(f"Unexpected error writing a batch of {len(batch)} received log(s).")
+                try:
+                    if self.watchlist_engine is not None:
+                        await loop.run_in_executor(self.write_executor, self.watchlist_engine.evaluate_batch, batch)
+                except (sqlite3.Error, OSError) as e:
+                    ingest_logger.error(f"Failed to evaluate watchlist rules for {len(batch)} received log(s): {e}")
+                except Exception:
+                    ingest_logger.exception(f"Unexpected error evaluating watchlist rules for {len(batch)} received log(s).")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def log_stats_periodically(self):
+        last_logged = None
+        while True:
+            await asyncio.sleep(STATS_LOG_INTERVAL_SECONDS)
+            if self.stats != last_logged:
+                ingest_logger.info(f"Ingest stats: {self.stats}, queued: {self.queue.qsize()}")
+                last_logged = dict(self.stats)
+
+    async def handle_syslog_tcp(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        source_ip = peer[0] if peer else None
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(TCP_READ_CHUNK_BYTES)
+                buffer += data
+                try:
+                    frames, consumed = split_syslog_frames(buffer, final=not data)
+                except SyslogFramingError as e:
+                    self.stats["parse_errors"] += 1
+                    ingest_logger.warning(f"Closing syslog TCP connection from {source_ip}: {e}")
+                    break
+                del buffer[:consumed]
+                received_at = time.time()
+                for frame in frames:
+                    try:
+                        entry = parse_syslog_message(frame, source_ip, received_at)
+                    except Exception:
+                        self.stats["parse_errors"] += 1
+                        continue
+                    await self.enqueue(entry)
+                if not data:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        source_ip = peer[0] if peer else None
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send_http_response(writer, 400, {"error": "Malformed request line."}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    await self.send_http_response(writer, 411, {"error": "Send a Content-Length instead of chunked encoding."}, keep_alive=False)
+                    break
+                content_length_header = headers.get("content-length") or "0"
+                if not (content_length_header.isascii() and content_length_header.isdigit()):
+                    await self.send_http_response(writer, 400, {"error": "Invalid Content-Length header."}, keep_alive=False)
+                    break
+                content_length = int(content_length_header)
+                if content_length > HTTP_MAX_BODY_BYTES:
+                    await self.send_http_response(writer, 413, {"error": f"Body exceeds {HTTP_MAX_BODY_BYTES} bytes."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(content_length) if content_length else b""
+
+                status, payload = await self.handle_http_request(method, path.split("?", 1)[0], headers, body, source_ip)
+                await self.send_http_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http_request(self, method, path, headers, body, source_ip):
+        if path == "/health":
+            return 200, {"status": "ok", "queued": self.queue.qsize(), "stats": self.stats}
+        if path != "/ingest":
+            return 404, {"error": f"Unknown path '{path}'."}
+        if method != "POST":
+            return 405, {"error": "Use POST with a newline-delimited JSON body."}
+
+        content_encoding = headers.get("content-encoding", "").lower()
+        if content_encoding == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError, zlib.error):
+                return 400, {"error": "Body is not valid gzip."}
+        elif content_encoding not in ("", "identity"):
+            return 415, {"error": f"Unsupported Content-Encoding '{content_encoding}'."}
+
+        accepted = 0
+        invalid = 0
+        received_at = time.time()
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = normalize_json_entry(json.loads(line), source_ip, received_at)
+            except ValueError:
+                entry = None
+            if entry is None:
+                invalid += 1
+                continue
+            if not await self.enqueue(entry, timeout=HTTP_ENQUEUE_TIMEOUT_SECONDS):
+                # Entries before this one were queued; the client retries the rest.
+                return 503, {"error": "Ingest queue is full, retry later.", "accepted": accepted, "invalid": invalid}
+            accepted += 1
+        self.stats["parse_errors"] += invalid
+        return 202, {"accepted": accepted, "invalid": invalid}
+
+    async def send_http_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+async def serve_forever():
+    server = IngestServer()
+    await server.start()
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_requested.set)
+    await stop_requested.wait()
+    ingest_logger.info("Stopping ingest server, flushing queued messages...")
+    await server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(serve_forever())
@@ -0,0 +1,220 @@
+import sys
+import json
+import random
+import time
+import uuid
+
+# Synthetic `journalctl -o json` entries for benchmarks. The sources, field
+# sets and priority mix are modeled on collected_journal_logs.jsonl; the
+# number of hosts, boots and extra services sets the cardinality.
+
+DEFAULT_HOSTS = 4
+DEFAULT_BOOTS_PER_HOST = 8
+DEFAULT_EXTRA_UNITS = 200
+DEFAULT_ENTRIES_PER_SECOND = 50
+DEFAULT_SEED = 1
+SOURCE_DRAW_BLOCK = 10000
+
+# (weight, identifier, unit, transport, uid, exe, priority weights, message templates)
+# Templates are filled with str.format(n=<random int>, ip=<random address>).
+JOURNAL_SOURCES = [
+    (30, "kernel", None, "kernel", None, None, {5: 80, 6: 15, 4: 4, 7: 1}, [
+        'audit: type=1400 audit({n}.957:664): apparmor="DENIED" operation="open" class="file" profile="snap.brave.brave" name="/proc/{n}/stat" pid={n} comm="brave"',
+        "wlo1: Connection to AP 40:ed:00:33:ca:{n:02x} lost",
+        "atkbd serio0: Unknown key pressed (translated set 2, code 0x{n:02x} on isa0060/serio0).",
+        "wlo1: Limiting TX power to 27 (27 - 0) dBm as advertised by 40:ed:00:33:ca:ea",
+        "usb 1-{n}: new high-speed USB device number {n} using xhci_hcd",
+    ]),
+    (14, "wpa_supplicant", "wpa_supplicant.service", "syslog", "0", "/usr/sbin/wpa_supplicant", {5: 90, 6: 10}, [
+        "wlo1: CTRL-EVENT-SIGNAL-CHANGE above=0 signal=-{n} noise=9999 txrate=117000",
+        "wlo1: CTRL-EVENT-BEACON-LOSS",
+    ]),
+    (10, "NetworkManager", "NetworkManager.service", "journal", "0", "/usr/sbin/NetworkManager", {6: 90, 4: 8, 3: 2}, [
+        "<info>  [{n}.6143] dhcp4 (wlo1): state changed new lease, address={ip}",
+        "<info>  [{n}.2251] device (wlo1): state change: activated -> deactivating (reason 'connection-removed')",
+        "<warn>  [{n}.0031] dhcp4 (wlo1): request timed out",
+    ]),
+    (7, "CRON", "cron.service", "syslog", "0", "/usr/sbin/cron", {6: 100}, [
+        "pam_unix(cron:session): session opened for user root(uid=0) by root(uid=0)",
+        "pam_unix(cron:session): session closed for user root",
+        "(root) CMD (command -v debian-sa1 > /dev/null && debian-sa1 1 1)",
+    ]),
+    (8, "systemd", "init.scope", "journal", "0", "/usr/lib/systemd/systemd", {6: 92, 5: 5, 4: 2, 3: 1}, [
+        "Starting NetworkManager-dispatcher.service - Network Manager Script Dispatcher Service...",
+        "Started NetworkManager-dispatcher.service - Network Manager Script Dispatcher Service.",
+        "sysstat-collect.service: Deactivated successfully.",
+        "Failed to start app-{n}.service - Application worker {n}.",
+    ]),
+    (6, "systemd", "user@1000.service", "journal", "1000", "/usr/lib/systemd/systemd", {6: 95, 5: 5}, [
+        "Started app-gnome-x\\x2dterminal\\x2demulator-{n}.scope - Application launched by gsd-media-keys.",
+        "snap.brave.brave-{n}.scope: Consumed 6h 54min 23.043s CPU time.",
+    ]),
+    (5, "brave_brave.desktop", "user@1000.service", "stdout", "1000", "/snap/brave/current/opt/brave.com/brave/brave", {6: 100}, [
+        "[3800:3800:0605/203322.{n}:ERROR:gpu/command_buffer/service/shared_image/shared_image_manager.cc(401)] SharedImageManager::ProduceSkia: Trying to Produce a Skia representation from a non-existent mailbox.",
+    ]),
+    (4, "dbus-daemon", "dbus.service", "syslog", "101", "/usr/bin/dbus-daemon", {6: 90, 5: 10}, [
+        "[system] Activating via systemd: service name='org.freedesktop.nm_dispatcher' unit='dbus-org.freedesktop.nm-dispatcher.service' requested by ':1.{n}'",
+        "[system] Successfully activated service 'org.freedesktop.nm_dispatcher'",
+    ]),
+    (4, "sshd", "ssh.service", "syslog", "0", "/usr/sbin/sshd", {6: 70, 5: 20, 4: 8, 3: 2}, [
+        "Accepted publickey for deploy from {ip} port {n} ssh2: ED25519 SHA256:q6XbQ2k",
+        "Failed password for invalid user admin from {ip} port {n} ssh2",
+        "Connection closed by authenticating user root {ip} port {n} [preauth]",
+    ]),
+    (3, "sudo", "user@1000.service", "syslog", "1000", "/usr/bin/sudo", {6: 60, 5: 40}, [
+        "pam_unix(sudo:session): session opened for user root(uid=0) by zgr(uid=1000)",
+        "     zgr : TTY=pts/{n} ; PWD=/home/zgr ; USER=root ; COMMAND=/usr/bin/su",
+    ]),
+    (2, "systemd-resolved", "systemd-resolved.service", "journal", "991", "/usr/lib/systemd/systemd-resolved", {4: 70, 6: 30}, [
+        "Using degraded feature set UDP instead of UDP+EDNS0 for DNS server {ip}.",
+    ]),
+    (1, "anacron", "anacron.service", "syslog", "0", "/usr/sbin/anacron", {5: 100}, [
+        "Anacron 2.3 started on 2025-06-05",
+        "Job `cron.daily' terminated",
+    ]),
+]
+SYSLOG_FACILITIES = {"kernel": "0", "CRON": "9", "sshd": "10", "sudo": "10"}
+DEFAULT_SYSLOG_FACILITY = "3"
+# Weight of the synthetic app-N services (the long tail of units).
+EXTRA_UNITS_WEIGHT = 6
+EXTRA_UNIT_PRIORITIES = {6: 80, 4: 10, 3: 7, 2: 2, 7: 1}
+EXTRA_UNIT_MESSAGES = [
+    "request id={n} completed in {n}ms",
+    "cache miss for key user:{n}",
+    "ERROR: upstream {ip} returned 502 after {n}ms",
+    "worker {n} restarted after watchdog timeout",
+]
+
+def weighted_table(weights):
+    """Expands {value: weight} into a list for cheap rng.choice()."""
+    return [value for value, weight in weights.items() for _ in range(weight)]
+
+class JournalGenerator:
+    """Yields realistic journal entries in timestamp order, reproducibly.
+
+    Entries are spread over `hosts` machines, each rebooting `boots_per_host`
+    times over the generated period, and `extra_units` synthetic services
+    stand in for the long tail of units. Cursors are unique, so every entry
+    becomes one row.
+    """
+
+    def __init__(self, hosts=DEFAULT_HOSTS, boots_per_host=DEFAULT_BOOTS_PER_HOST, extra_units=DEFAULT_EXTRA_UNITS,
+                 entries_per_second=DEFAULT_ENTRIES_PER_SECOND, start_time=None, seed=DEFAULT_SEED):
+        self.rng = random.Random(seed)
+        self.hosts = [f"host-{index:03d}" for index in range(hosts)]
+        self.boots_per_host = max(1, boots_per_host)
+        self.entries_per_second = entries_per_second
+        self.start_time = start_time
+        self.machine_ids = {host: self.random_id() for host in self.hosts}
+        self.seqnum_ids = {host: self.random_id() for host in self.hosts}
+
+        self.sources = []
+        source_weights = []
+        for weight, identifier, unit, transport, uid, exe, priorities, templates in JOURNAL_SOURCES:
+            self.sources.append(self.build_source(identifier, unit, transport, uid, exe, priorities, templates))
+            source_weights.append(weight)
+        for index in range(extra_units):
+            identifier = f"app-{index}"
+            self.sources.append(self.build_source(identifier, f"{identifier}.service", "stdout", str(1000 + index % 50),
+                                                  f"/opt/apps/{identifier}/bin/{identifier}", EXTRA_UNIT_PRIORITIES, EXTRA_UNIT_MESSAGES))
+            source_weights.append(EXTRA_UNITS_WEIGHT / max(extra_units, 1))
+        self.source_weights = source_weights
+
+    def random_id(self):
+        return uuid.UUID(int=self.rng.getrandbits(128)).hex
+
+    def build_source(self, identifier, unit, transport, uid, exe, priorities, templates):
+        static_fields = {
+            "SYSLOG_IDENTIFIER": identifier,
+            "SYSLOG_FACILITY": SYSLOG_FACILITIES.get(identifier, DEFAULT_SYSLOG_FACILITY),
+            "_TRANSPORT": transport,
+            "_RUNTIME_SCOPE": "system",
+        }
+        if uid is not None:
+            comm = identifier.split("_")[0].lower()[:15]
+            static_fields.update({
+                "_UID": uid,
+                "_GID": uid,
+                "_COMM": comm,
+                "_EXE": exe,
+                "_CMDLINE": exe,
+                "_CAP_EFFECTIVE": "1ffffffffff" if uid == "0" else "0",
+                "_SELINUX_CONTEXT": "unconfined\n",
+            })
+        if unit is not None:
+            slice_name = "user-1000.slice" if unit.startswith("user@") else "system.slice"
+            static_fields.update({
+                "_SYSTEMD_UNIT": unit,
+                "_SYSTEMD_SLICE": slice_name,
+                "_SYSTEMD_CGROUP": f"/{slice_name}/{unit}",
+            })
+        return static_fields, weighted_table(priorities), templates, self.rng.randint(300, 40000)
+
+    def entries(self, count):
+        rng = self.rng
+        start_time = self.start_time if self.start_time is not None else time.time() - count / self.entries_per_second
+        boot_length = count / self.boots_per_host
+        source_block = []
+        host_states = {}
+        realtime_usec = int(start_time * 1_000_000)
+        mean_gap_usec = 1_000_000 / self.entries_per_second
+
+        for index in range(count):
+            if not source_block:
+                source_block = rng.choices(self.sources, weights=self.source_weights, k=SOURCE_DRAW_BLOCK)
+            static_fields, priorities, templates, pid = source_block.pop()
+            host = rng.choice(self.hosts)
+            boot_number = int(index // boot_length)
+            state = host_states.get(host)
+            if state is None or state[0] != boot_number:
+                state = [boot_number, self.random_id(), realtime_usec, rng.randint(1, 10_000_000)]
+                host_states[host] = state
+            _, boot_id, boot_started_usec, _ = state
+            state[3] += 1
+            seqnum = state[3]
+            realtime_usec += int(rng.expovariate(1.0) * mean_gap_usec) + 1
+            monotonic_usec = realtime_usec - boot_started_usec + 5_000_000
+
+            entry = dict(static_fields)
+            entry["__REALTIME_TIMESTAMP"] = str(realtime_usec)
+            entry["__MONOTONIC_TIMESTAMP"] = str(monotonic_usec)
+            entry["__SEQNUM"] = str(seqnum)
+            entry["__SEQNUM_ID"] = self.seqnum_ids[host]
+            entry["__CURSOR"] = (f"s={self.seqnum_ids[host]};i={seqnum:x};b={boot_id};m={monotonic_usec:x};"
+                                 f"t={realtime_usec:x};x={rng.getrandbits(64):016x}")
+            entry["_BOOT_ID"] = boot_id
+            entry["_MACHINE_ID"] = self.machine_ids[host]
+            entry["_HOSTNAME"] = host
+            entry["PRIORITY"] = str(rng.choice(priorities))
+            if "_UID" in entry:
+                entry["_PID"] = str(pid)
+                entry["_SOURCE_REALTIME_TIMESTAMP"] = str(realtime_usec - 70)
+            entry["MESSAGE"] = rng.choice(templates).format(
+                n=rng.randint(1, 65535), ip=f"192.168.{rng.randint(0, 3)}.{rng.randint(2, 254)}")
+            yield entry
+
+    def json_lines(self, count):
+        for entry in self.entries(count):
+            yield json.dumps(entry, ensure_ascii=False)
+
+    def write_jsonl(self, path, count):
+        """Writes count entries to path as JSONL. Returns the bytes written."""
+        written = 0
+        with open(path, 'w', encoding='utf-8') as f_out:
+            batch = []
+            for line in self.json_lines(count):
+                batch.append(line)
+                if len(batch) >= 10000:
+                    written += f_out.write("\n".join(batch) + "\n")
+                    batch.clear()
+            if batch:
+                written += f_out.write("\n".join(batch) + "\n")
+        return written
+
+if __name__ == "__main__":
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    if len(sys.argv) > 2:
+        JournalGenerator().write_jsonl(sys.argv[2], entry_count)
+    else:
+        for json_line in JournalGenerator().json_lines(entry_count):
+            sys.stdout.write(json_line + "\n")
@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import deque
+
+import metrics
+
+# Durable hand-off between the journal reader and the storage writer. The
+# reader appends raw journalctl lines to segmented, append-only spool files;
+# the writer takes batches, stores them and acknowledges each batch only after
+# it was committed. The acknowledged position (and journal cursor) is saved
+# atomically to ack.state, so after a crash the writer resumes right after the
+# last committed batch and journalctl resumes after the last spooled entry.
+#
+# Entries also go to a bounded in-memory queue while the writer keeps up; once
+# it falls SPOOL_MEMORY_MAX_ENTRIES behind, the queue spills and the writer
+# reads the backlog back from the spool files until it has caught up.
+
+SPOOL_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SPOOL_MEMORY_MAX_ENTRIES = 20000
+# The reader blocks once this much is spooled and unacknowledged, so that
+# journalctl (and journald, which keeps the entries) take the backpressure.
+SPOOL_MAX_BYTES = 2 * 1024 * 1024 * 1024
+SPOOL_FSYNC = False # fsync every append and ack: survives power loss, not just process crashes.
+SPOOL_SEGMENT_SUFFIX = ".spool"
+SPOOL_ACK_FILE = "ack.state"
+SPOOL_READ_CHUNK_BYTES = 1024 * 1024
+
+spool_logger = logging.getLogger(__name__)
+
+spool_bytes = metrics.gauge("pylog_spool_bytes", "Bytes in journal spool segments not yet deleted.")
+spool_backlog_reads_total = metrics.counter(
+    "pylog_spool_backlog_entries_total", "Spooled entries the writer read back from disk after the memory queue spilled.")
+spool_backpressure_seconds_total = metrics.counter(
+    "pylog_spool_backpressure_seconds_total", "Time the reader waited because the spool was full.")
+
+def last_journal_cursor(lines):
+    """__CURSOR of the last line that has one, parsing from the end."""
+    for line in reversed(lines):
+        try:
+            cursor = json.loads(line).get("__CURSOR")
+        except (json.JSONDecodeError, AttributeError, UnicodeDecodeError):
+            continue
+        if cursor:
+            return cursor
+    return None
+
+class SpoolBatch:
+    __slots__ = ("lines", "segment", "offset", "replayed")
+
+    def __init__(self, lines, segment, offset, replayed=False):
+        self.lines = lines
+        self.segment = segment # Position right after the batch's last line.
+        self.offset = offset
+        # Spooled before this process started: may have been stored already,
+        # if the previous run stopped between storing it and acknowledging it.
+        self.replayed = replayed
+
+class JournalSpool:
+    """Segmented append-only spool with a single appender and a single reader."""
+
+    def __init__(self, directory, segment_max_bytes=SPOOL_SEGMENT_MAX_BYTES,
+                 memory_max_entries=SPOOL_MEMORY_MAX_ENTRIES, max_bytes=SPOOL_MAX_BYTES, fsync=SPOOL_FSYNC):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.memory_max_entries = memory_max_entries
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._condition = threading.Condition()
+        self._closed = False
+        self._memory = deque() # (line, segment, end offset)
+        self._segment_sizes = {}
+        for name in os.listdir(directory):
+            if name.endswith(SPOOL_SEGMENT_SUFFIX) and name[:-len(SPOOL_SEGMENT_SUFFIX)].isdigit():
+                segment = int(name[:-len(SPOOL_SEGMENT_SUFFIX)])
+                self._segment_sizes[segment] = os.path.getsize(self.segment_path(segment))
+
+        self.acked = self._load_ack()
+        for segment in [segment for segment in self._segment_sizes if segment < self.acked["segment"]]:
+            self._remove_segment(segment)
+
+        self._write_segment = max([self.acked["segment"], *self._segment_sizes])
+        self._truncate_partial_line(self._write_segment)
+        self._write_file = open(self.segment_path(self._write_segment), "ab")
+        self._segment_sizes[self._write_segment] = self._write_file.tell()
+        self._last_cursor = self._read_last_cursor()
+        self._replay_end = (self._write_segment, self._segment_sizes[self._write_segment])
+
+        # Delivery position of the reader; everything after it is on disk.
+        self._read_segment = self.acked["segment"]
+        self._read_offset = self.acked["offset"]
+        self._spilled = self._has_disk_backlog()
+        spool_bytes.set(sum(self._segment_sizes.values()))
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"{segment:012d}{SPOOL_SEGMENT_SUFFIX}")
+
+    def _load_ack(self):
+        try:
+            with open(os.path.join(self.directory, SPOOL_ACK_FILE), "r", encoding="utf-8") as f_in:
+                acked = json.load(f_in)
+            return {"segment": int(acked["segment"]), "offset": int(acked["offset"]), "cursor": acked.get("cursor")}
+        except FileNotFoundError:
+            first_segment = min(self._segment_sizes, default=0)
+            return {"segment": first_segment, "offset": 0, "cursor": None}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Replaying from the oldest segment is safe: storage ignores journal cursors it already has.
+            spool_logger.error(f"Unreadable spool ack state in {self.directory} ({e}); replaying the whole spool.")
+            return {"segment": min(self._segment_sizes, default=0), "offset": 0, "cursor": None}
+
+    def _truncate_partial_line(self, segment):
+        """Drops a line torn by a crash in the middle of an append."""
+        path = self.segment_path(segment)
+        size = self._segment_sizes.get(segment, 0)
+        if not size:
+            return
+        with open(path, "rb+") as f_segment:
+            end = size
+            while end > 0:
+                start = max(0, end - SPOOL_READ_CHUNK_BYTES)
+                f_segment.seek(start)
+                newline = f_segment.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                spool_logger.warning(f"Truncating torn spool line at the end of {path} ({size - end} bytes).")
+                f_segment.truncate(end)
+                self._segment_sizes[segment] = end
+
+    def _read_last_cursor(self):
+        for segment in sorted(self._segment_sizes, reverse=True):
+            size = self._segment_sizes[segment]
+            if not size:
+                continue
+            with open(self.segment_path(segment), "rb") as f_segment:
+                f_segment.seek(max(0, size - SPOOL_READ_CHUNK_BYTES))
+                cursor = last_journal_cursor(f_segment.read().splitlines())
+            if cursor:
+                return cursor
+        return self.acked["cursor"]
+
+    def _has_disk_backlog(self):
+        return (self._read_segment, self._read_offset) < (self._write_segment, self._segment_sizes[self._write_segment])
+
+    def _remove_segment(self, segment):
+        try:
+            os.remove(self.segment_path(segment))
+        except FileNotFoundError:
+            pass
+        self._segment_sizes.pop(segment, None)
+
+    def last_cursor(self):
+        """Journal cursor of the newest spooled entry (where journalctl resumes)."""
+        with self._condition:
+            return self._last_cursor
+
+    def append(self, lines):
+        """Spools raw journal lines; returns the new last cursor, or None if none came with them."""
+        if not lines:
+            return None
+        data = [line if line.endswith("\n") else f"{line}\n" for line in lines]
+        encoded = [line.encode("utf-8", "replace") for line in data]
+        cursor = last_journal_cursor(data)
+
+        with self._condition:
+            waited_since = None
+            while not self._closed and sum(self._segment_sizes.values()) >= self.max_bytes:
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    spool_logger.warning(f"Journal spool is full ({self.max_bytes} bytes); waiting for storage to catch up.")
+                self._condition.wait(0.5)
+            if waited_since is not None:
+                spool_backpressure_seconds_total.inc(time.monotonic() - waited_since)
+            if self._closed:
+                raise ValueError("Journal spool is closed.")
+
+            if self._segment_sizes[self._write_segment] >= self.segment_max_bytes:
+                self._rotate_locked()
+            offset = self._segment_sizes[self._write_segment]
+            self._write_file.write(b"".join(encoded))
+            self._write_file.flush()
+            if self.fsync:
+                os.fsync(self._write_file.fileno())
+
+            for line, line_bytes in zip(data, encoded):
+                offset += len(line_bytes)
+                if not self._spilled:
+                    if len(self._memory) < self.memory_max_entries:
+                        self._memory.append((line, self._write_segment, offset))
+                    else:
+                        self._spilled = True
+            self._segment_sizes[self._write_segment] = offset
+            if cursor:
+                self._last_cursor = cursor
+            spool_bytes.set(sum(self._segment_sizes.values()))
+            self._condition.notify_all()
+        return cursor
+
+    def _rotate_locked(self):
+        if self.fsync:
+            os.fsync(self._write_file.fileno())
+        self._write_file.close()
+        self._write_segment += 1
+        self._write_file = open(self.segment_path(self._write_segment), "ab")
+        self._segment_sizes[self._write_segment] = 0
+
+    def read_batch(self, max_entries, timeout):
+        """The next unread entries (at most max_entries), or None after timeout."""
+        with self._condition:
+            deadline = time.monotonic() + timeout
+            while not self._memory and not self._spilled:
+                remaining = deadline - time.monotonic()
+                if self._closed or remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+            if self._memory:
+                lines = []
+                while self._memory and len(lines) < max_entries:
+                    line, segment, offset = self._memory.popleft()
+                    lines.append(line)
+                self._read_segment, self._read_offset = segment, offset
+                return SpoolBatch(lines, segment, offset)
+
+            segment, offset = self._read_segment, self._read_offset
+            end = self._segment_sizes.get(segment, 0)
+            is_write_segment = segment == self._write_segment
+
+        if offset >= end and not is_write_segment:
+            # Fully read: the backlog continues in the next segment.
+            with self._condition:
+                self._read_segment, self._read_offset = segment + 1, 0
+            return self.read_batch(max_entries, timeout)
+
+        replayed = (segment, offset) < self._replay_end
+        lines = []
+        with open(self.segment_path(segment), "rb") as f_segment:
+            f_segment.seek(offset)
+            while len(lines) < max_entries and offset < end:
+                line = f_segment.readline(end - offset)
+                offset += len(line)
+                lines.append(line.decode("utf-8", "replace"))
+        spool_backlog_reads_total.inc(len(lines))
+
+        with self._condition:
+            self._read_segment, self._read_offset = segment, offset
+            if not self._has_disk_backlog():
+                self._spilled = False
+        return SpoolBatch(lines, segment, offset, replayed) if lines else None
+
+    def ack(self, batch, cursor=None):
+        """Marks everything up to the end of batch as stored."""
+        with self._condition:
+            self.acked = {"segment": batch.segment, "offset": batch.offset, "cursor": cursor or self.acked["cursor"]}
+            ack_path = os.path.join(self.directory, SPOOL_ACK_FILE)
+            with open(f"{ack_path}.tmp", "w", encoding="utf-8") as f_out:
+                json.dump(self.acked, f_out)
+                if self.fsync:
+                    f_out.flush()
+                    os.fsync(f_out.fileno())
+            os.replace(f"{ack_path}.tmp", ack_path)
+            for segment in [segment for segment in self._segment_sizes if segment < batch.segment]:
+                self._remove_segment(segment)
+            spool_bytes.set(sum(self._segment_sizes.values()))
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            if self._write_file:
+                if self.fsync:
+                    os.fsync(self._write_file.fileno())
+                self._write_file.close()
+                self._write_file = None
+            self._condition.notify_all()
@@ -0,0 +1,196 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from datetime import datetime
+
+import archive_index
+
+FSYNC_NEVER = "never"
+FSYNC_ON_FLUSH = "flush"
+FSYNC_ON_ROTATE = "rotate"
+
+DEFAULT_FLUSH_MAX_BYTES = 256 * 1024
+DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_ROTATE_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_ROTATE_INTERVAL_SECONDS = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+def rotated_segment_paths(base_path):
+    """Returns closed segments of base_path (plain and gzipped), oldest first."""
+    directory = os.path.dirname(os.path.abspath(base_path))
+    stem, ext = os.path.splitext(os.path.basename(base_path))
+    prefix = f"{stem}-"
+    segments = []
+    try:
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and (name.endswith(ext) or name.endswith(f"{ext}.gz")):
+                segments.append(os.path.join(directory, name))
+    except OSError as e:
+        logger.error(f"Cannot list rotated segments in {directory}: {e}")
+    return sorted(segments)
+
+class JsonlSink:
+    """Keeps the JSONL archive open and writes journal entries in batches.
+
+    Serialized lines are buffered and written out once flush_max_bytes are
+    pending or flush_interval seconds have passed. The active file is
+    rotated by size or age into `<name>-<timestamp>.jsonl`, then gzipped
+    and/or indexed for archive_index.search_archive in a background thread.
+    """
+
+    def __init__(self, path, flush_max_bytes=DEFAULT_FLUSH_MAX_BYTES,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS, fsync_policy=FSYNC_ON_ROTATE,
+                 rotate_max_bytes=DEFAULT_ROTATE_MAX_BYTES,
+                 rotate_interval=DEFAULT_ROTATE_INTERVAL_SECONDS, compress_rotated=True, index_rotated=True):
+        if fsync_policy not in (FSYNC_NEVER, FSYNC_ON_FLUSH, FSYNC_ON_ROTATE):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.path = os.path.abspath(path)
+        self.flush_max_bytes = flush_max_bytes
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.rotate_max_bytes = rotate_max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress_rotated = compress_rotated
+        self.index_rotated = index_rotated
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._file_size = 0
+        self._segment_opened_at = time.time()
+        self._compress_threads = []
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'ab')
+        self._file_size = self._file.tell()
+        self._segment_opened_at = time.time()
+
+    def write_batch(self, log_entries):
+        if not log_entries:
+            return
+        with self._lock:
+            for log_entry in log_entries:
+                line = json.dumps(log_entry, ensure_ascii=False).encode('utf-8') + b'\n'
+                self._buffer.append(line)
+                self._buffered_bytes += len(line)
+            if self._buffered_bytes >= self.flush_max_bytes:
+                self._flush_locked()
+
+    def maybe_flush(self):
+        """Flushes pending lines if the flush interval elapsed. Call when idle."""
+        with self._lock:
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+            elif self._should_rotate():
+                self._rotate_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer and self._file:
+            data = b''.join(self._buffer)
+            self._buffer = []
+            self._buffered_bytes = 0
+            try:
+                self._file.write(data)
+                self._file.flush()
+                if self.fsync_policy == FSYNC_ON_FLUSH:
+                    os.fsync(self._file.fileno())
+                self._file_size += len(data)
+            except OSError as e:
+                logger.error(f"Failed to write {len(data)} bytes to {self.path}: {e}")
+        self._last_flush = time.monotonic()
+
+        if self._should_rotate():
+            self._rotate_locked()
+
+    def _should_rotate(self):
+        if not self._file or self._file_size == 0:
+            return False
+        if self.rotate_max_bytes and self._file_size >= self.rotate_max_bytes:
+            return True
+        if self.rotate_interval and time.time() - self._segment_opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    def _segment_path(self):
+        stem, ext = os.path.splitext(self.path)
+        stamp = datetime.fromtimestamp(self._segment_opened_at).strftime('%Y%m%dT%H%M%S')
+        candidate = f"{stem}-{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(candidate) or os.path.exists(f"{candidate}.gz"):
+            candidate = f"{stem}-{stamp}.{suffix}{ext}"
+            suffix += 1
+        return candidate
+
+    def _rotate_locked(self):
+        if self.fsync_policy != FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        segment_path = self._segment_path()
+        try:
+            os.replace(self.path, segment_path)
+            logger.info(f"Rotated {self.path} to {segment_path} ({self._file_size} bytes).")
+        except OSError as e:
+            logger.error(f"Failed to rotate {self.path}: {e}")
+            segment_path = None
+        finally:
+            self._open()
+
+        if segment_path:
+            if self.compress_rotated:
+                target, name = self._compress_segment, "jsonl-segment-gzip"
+            elif self.index_rotated:
+                target, name = self._index_segment, "jsonl-segment-index"
+            else:
+                return
+            thread = threading.Thread(target=target, args=(segment_path,), name=name, daemon=True)
+            thread.start()
+            self._compress_threads = [t for t in self._compress_threads if t.is_alive()]
+            self._compress_threads.append(thread)
+
+    def _compress_segment(self, segment_path):
+        gz_path = f"{segment_path}.gz"
+        try:
+            if self.index_rotated:
+                # One gzip member per index block, so searches can seek to blocks.
+                archive_index.compress_segment(segment_path, gz_path)
+            else:
+                with open(segment_path, 'rb') as f_in, gzip.open(f"{gz_path}.tmp", 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+                os.replace(f"{gz_path}.tmp", gz_path)
+            os.remove(segment_path)
+            logger.info(f"Compressed rotated segment to {gz_path}.")
+        except OSError as e:
+            logger.error(f"Failed to gzip rotated segment {segment_path}: {e}")
+
+    def _index_segment(self, segment_path):
+        try:
+            archive_index.build_segment_index(segment_path)
+        except OSError as e:
+            logger.error(f"Failed to index rotated segment {segment_path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._file:
+                if self.fsync_policy != FSYNC_NEVER:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+        for thread in self._compress_threads:
+            thread.join()
+        self._compress_threads = []
@@ -0,0 +1,185 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+import db_manager
+import db_pool
+
+TAIL_POLL_INTERVAL_SECONDS = 0.5
+TAIL_BATCH_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+RESUME_BACKFILL_LIMIT = 1000
+
+tail_logger = logging.getLogger(__name__)
+
+def row_matches_filters(row, filters):
+    """Server-side tail filters, with the same semantics as /api/logs."""
+    if not filters:
+        return True
+    if filters.get('priority') not in (None, '') and str(row.get('priority')) != str(filters['priority']):
+        return False
+    if filters.get('unit') and row.get('systemd_unit') != filters['unit']:
+        return False
+    if filters.get('match') == db_manager.FILTER_MATCH_EXACT:
+        if filters.get('identifier') and filters['identifier'] not in (row.get('syslog_identifier'), row.get('systemd_unit')):
+            return False
+        if filters.get('hostname') and row.get('hostname') != filters['hostname']:
+            return False
+        return True
+    identifier_filter = (filters.get('identifier') or '').lower()
+    if identifier_filter:
+        identifiers = ((row.get('syslog_identifier') or '') + '\n' + (row.get('systemd_unit') or '')).lower()
+        if identifier_filter not in identifiers:
+            return False
+    hostname_filter = (filters.get('hostname') or '').lower()
+    if hostname_filter and hostname_filter not in (row.get('hostname') or '').lower():
+        return False
+    return True
+
+class TailSubscription:
+    def __init__(self, filters):
+        self.filters = filters or {}
+        self.rows = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when the client fell too far behind and rows were dropped.
+        self.overflowed = threading.Event()
+
+    def offer(self, row):
+        if self.overflowed.is_set() or not row_matches_filters(row, self.filters):
+            return
+        try:
+            self.rows.put_nowait(row)
+        except queue.Full:
+            self.overflowed.set()
+
+class LogTailBroadcaster:
+    """Fans newly ingested rows out to every live-tail subscriber.
+
+    A single background thread tails `logs` by id and offers each new row to
+    all subscriptions, so the database sees one small indexed query per poll
+    regardless of how many clients are connected. The thread only queries
+    while at least one client is subscribed.
+
+    With sharding, late entries land in older shards, so every database from
+    db_paths_getter is tailed with its own last id; databases whose files did
+    not change since the previous poll are skipped without a query.
+    """
+
+    def __init__(self, db_paths_getter, poll_interval=TAIL_POLL_INTERVAL_SECONDS):
+        self.db_paths_getter = db_paths_getter
+        self.poll_interval = poll_interval
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_ids = None # db path -> last broadcast id, None while idle
+        self._file_signatures = {}
+
+    def subscribe(self, filters=None):
+        subscription = TailSubscription(filters)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-tail-broadcaster", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    @staticmethod
+    def fetch_rows_after(conn, last_id, limit):
+        cursor = conn.execute(
+            f"SELECT {db_manager.LOG_LIST_SELECT} FROM logs WHERE logs.id > ? ORDER BY logs.id LIMIT ?",
+            (last_id, limit)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def file_signature(db_path):
+        signature = []
+        for suffix in ("", "-wal"):
+            try:
+                file_stat = os.stat(db_path + suffix)
+                signature.append((file_stat.st_mtime_ns, file_stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def backfill(self, last_event_id, filters=None, limit=RESUME_BACKFILL_LIMIT):
+        """Rows after last_event_id for a reconnecting client.
+
+        Returns (rows, complete); complete is False when more than `limit`
+        rows were missed and the client should reload instead. Shard ids
+        grow with the shard, so this covers the event's shard and newer ones;
+        late entries written to older shards meanwhile are not replayed.
+        """
+        rows = []
+        for db_path in self.db_paths_getter():
+            with db_pool.get_pool(db_path).read() as conn:
+                rows.extend(self.fetch_rows_after(conn, last_event_id, limit + 1))
+        rows.sort(key=lambda row: row['id'])
+        complete = len(rows) <= limit
+        return [row for row in rows[:limit] if row_matches_filters(row, filters)], complete
+
+    def poll_database(self, db_path, at_start):
+        """New rows of one database (up to TAIL_BATCH_SIZE), or [] if its files are unchanged."""
+        signature = self.file_signature(db_path)
+        if signature == self._file_signatures.get(db_path) and not at_start:
+            return []
+        with db_pool.get_pool(db_path).read() as conn:
+            if db_path not in self._last_ids:
+                # Databases present when tailing starts begin at their newest
+                # row; ones created later are new in their entirety.
+                self._last_ids[db_path] = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0] if at_start else 0
+            rows = self.fetch_rows_after(conn, self._last_ids[db_path], TAIL_BATCH_SIZE)
+        if rows:
+            self._last_ids[db_path] = rows[-1]['id']
+        if len(rows) < TAIL_BATCH_SIZE:
+            self._file_signatures[db_path] = signature
+        return rows
+
+    def _run(self):
+        while True:
+            if not self.subscriber_count():
+                self._last_ids = None
+                self._file_signatures = {}
+                self._wakeup.wait(self.poll_interval * 10)
+                self._wakeup.clear()
+                continue
+
+            starting = self._last_ids is None
+            if starting:
+                self._last_ids = {}
+            more_pending = False
+            try:
+                db_paths = self.db_paths_getter()
+                for db_path in list(self._last_ids):
+                    if db_path not in db_paths:
+                        # Dropped by retention.
+                        self._last_ids.pop(db_path)
+                        self._file_signatures.pop(db_path, None)
+                for db_path in reversed(db_paths): # Oldest first
+                    rows = self.poll_database(db_path, at_start=starting)
+                    more_pending = more_pending or len(rows) == TAIL_BATCH_SIZE
+                    if rows:
+                        with self._lock:
+                            subscriptions = list(self._subscriptions)
+                        for row in rows:
+                            for subscription in subscriptions:
+                                subscription.offer(row)
+            except sqlite3.Error as e:
+                tail_logger.error(f"Live tail query failed: {e}")
+                self._wakeup.wait(self.poll_interval * 4)
+                continue
+
+            if not more_pending:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
@@ -0,0 +1,253 @@
+import os
+import sys
+import sqlite3
+import logging
+import threading
+import time
+
+import archive_index
+import db_manager
+import db_migrations
+from jsonl_sink import rotated_segment_paths
+
+DAY_SECONDS = 24 * 3600
+
+# How long detail rows are kept, by syslog priority (0 = emerg ... 7 = debug).
+# Their counts survive in the rollup tables, so the dashboard history is kept.
+RETENTION_SECONDS_BY_PRIORITY = {
+    0: 90 * DAY_SECONDS,
+    1: 90 * DAY_SECONDS,
+    2: 90 * DAY_SECONDS,
+    3: 90 * DAY_SECONDS,
+    4: 30 * DAY_SECONDS,
+    5: 14 * DAY_SECONDS,
+    6: 7 * DAY_SECONDS,
+    7: 7 * DAY_SECONDS,
+}
+RETENTION_SECONDS_UNKNOWN_PRIORITY = 7 * DAY_SECONDS
+MINUTE_ROLLUP_RETENTION_SECONDS = 30 * DAY_SECONDS
+ARCHIVE_SEGMENT_RETENTION_SECONDS = 30 * DAY_SECONDS
+
+MAINTENANCE_INTERVAL_SECONDS = 300
+MAINTENANCE_CYCLE_TIME_LIMIT_SECONDS = 30
+# Each write transaction is sized to finish in about this long, so the
+# collector and readers never wait on maintenance for more than a few ms.
+TRANSACTION_BUDGET_SECONDS = 0.003
+PAUSE_BETWEEN_TRANSACTIONS_SECONDS = 0.01
+INITIAL_BATCH_SIZE = 100
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 5000
+
+maintenance_logger = logging.getLogger(__name__)
+if not maintenance_logger.handlers:
+    maintenance_handler = logging.StreamHandler()
+    maintenance_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    maintenance_handler.setFormatter(maintenance_formatter)
+    maintenance_logger.addHandler(maintenance_handler)
+    maintenance_logger.setLevel(logging.INFO)
+
+def run_timeboxed_batches(conn, step, deadline, stop_event=None):
+    """Runs step(conn, batch_size) in short IMMEDIATE transactions.
+
+    step returns how many rows it handled; batches continue until it handles
+    fewer than asked, the deadline passes or stop_event is set. The batch size
+    adapts so each transaction takes about TRANSACTION_BUDGET_SECONDS.
+    Returns the total handled.
+    """
+    batch_size = INITIAL_BATCH_SIZE
+    total = 0
+    while time.monotonic() < deadline and not (stop_event and stop_event.is_set()):
+        started = time.monotonic()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            handled = step(conn, batch_size)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        elapsed = time.monotonic() - started
+        total += handled
+        if handled < batch_size:
+            break
+        scale = min(2.0, TRANSACTION_BUDGET_SECONDS / max(elapsed, 0.0001))
+        batch_size = int(min(MAX_BATCH_SIZE, max(MIN_BATCH_SIZE, batch_size * scale)))
+        time.sleep(PAUSE_BETWEEN_TRANSACTIONS_SECONDS)
+    return total
+
+def delete_expired_rows_step(priority_condition, priority_params, cutoff):
+    def step(conn, batch_size):
+        deleted = conn.execute(
+            f"DELETE FROM logs WHERE id IN ("
+            f"SELECT id FROM logs WHERE {priority_condition} AND timestamp < ? LIMIT ?)",
+            tuple(priority_params) + (cutoff, batch_size)
+        ).rowcount
+        if deleted:
+            conn.execute("UPDATE retention_state SET deleted_rows = deleted_rows + ?, last_run = ? WHERE id = 1",
+                         (deleted, time.time()))
+        return deleted
+    return step
+
+# (minute table, hour table, key columns after bucket) of every rollup pair.
+ROLLUP_TABLES = [
+    ("log_rollup_minute", "log_rollup_hour", ("priority", "identifier", "hostname")),
+    ("log_template_rollup_minute", "log_template_rollup_hour", ("template_id",)),
+    ("log_facet_rollup_minute", "log_facet_rollup_hour", ("priority", "syslog_identifier", "systemd_unit", "hostname")),
+]
+
+def fold_minute_rollups_step(cutoff, minute_table="log_rollup_minute", hour_table="log_rollup_hour",
+                             key_columns=("priority", "identifier", "hostname")):
+    key_list = ", ".join(key_columns)
+    group_positions = ", ".join(str(position) for position in range(1, len(key_columns) + 2))
+    def step(conn, batch_size):
+        # Fold whole minute buckets, roughly batch_size rollup rows at a time.
+        oldest = conn.execute(f"SELECT MIN(bucket) FROM {minute_table}").fetchone()[0]
+        if oldest is None or oldest >= cutoff:
+            return 0
+        row = conn.execute(
+            f"SELECT bucket FROM {minute_table} WHERE bucket < ? ORDER BY bucket LIMIT 1 OFFSET ?",
+            (cutoff, batch_size)
+        ).fetchone()
+        upper = row[0] if row else cutoff
+        if upper <= oldest:
+            upper = oldest + db_migrations.ROLLUP_BUCKET_SECONDS
+        conn.execute(f"""
+            INSERT INTO {hour_table} (bucket, {key_list}, count)
+            SELECT bucket / {db_migrations.ROLLUP_HOUR_SECONDS} * {db_migrations.ROLLUP_HOUR_SECONDS},
+                   {key_list}, SUM(count)
+            FROM {minute_table} WHERE bucket < ?
+            GROUP BY {group_positions}
+            ON CONFLICT (bucket, {key_list}) DO UPDATE SET count = count + excluded.count
+        """, (upper,))
+        return conn.execute(f"DELETE FROM {minute_table} WHERE bucket < ?", (upper,)).rowcount
+    return step
+
+def incremental_vacuum_step(conn, batch_size):
+    """Returns up to batch_size free pages to the filesystem."""
+    freelist_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if not freelist_before:
+        return 0
+    # sqlite3 steps a PRAGMA only once and incremental_vacuum frees one page
+    # per step, so ask for one page per statement.
+    for _ in range(min(batch_size, freelist_before)):
+        conn.execute("PRAGMA incremental_vacuum(1)")
+    return freelist_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def retention_policies(now):
+    """(description, SQL condition, params, cutoff) for every retention rule."""
+    policies = []
+    for priority, retention_seconds in sorted(RETENTION_SECONDS_BY_PRIORITY.items()):
+        policies.append((f"priority {priority}", "priority = ?", [priority], now - retention_seconds))
+    known_priorities = sorted(RETENTION_SECONDS_BY_PRIORITY)
+    placeholders = ", ".join("?" for _ in known_priorities)
+    policies.append(("unknown priority", f"(priority IS NULL OR priority NOT IN ({placeholders}))",
+                     known_priorities, now - RETENTION_SECONDS_UNKNOWN_PRIORITY))
+    return policies
+
+def maintain_database(db_path, deadline, stop_event=None, now=None):
+    """One maintenance pass over a single database. Returns a stats dict."""
+    now = now if now is not None else time.time()
+    stats = {"deleted_rows": 0, "folded_rollup_rows": 0, "vacuumed_pages": 0}
+    conn = sqlite3.connect(db_path, timeout=db_manager.INGEST_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        db_migrations.apply_migrations(conn)
+        for description, condition, params, cutoff in retention_policies(now):
+            deleted = run_timeboxed_batches(conn, delete_expired_rows_step(condition, params, cutoff), deadline, stop_event)
+            if deleted:
+                maintenance_logger.info(f"Deleted {deleted} expired {description} row(s) from '{db_path}'.")
+            stats["deleted_rows"] += deleted
+
+        for minute_table, hour_table, key_columns in ROLLUP_TABLES:
+            stats["folded_rollup_rows"] += run_timeboxed_batches(
+                conn, fold_minute_rollups_step(now - MINUTE_ROLLUP_RETENTION_SECONDS, minute_table, hour_table, key_columns),
+                deadline, stop_event)
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            stats["vacuumed_pages"] = run_timeboxed_batches(conn, incremental_vacuum_step, deadline, stop_event)
+        elif stats["deleted_rows"]:
+            maintenance_logger.warning(f"'{db_path}' is not in incremental auto-vacuum mode; freed pages are only reused, not returned. "
+                                       f"Run `python maintenance.py --enable-incremental-vacuum` once to convert it.")
+    finally:
+        conn.close()
+    return stats
+
+def prune_archive_segments(archive_path, now=None):
+    """Deletes rotated JSONL segments (and their sidecar indexes) older than ARCHIVE_SEGMENT_RETENTION_SECONDS."""
+    cutoff = (now if now is not None else time.time()) - ARCHIVE_SEGMENT_RETENTION_SECONDS
+    removed = 0
+    for segment_path in rotated_segment_paths(archive_path):
+        try:
+            if os.path.getmtime(segment_path) < cutoff:
+                os.remove(segment_path)
+                archive_index.remove_segment_index(segment_path)
+                removed += 1
+                maintenance_logger.info(f"Removed expired archive segment '{segment_path}'.")
+        except OSError as e:
+            maintenance_logger.error(f"Could not remove archive segment '{segment_path}': {e}")
+    return removed
+
+def run_maintenance_cycle(archive_path=None, stop_event=None):
+    """Retention, rollup folding and vacuuming for every log database, time-boxed."""
+    deadline = time.monotonic() + MAINTENANCE_CYCLE_TIME_LIMIT_SECONDS
+    totals = {"deleted_rows": 0, "folded_rollup_rows": 0, "vacuumed_pages": 0, "dropped_shards": 0, "removed_segments": 0,
+              "indexed_segments": 0}
+
+    store = db_manager.get_shard_store()
+    if store is not None:
+        totals["dropped_shards"] = len(store.drop_expired_shards())
+
+    for db_path in db_manager.log_databases_for_range():
+        if not os.path.exists(db_path):
+            continue
+        try:
+            stats = maintain_database(db_path, deadline, stop_event)
+        except sqlite3.Error as e:
+            maintenance_logger.error(f"Maintenance of '{db_path}' failed: {e}")
+            continue
+        for key, value in stats.items():
+            totals[key] += value
+
+    if archive_path:
+        totals["removed_segments"] = prune_archive_segments(archive_path)
+        # Segments rotated before sidecar indexes existed, or whose index was lost.
+        totals["indexed_segments"] = archive_index.ensure_segment_indexes(
+            rotated_segment_paths(archive_path), deadline, stop_event)
+    return totals
+
+def maintenance_loop(archive_path=None, stop_event=None, interval_seconds=MAINTENANCE_INTERVAL_SECONDS):
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            totals = run_maintenance_cycle(archive_path, stop_event)
+            if any(totals.values()):
+                maintenance_logger.info(f"Maintenance cycle finished: {totals}")
+        except Exception as e:
+            maintenance_logger.error(f"Maintenance cycle failed: {e}", exc_info=True)
+        stop_event.wait(interval_seconds)
+
+def start_maintenance_thread(archive_path=None, stop_event=None):
+    thread = threading.Thread(target=maintenance_loop, args=(archive_path, stop_event),
+                              name="log-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+def enable_incremental_vacuum(db_path):
+    """Switches an existing database to auto_vacuum=INCREMENTAL.
+
+    Requires one full VACUUM, which blocks writers for its duration, so it is
+    never done automatically.
+    """
+    conn = sqlite3.connect(db_path, timeout=db_manager.INGEST_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        maintenance_logger.info(f"'{db_path}' now uses auto_vacuum={conn.execute('PRAGMA auto_vacuum').fetchone()[0]}.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    if "--enable-incremental-vacuum" in sys.argv[1:]:
+        for db_path in db_manager.log_databases_for_range():
+            enable_incremental_vacuum(db_path)
+    else:
+        maintenance_loop(archive_path=db_manager.OUTPUT_LOG_FILE_FOR_IMPORT)
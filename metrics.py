@@ -0,0 +1,276 @@
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-process counters and histograms, rendered in the Prometheus text format.
+# Every process (web app, collector) exposes its own: the app at /metrics, the
+# collector through start_metrics_server().
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS_SECONDS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600, 86400)
+SIZE_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# Statements slower than this are logged with their EXPLAIN QUERY PLAN to the
+# `slow_queries` logger; None turns the slow-query log off.
+SLOW_QUERY_THRESHOLD_SECONDS = 0.5
+SLOW_QUERY_LOG_MAX_SQL_CHARS = 2000
+
+metrics_logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_queries")
+if not slow_query_logger.handlers:
+    slow_query_handler = logging.StreamHandler()
+    slow_query_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    slow_query_handler.setFormatter(slow_query_formatter)
+    slow_query_logger.addHandler(slow_query_handler)
+    slow_query_logger.setLevel(logging.INFO)
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(label_names, label_values, extra=None):
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def label_key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self.render_samples(items))
+        return lines
+
+    def render_samples(self, items):
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_number(value)}" for key, value in items]
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self.label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS_SECONDS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.label_key(labels)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count.
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][bucket_index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render_samples(self, items):
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le_label = f'le="{format_number(float(upper_bound))}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_number(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {count}")
+        return lines
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def register(metric):
+    """Adds metric to the registry; returns the already registered one on reload."""
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+def counter(name, documentation, label_names=()):
+    return register(Counter(name, documentation, label_names))
+
+def gauge(name, documentation, label_names=()):
+    return register(Gauge(name, documentation, label_names))
+
+def histogram(name, documentation, label_names=(), buckets=LATENCY_BUCKETS_SECONDS):
+    return register(Histogram(name, documentation, label_names, buckets))
+
+def render_prometheus_text():
+    with _registry_lock:
+        registered = sorted(_registry.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in registered:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+sql_statement_seconds = histogram(
+    "pylog_sql_statement_seconds", "Time spent executing and fetching SQLite statements.", ["statement"])
+slow_queries_total = counter(
+    "pylog_sql_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD_SECONDS.")
+
+# SQL time of the current thread's unit of work (e.g. one HTTP request).
+_sql_timing = threading.local()
+
+def start_sql_timing():
+    _sql_timing.seconds = 0.0
+
+def stop_sql_timing():
+    """Returns the SQL seconds since start_sql_timing() and stops counting."""
+    seconds = getattr(_sql_timing, "seconds", None)
+    _sql_timing.seconds = None
+    return seconds or 0.0
+
+def add_sql_time(seconds):
+    if getattr(_sql_timing, "seconds", None) is not None:
+        _sql_timing.seconds += seconds
+
+def statement_kind(sql):
+    words = sql.lstrip().split(None, 1)
+    return words[0].upper() if words else ""
+
+def log_slow_query(conn, sql, parameters, elapsed):
+    plan_lines = []
+    if statement_kind(sql) in ("SELECT", "WITH"):
+        try:
+            # A plain cursor, so explaining is not itself timed and logged.
+            for _, parent_id, _, detail in sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters):
+                plan_lines.append(f"    {'  ' if parent_id else ''}{detail}")
+        except sqlite3.Error as e:
+            plan_lines.append(f"    (no plan: {e})")
+    slow_query_logger.warning(
+        f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(sql.split())[:SLOW_QUERY_LOG_MAX_SQL_CHARS]} "
+        f"params={list(parameters)[:20] if not isinstance(parameters, dict) else parameters}"
+        + ("\n  plan:\n" + "\n".join(plan_lines) if plan_lines else "")
+    )
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records statement time, per statement kind and per request.
+
+    Fetch time counts too, since SQLite does most of a query's work while rows
+    are stepped; the slow-query check uses the execute call alone.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            sql_statement_seconds.observe(elapsed, statement=statement_kind(sql))
+            add_sql_time(elapsed)
+            if SLOW_QUERY_THRESHOLD_SECONDS is not None and elapsed >= SLOW_QUERY_THRESHOLD_SECONDS:
+                slow_queries_total.inc()
+                log_slow_query(self.connection, sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            sql_statement_seconds.observe(elapsed, statement=statement_kind(sql))
+            add_sql_time(elapsed)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            add_sql_time(time.perf_counter() - started)
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            add_sql_time(time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            add_sql_time(time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=InstrumentedConnection) for timed statements."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute does not go through cursor(), so route it explicitly.
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        metrics_logger.debug(f"{self.address_string()} {format % args}")
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serves /metrics from a daemon thread, for processes without a web app."""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    metrics_logger.info(f"Serving Prometheus metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,198 @@
+import functools
+import json
+import re
+import time
+
+from datetime import datetime
+
+# Syslog messages (RFC 5424 and the older BSD format of RFC 3164) and JSON
+# records from the network are normalized into the same journal-style dicts
+# journalctl produces, so every ingest path shares build_log_row and the DB.
+
+SYSLOG_PRI_PATTERN = re.compile(r"^<(\d{1,3})>")
+RFC5424_PATTERN = re.compile(
+    r"^(?P<version>\d{1,2}) (?P<timestamp>\S+) (?P<hostname>\S+) (?P<app_name>\S+) "
+    r"(?P<procid>\S+) (?P<msgid>\S+) (?P<rest>.*)$",
+    re.DOTALL
+)
+RFC3164_PATTERN = re.compile(
+    r"^(?P<timestamp>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?:(?P<hostname>[^\s:\[]+) )?"
+    r"(?P<tag>[^\s:\[]+)(?:\[(?P<pid>[^\]]*)\])?: ?(?P<message>.*)$",
+    re.DOTALL
+)
+RFC3164_UNTAGGED_PATTERN = re.compile(
+    r"^(?P<timestamp>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?P<hostname>\S+) (?P<message>.*)$",
+    re.DOTALL
+)
+NIL_VALUE = "-"
+DEFAULT_SYSLOG_PRIORITY = 13 # user.notice, per RFC 3164 section 4.3.3
+
+# Common non-journal JSON keys mapped onto journal fields.
+JSON_FIELD_ALIASES = {
+    "message": "MESSAGE",
+    "msg": "MESSAGE",
+    "host": "_HOSTNAME",
+    "hostname": "_HOSTNAME",
+    "app": "SYSLOG_IDENTIFIER",
+    "ident": "SYSLOG_IDENTIFIER",
+    "pid": "_PID",
+    "priority": "PRIORITY",
+    "level": "PRIORITY",
+}
+LEVEL_NAME_PRIORITIES = {
+    "emerg": 0, "alert": 1, "crit": 2, "critical": 2, "err": 3, "error": 3,
+    "warning": 4, "warn": 4, "notice": 5, "info": 6, "debug": 7,
+}
+
+def epoch_to_realtime_usec(epoch_seconds):
+    return str(int(round(epoch_seconds * 1_000_000)))
+
+def nil_to_none(value):
+    return None if value == NIL_VALUE else value
+
+def split_structured_data(rest):
+    """Splits RFC 5424 'STRUCTURED-DATA MSG' into its two parts."""
+    if rest.startswith(NIL_VALUE):
+        return None, rest[2:] if rest.startswith("- ") else rest[1:]
+    if not rest.startswith("["):
+        return None, rest
+    depth = 0
+    escaped = False
+    in_quotes = False
+    for index, char in enumerate(rest):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and char == "[":
+            depth += 1
+        elif not in_quotes and char == "]":
+            depth -= 1
+            if depth == 0 and (index + 1 == len(rest) or rest[index + 1] != "["):
+                return rest[:index + 1], rest[index + 2:]
+    return rest, ""
+
+@functools.lru_cache(maxsize=4096)
+def local_bsd_timestamp(timestamp_text, year):
+    try:
+        parsed = datetime.strptime(f"{year} {timestamp_text.replace('  ', ' ')}", "%Y %b %d %H:%M:%S")
+    except ValueError:
+        return None
+    return parsed.timestamp()
+
+def parse_rfc3164_timestamp(timestamp_text, received_at):
+    """BSD timestamps have no year or zone: assume local time in the current
+    year, or last year if that would put the message in the future."""
+    year = datetime.fromtimestamp(received_at).year
+    timestamp = local_bsd_timestamp(timestamp_text, year)
+    if timestamp is not None and timestamp - received_at > 86400:
+        timestamp = local_bsd_timestamp(timestamp_text, year - 1)
+    return timestamp
+
+def parse_syslog_message(raw_message, source_ip=None, received_at=None):
+    """Returns a journal-style dict for one RFC 5424 or RFC 3164 message."""
+    received_at = received_at if received_at is not None else time.time()
+    if isinstance(raw_message, bytes):
+        raw_message = raw_message.decode("utf-8", errors="replace")
+    raw_message = raw_message.rstrip("\r\n\x00")
+    if raw_message.startswith("\ufeff"):
+        raw_message = raw_message[1:]
+
+    pri = DEFAULT_SYSLOG_PRIORITY
+    pri_match = SYSLOG_PRI_PATTERN.match(raw_message)
+    if pri_match and int(pri_match.group(1)) <= 191:
+        pri = int(pri_match.group(1))
+        body = raw_message[pri_match.end():]
+    else:
+        body = raw_message
+
+    entry = {
+        "PRIORITY": str(pri & 7),
+        "SYSLOG_FACILITY": str(pri >> 3),
+        "_TRANSPORT": "syslog",
+    }
+    if source_ip:
+        entry["source_ip"] = source_ip
+    timestamp = None
+
+    match = RFC5424_PATTERN.match(body) if pri_match else None
+    if match and match.group("version") == "1":
+        timestamp_text = nil_to_none(match.group("timestamp"))
+        if timestamp_text:
+            try:
+                timestamp = datetime.fromisoformat(timestamp_text).timestamp()
+            except ValueError:
+                timestamp = None
+            entry["SYSLOG_TIMESTAMP"] = timestamp_text
+        hostname = nil_to_none(match.group("hostname"))
+        app_name = nil_to_none(match.group("app_name"))
+        procid = nil_to_none(match.group("procid"))
+        msgid = nil_to_none(match.group("msgid"))
+        structured_data, message = split_structured_data(match.group("rest"))
+        if message.startswith("\ufeff"):
+            message = message[1:]
+        if structured_data:
+            entry["SYSLOG_STRUCTURED_DATA"] = structured_data
+        if msgid:
+            entry["SYSLOG_MSGID"] = msgid
+    else:
+        match = RFC3164_PATTERN.match(body) or RFC3164_UNTAGGED_PATTERN.match(body)
+        if match:
+            timestamp = parse_rfc3164_timestamp(match.group("timestamp"), received_at)
+            entry["SYSLOG_TIMESTAMP"] = match.group("timestamp")
+            hostname = match.group("hostname")
+            app_name = match.groupdict().get("tag")
+            procid = match.groupdict().get("pid")
+            message = match.group("message")
+        else:
+            hostname = app_name = procid = None
+            message = body
+
+    entry["_HOSTNAME"] = hostname or source_ip
+    if app_name:
+        entry["SYSLOG_IDENTIFIER"] = app_name
+    if procid:
+        entry["SYSLOG_PID"] = procid
+        if procid.isdigit():
+            entry["_PID"] = procid
+    entry["MESSAGE"] = message
+    entry["__REALTIME_TIMESTAMP"] = epoch_to_realtime_usec(timestamp if timestamp is not None else received_at)
+    return {key: value for key, value in entry.items() if value is not None}
+
+def normalize_json_entry(record, source_ip=None, received_at=None, transport="http"):
+    """Returns a journal-style dict for one JSON record, or None if unusable.
+
+    Journal exports pass through unchanged; other records have their common
+    keys (message, host, level, ...) mapped onto journal fields.
+    """
+    if not isinstance(record, dict):
+        return None
+    entry = {}
+    for key, value in record.items():
+        journal_key = JSON_FIELD_ALIASES.get(key, key)
+        if journal_key in entry and journal_key != key:
+            continue
+        if isinstance(value, (dict, list)):
+            # Nested values are kept as JSON text, not as a Python repr.
+            value = json.dumps(value, ensure_ascii=False)
+        entry[journal_key] = value if isinstance(value, str) or value is None else str(value)
+
+    priority = entry.get("PRIORITY")
+    if isinstance(priority, str) and not priority.isdigit():
+        level_priority = LEVEL_NAME_PRIORITIES.get(priority.lower())
+        if level_priority is None:
+            del entry["PRIORITY"]
+        else:
+            entry["PRIORITY"] = str(level_priority)
+    if "MESSAGE" not in entry:
+        return None
+
+    received_at = received_at if received_at is not None else time.time()
+    entry.setdefault("__REALTIME_TIMESTAMP", epoch_to_realtime_usec(received_at))
+    entry.setdefault("_TRANSPORT", transport)
+    if source_ip:
+        entry["source_ip"] = source_ip
+        entry.setdefault("_HOSTNAME", source_ip)
+    return entry
@@ -0,0 +1,194 @@
+import json
+import struct
+import time
+import zlib
+
+from collections import Counter
+
+# Stored raw_log blobs: 1 format byte, dictionary id and dropped-field mask,
+# then the remaining journal fields as raw DEFLATE. Rows written before this
+# format keep their plain JSON text and are still decoded transparently.
+RAW_LOG_FORMAT_VERSION = 1
+RAW_LOG_HEADER = struct.Struct(">BHI")
+NO_DICTIONARY_ID = 0
+
+COMPRESSION_LEVEL = 6
+DEFLATE_WINDOW_BITS = -15
+DICTIONARY_MAX_BYTES = 32 * 1024
+DICTIONARY_SAMPLE_ROWS = 2000
+DICTIONARY_MIN_SAMPLES = 200
+
+# Journal fields that also live in a `logs` column, as (journal field, column).
+# A field is dropped from raw_log only when the column reproduces it exactly;
+# its position is its bit in the dropped-field mask, so only ever append here.
+PROMOTED_FIELD_COLUMNS = [
+    ("__REALTIME_TIMESTAMP", "timestamp"),
+    ("_HOSTNAME", "hostname"),
+    ("SYSLOG_IDENTIFIER", "syslog_identifier"),
+    ("_PID", "pid"),
+    ("_UID", "uid"),
+    ("_GID", "gid"),
+    ("MESSAGE", "message"),
+    ("SYSLOG_FACILITY", "facility"),
+    ("PRIORITY", "priority"),
+    ("_TRANSPORT", "transport"),
+    ("source_ip", "source_ip"),
+    ("__CURSOR", "journal_cursor"),
+    ("_SYSTEMD_UNIT", "systemd_unit"),
+    ("_BOOT_ID", "boot_id"),
+    ("_COMM", "comm"),
+]
+
+RAW_LOG_SOURCE_COLUMNS = [column_name for _, column_name in PROMOTED_FIELD_COLUMNS]
+
+def column_as_journal_value(column_name, value):
+    """Renders a column value the way journalctl's JSON output spells it."""
+    if value is None:
+        return None
+    if column_name == "timestamp":
+        return str(round(value * 1_000_000))
+    if isinstance(value, int):
+        return str(value)
+    return value
+
+def split_promoted_fields(log_data, columns):
+    """Returns (remaining fields, dropped-field mask) for one journal entry."""
+    remainder = dict(log_data)
+    dropped_mask = 0
+    for bit, (journal_field, column_name) in enumerate(PROMOTED_FIELD_COLUMNS):
+        value = remainder.get(journal_field)
+        if isinstance(value, str) and value == column_as_journal_value(column_name, columns.get(column_name)):
+            del remainder[journal_field]
+            dropped_mask |= 1 << bit
+    return remainder, dropped_mask
+
+def dumps_remainder(fields):
+    return json.dumps(fields, ensure_ascii=False, separators=(',', ':'))
+
+def train_dictionary(log_entries, max_bytes=DICTIONARY_MAX_BYTES):
+    """Builds a zlib preset dictionary from sample journal entries.
+
+    Counts the serialized `"FIELD":value` fragments and `"FIELD":` keys of the
+    samples and keeps the ones that save the most bytes overall. zlib finds
+    matches closest to the end of the dictionary cheapest, so the most valuable
+    fragments go last.
+    """
+    fragment_counts = Counter()
+    for log_entry in log_entries:
+        for key, value in log_entry.items():
+            key_fragment = json.dumps(key, ensure_ascii=False) + ":"
+            fragment_counts[key_fragment] += 1
+            fragment_counts[key_fragment + json.dumps(value, ensure_ascii=False, separators=(',', ':'))] += 1
+
+    scored_fragments = [
+        (count * len(fragment.encode('utf-8')), fragment.encode('utf-8'))
+        for fragment, count in fragment_counts.items() if count > 1
+    ]
+    scored_fragments.sort(reverse=True)
+
+    selected = []
+    size = 0
+    for _, fragment in scored_fragments:
+        if size + len(fragment) + 1 > max_bytes:
+            continue
+        selected.append(fragment)
+        size += len(fragment) + 1
+    selected.reverse()
+    return b",".join(selected)
+
+class RawLogCodec:
+    """Encodes journal entries into compact raw_log blobs and back.
+
+    Fields already stored in their own columns are left out of the blob, and
+    the rest is compressed with the newest trained dictionary. Old dictionaries
+    are kept forever so rows written with them stay readable.
+    """
+
+    def __init__(self, dictionaries=None):
+        self.dictionaries = dict(dictionaries or {})
+        self.active_dictionary_id = max(self.dictionaries, default=NO_DICTIONARY_ID)
+
+    @classmethod
+    def load(cls, conn):
+        rows = conn.execute("SELECT id, dictionary FROM raw_log_dictionaries").fetchall()
+        return cls({dictionary_id: bytes(dictionary) for dictionary_id, dictionary in rows})
+
+    def reload(self, conn):
+        loaded = self.load(conn)
+        self.dictionaries = loaded.dictionaries
+        self.active_dictionary_id = loaded.active_dictionary_id
+
+    def store_dictionary(self, conn, dictionary, sample_count):
+        dictionary_id = conn.execute(
+            "INSERT INTO raw_log_dictionaries (created_at, sample_count, dictionary) VALUES (?, ?, ?)",
+            (time.time(), sample_count, dictionary)
+        ).lastrowid
+        self.dictionaries[dictionary_id] = dictionary
+        self.active_dictionary_id = dictionary_id
+        return dictionary_id
+
+    def train_from_logs(self, conn, sample_rows=DICTIONARY_SAMPLE_ROWS):
+        """Trains and stores a dictionary from the newest rows in `logs`.
+
+        Returns the new dictionary id, or None if there are fewer than
+        DICTIONARY_MIN_SAMPLES rows to learn from yet.
+        """
+        rows = conn.execute(
+            f"SELECT raw_log, {', '.join(RAW_LOG_SOURCE_COLUMNS)} FROM logs ORDER BY id DESC LIMIT ?",
+            (sample_rows,)
+        ).fetchall()
+        samples = []
+        for row in rows:
+            columns = dict(zip(RAW_LOG_SOURCE_COLUMNS, row[1:]))
+            try:
+                samples.append((self.decode(row[0], columns), columns))
+            except (ValueError, KeyError, zlib.error):
+                continue
+        return self.train_from_entries(conn, samples)
+
+    def train_from_entries(self, conn, samples):
+        """Trains and stores a dictionary from (journal entry, columns) pairs.
+
+        Returns the new dictionary id, or None with fewer than
+        DICTIONARY_MIN_SAMPLES samples.
+        """
+        # Train on what is actually compressed: the fields the columns don't hold.
+        remainders = [split_promoted_fields(log_data, columns)[0] for log_data, columns in samples]
+        if len(remainders) < DICTIONARY_MIN_SAMPLES:
+            return None
+        return self.store_dictionary(conn, train_dictionary(remainders), len(remainders))
+
+    def encode(self, log_data, columns):
+        remainder, dropped_mask = split_promoted_fields(log_data, columns)
+        dictionary_id = self.active_dictionary_id
+        if dictionary_id == NO_DICTIONARY_ID:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, DEFLATE_WINDOW_BITS)
+        else:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, DEFLATE_WINDOW_BITS,
+                                          zdict=self.dictionaries[dictionary_id])
+        payload = compressor.compress(dumps_remainder(remainder).encode('utf-8')) + compressor.flush()
+        return RAW_LOG_HEADER.pack(RAW_LOG_FORMAT_VERSION, dictionary_id, dropped_mask) + payload
+
+    def decode(self, raw_log, columns):
+        """Returns the original journal entry as a dict (field order may differ)."""
+        if raw_log is None:
+            return {}
+        if isinstance(raw_log, str):
+            return json.loads(raw_log)
+
+        format_version, dictionary_id, dropped_mask = RAW_LOG_HEADER.unpack_from(raw_log)
+        if format_version != RAW_LOG_FORMAT_VERSION:
+            raise ValueError(f"Unknown raw_log format version {format_version}.")
+        if dictionary_id == NO_DICTIONARY_ID:
+            decompressor = zlib.decompressobj(DEFLATE_WINDOW_BITS)
+        elif dictionary_id in self.dictionaries:
+            decompressor = zlib.decompressobj(DEFLATE_WINDOW_BITS, zdict=self.dictionaries[dictionary_id])
+        else:
+            raise KeyError(f"raw_log dictionary {dictionary_id} is not loaded.")
+        payload = decompressor.decompress(bytes(raw_log[RAW_LOG_HEADER.size:])) + decompressor.flush()
+
+        log_data = json.loads(payload.decode('utf-8'))
+        for bit, (journal_field, column_name) in enumerate(PROMOTED_FIELD_COLUMNS):
+            if dropped_mask & (1 << bit):
+                log_data[journal_field] = column_as_journal_value(column_name, columns.get(column_name))
+        return log_data
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 1024
+
+class ResponseCache:
+    """In-process LRU cache of serialized API responses.
+
+    Entries are tagged with the ingest watermark they were computed at and are
+    only served while the database is still at that watermark, so new rows
+    invalidate them immediately without any TTL. Total body size is capped at
+    max_bytes; least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_etag(cache_key, watermark):
+        key_digest = hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest()[:16]
+        return f"{watermark}-{key_digest}"
+
+    def get(self, cache_key, watermark):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or entry[0] != watermark:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, cache_key, watermark, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._size_bytes -= len(previous[1])
+            self._entries[cache_key] = (watermark, body)
+            self._size_bytes += len(body)
+            while self._size_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted_body) = self._entries.popitem(last=False)
+                self._size_bytes -= len(evicted_body)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
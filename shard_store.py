@@ -0,0 +1,168 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+
+from datetime import datetime, timezone
+
+import db_migrations
+import db_pool
+
+SHARD_FILE_PATTERN = re.compile(r"^logs-(\d{8}T\d{6}Z)\.sqlite3$")
+SHARD_TIME_FORMAT = "%Y%m%dT%H%M%SZ"
+MIN_SHARD_INTERVAL_SECONDS = 3600
+# Row ids of shard N start above N << SHARD_ID_BITS, so ids stay unique across
+# shards (and below 2**53 for the browser) and each id names its own shard.
+SHARD_ID_BITS = 32
+
+shard_logger = logging.getLogger(__name__)
+
+class ShardStore:
+    """Time-partitioned log storage: one SQLite database per interval.
+
+    Shard N holds the entries with N * interval <= timestamp < (N + 1) *
+    interval in `logs-<UTC start>.sqlite3` under `directory`. Every shard is a
+    complete database with the usual schema, full-text index and rollups, so
+    queries run unchanged against each shard and only the shards overlapping a
+    time range are opened. Retention deletes whole files instead of rows.
+    The interval must not change once a directory holds shards.
+    """
+
+    def __init__(self, directory, interval_seconds, retention_seconds=None):
+        if interval_seconds < MIN_SHARD_INTERVAL_SECONDS:
+            raise ValueError(f"Shard interval must be at least {MIN_SHARD_INTERVAL_SECONDS} seconds.")
+        self.directory = directory
+        self.interval_seconds = int(interval_seconds)
+        self.retention_seconds = retention_seconds
+        self._ready_shards = set()
+        self._lock = threading.Lock()
+        self._watermark_cache = {}
+
+    def shard_number(self, timestamp):
+        return int(timestamp // self.interval_seconds)
+
+    def shard_number_of_id(self, log_id):
+        return log_id >> SHARD_ID_BITS
+
+    def shard_range(self, shard_number):
+        start = shard_number * self.interval_seconds
+        return start, start + self.interval_seconds
+
+    def shard_path(self, shard_number):
+        start = datetime.fromtimestamp(shard_number * self.interval_seconds, tz=timezone.utc)
+        return os.path.join(self.directory, f"logs-{start.strftime(SHARD_TIME_FORMAT)}.sqlite3")
+
+    def list_shards(self):
+        """Numbers of the shards on disk, oldest first."""
+        try:
+            file_names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        shard_numbers = []
+        for file_name in file_names:
+            match = SHARD_FILE_PATTERN.match(file_name)
+            if match:
+                start = datetime.strptime(match.group(1), SHARD_TIME_FORMAT).replace(tzinfo=timezone.utc)
+                shard_numbers.append(self.shard_number(start.timestamp()))
+        return sorted(shard_numbers)
+
+    def shards_for_range(self, since=None, until=None, newest_first=True):
+        """Shards that can hold entries with since <= timestamp <= until."""
+        selected = []
+        for shard_number in self.list_shards():
+            start, end = self.shard_range(shard_number)
+            if since is not None and end <= since:
+                continue
+            if until is not None and start > until:
+                continue
+            selected.append(shard_number)
+        return selected[::-1] if newest_first else selected
+
+    def ensure_shard(self, shard_number):
+        """Creates and migrates the shard's database if needed; returns its path."""
+        path = self.shard_path(shard_number)
+        with self._lock:
+            if shard_number in self._ready_shards:
+                return path
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=db_pool.BUSY_TIMEOUT_SECONDS)
+            try:
+                db_migrations.apply_migrations(conn)
+                with conn:
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) SELECT 'logs', ? "
+                        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'logs')",
+                        (shard_number << SHARD_ID_BITS,)
+                    )
+            finally:
+                conn.close()
+            self._ready_shards.add(shard_number)
+        return path
+
+    def drop_expired_shards(self, now=None):
+        """Deletes the files of shards entirely older than the retention period.
+
+        Returns the dropped shard numbers.
+        """
+        if not self.retention_seconds:
+            return []
+        cutoff = (now if now is not None else time.time()) - self.retention_seconds
+        dropped = []
+        for shard_number in self.list_shards():
+            if self.shard_range(shard_number)[1] > cutoff:
+                break
+            path = self.shard_path(shard_number)
+            db_pool.close_pool(path)
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._ready_shards.discard(shard_number)
+                self._watermark_cache.pop(shard_number, None)
+            dropped.append(shard_number)
+            shard_logger.info(f"Dropped expired log shard '{path}'.")
+        return dropped
+
+    def _shard_file_state(self, path):
+        state = []
+        for suffix in ("", "-wal"):
+            try:
+                file_stat = os.stat(path + suffix)
+                state.append((file_stat.st_mtime_ns, file_stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def ingest_watermark(self):
+        """Changes whenever any shard gains or deletes rows or a shard is dropped.
+
+        Per-shard sequence values are cached against the file's and WAL's
+        mtime/size, so only shards written since the last call are queried.
+        """
+        shard_numbers = self.list_shards()
+        if not shard_numbers:
+            return "0"
+        change_total = 0
+        for shard_number in shard_numbers:
+            path = self.shard_path(shard_number)
+            file_state = self._shard_file_state(path)
+            cached = self._watermark_cache.get(shard_number)
+            if cached and cached[0] == file_state:
+                change_total += cached[1]
+                continue
+            try:
+                with db_pool.get_pool(path).read() as conn:
+                    row = conn.execute(
+                        "SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'logs'), "
+                        "COALESCE((SELECT deleted_rows FROM retention_state WHERE id = 1), 0)"
+                    ).fetchone()
+            except sqlite3.OperationalError:
+                continue
+            changes = (row[0] - (shard_number << SHARD_ID_BITS) if row[0] else 0) + row[1]
+            self._watermark_cache[shard_number] = (file_state, changes)
+            change_total += changes
+        return f"{shard_numbers[0]}.{change_total}"
@@ -4,15 +4,24 @@ document.addEventListener('DOMContentLoaded', function() {
     const mainJournalTableBody = document.getElementById('events-table-body');
     const dashboardJournalTableBody = document.getElementById('dashboard-events-table-body');
     const errorLogCountElement = document.getElementById('error-log-count');
+    const dashboardWindowSelect = document.getElementById('dashboard-window-select');
     const logIdentifiersChartCtx = document.getElementById('logIdentifiersChart')?.getContext('2d');
     const logsByPriorityChartCtx = document.getElementById('logsByPriorityChart')?.getContext('2d');
+    const logVolumeChartCtx = document.getElementById('logVolumeChart')?.getContext('2d');
     const logsByPriorityLegendContainer = document.getElementById('logsByPriorityLegend');
     const bootListElement = document.getElementById('boot-list');
+    const patternListElement = document.getElementById('pattern-list');
+    const watchlistRulesTableBody = document.getElementById('watchlist-rules-table-body');
+    const watchlistAlertsContainer = document.getElementById('watchlist-alerts-container');
+    const watchlistAddBtn = document.getElementById('watchlist-add-btn');
     const msgFilter = document.getElementById('journal-message-filter');
     const prioFilter = document.getElementById('journal-priority-filter');
     const idFilter = document.getElementById('journal-identifier-filter');
     const hostFilter = document.getElementById('journal-hostname-filter');
+    const idFilterValues = document.getElementById('journal-identifier-values');
+    const hostFilterValues = document.getElementById('journal-hostname-values');
     const applyFiltersBtn = document.getElementById('journal-apply-filters-btn');
+    const liveTailBtn = document.getElementById('journal-live-tail-btn');
     const globalSearchInput = document.getElementById('global-journal-search');
 
     const prevPageBtn = document.getElementById('prev-page-btn');
@@ -20,7 +29,11 @@ document.addEventListener('DOMContentLoaded', function() {
     const pageInfoSpan = document.getElementById('page-info');
     let currentPage = 1;
     let totalPages = 1;
+    let nextPageCursor = null; // Sunucudan gelen opak keyset sayfalama token'ları
+    let prevPageCursor = null;
     const logsPerPage = 20; // Sunucu tarafıyla senkronize olmalı
+    const liveTailMaxRows = 200;
+    let liveTailSource = null;
 
     function formatJournalTimestamp(epochSeconds) {
         if (!epochSeconds) return '-';
@@ -48,14 +61,15 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    async function fetchAndPopulateJournalTable(page = 1, filters = {}) {
+    async function fetchAndPopulateJournalTable(page = 1, filters = {}, pageCursor = null) {
         if (!mainJournalTableBody) return;
 
         let queryParams = new URLSearchParams({
-            page: page,
+            paging: 'cursor',
             per_page: logsPerPage,
             ...filters 
         });
+        if (pageCursor) queryParams.set('cursor', pageCursor);
 
         try {
             const response = await fetch(`${API_BASE_URL}/logs?${queryParams.toString()}`);
@@ -66,42 +80,109 @@ document.addEventListener('DOMContentLoaded', function() {
 
             mainJournalTableBody.innerHTML = ''; // Tabloyu temizle
             if (data.logs && data.logs.length > 0) {
-                data.logs.forEach(entry => {
-                    const row = mainJournalTableBody.insertRow();
-                    const priorityInfo = getPriorityTextAndClass(entry.priority);
-                    const message = entry.message || '-';
-                    const identifier = entry.syslog_identifier || entry._COMM || entry._SYSTEMD_UNIT || '-';
-
-                    row.innerHTML = `
-                        <td>${formatJournalTimestamp(entry.timestamp)}</td>
-                        <td>${entry.hostname || '-'}</td>
-                        <td class="${priorityInfo.class}">${priorityInfo.text}</td>
-                        <td>${identifier}</td>
-                        <td>${entry.pid || '-'}</td>
-                        <td class="message-col">${message}</td>
-                        <td>${entry.transport || '-'}</td>
-                        <td><button class="action-btn" data-log-id="${entry.id}"><i class="fas fa-search-plus"></i> View</button></td>
-                    `;
-                    row.querySelector('.action-btn').addEventListener('click', function() {
-                        showLogDetails(entry); // Detay gösterme fonksiyonu
-                    });
-                });
+                data.logs.forEach(entry => renderJournalRow(entry));
             } else {
                 mainJournalTableBody.innerHTML = '<tr><td colspan="8" style="text-align:center;">No logs found.</td></tr>';
             }
 
             // Sayfalama bilgisini güncelle
-            currentPage = data.page;
+            currentPage = page;
             totalPages = data.total_pages;
-            if (pageInfoSpan) pageInfoSpan.textContent = `Page ${currentPage} / ${totalPages}`;
-            if (prevPageBtn) prevPageBtn.disabled = currentPage === 1;
-            if (nextPageBtn) nextPageBtn.disabled = currentPage === totalPages;
+            nextPageCursor = data.next;
+            prevPageCursor = data.prev;
+            const totalText = totalPages === null ? '?' : `${data.total_is_estimate ? '~' : ''}${Math.max(totalPages, 1)}`;
+            if (pageInfoSpan) pageInfoSpan.textContent = `Page ${currentPage} / ${totalText}`;
+            if (prevPageBtn) prevPageBtn.disabled = !prevPageCursor;
+            if (nextPageBtn) nextPageBtn.disabled = !nextPageCursor;
 
         } catch (error) {
             console.error('Error fetching logs:', error);
             if (mainJournalTableBody) mainJournalTableBody.innerHTML = '<tr><td colspan="8" style="text-align:center;">Error loading logs.</td></tr>';
         }
     }
+    function renderJournalRow(entry, rowIndex = -1) {
+        const row = mainJournalTableBody.insertRow(rowIndex);
+        const priorityInfo = getPriorityTextAndClass(entry.priority);
+        // Arama eşleşmeleri <mark> ile vurgulanır (metin önce escape edilir)
+        const message = entry.message_snippet ? highlightSnippet(entry.message_snippet) : escapeHtml(entry.message || '-');
+        const identifier = entry.syslog_identifier || entry._COMM || entry._SYSTEMD_UNIT || '-';
+
+        row.innerHTML = `
+            <td>${formatJournalTimestamp(entry.timestamp)}</td>
+            <td>${escapeHtml(entry.hostname || '-')}</td>
+            <td class="${priorityInfo.class}">${priorityInfo.text}</td>
+            <td>${escapeHtml(identifier)}</td>
+            <td>${escapeHtml(String(entry.pid || '-'))}</td>
+            <td class="message-col">${message}</td>
+            <td>${escapeHtml(entry.transport || '-')}</td>
+            <td><button class="action-btn" data-log-id="${entry.id}"><i class="fas fa-search-plus"></i> View</button></td>
+        `;
+        row.querySelector('.action-btn').addEventListener('click', function() {
+            openLogDetails(entry); // Detay gösterme fonksiyonu
+        });
+        return row;
+    }
+
+    // --- Canlı Takip (Live Tail, Server-Sent Events) ---
+    // Yeni satırlar tabloyu yeniden çizmeden en üste eklenir. EventSource koptuğunda
+    // Last-Event-ID ile otomatik olarak kaldığı yerden devam eder.
+    function startLiveTail() {
+        if (liveTailSource || !mainJournalTableBody) return;
+        const filters = getCurrentFilters();
+        const queryParams = new URLSearchParams();
+        ['priority', 'identifier', 'hostname', 'match'].forEach(key => {
+            if (filters[key]) queryParams.set(key, filters[key]);
+        });
+
+        liveTailSource = new EventSource(`${API_BASE_URL}/logs/stream?${queryParams.toString()}`);
+        liveTailSource.addEventListener('log', (event) => {
+            const entry = JSON.parse(event.data);
+            if (mainJournalTableBody.querySelector('td[colspan]')) mainJournalTableBody.innerHTML = '';
+            renderJournalRow(entry, 0);
+            while (mainJournalTableBody.rows.length > liveTailMaxRows) {
+                mainJournalTableBody.deleteRow(-1);
+            }
+        });
+        liveTailSource.addEventListener('reset', () => {
+            // Sunucu çok fazla satır kaçırdığımızı bildirdi: tabloyu baştan yükle.
+            stopLiveTail();
+            fetchAndPopulateJournalTable(1, getCurrentFilters()).then(startLiveTail);
+        });
+
+        if (liveTailBtn) {
+            liveTailBtn.classList.add('live-tail-active');
+            liveTailBtn.innerHTML = '<i class="fas fa-stop"></i> Stop Tail';
+        }
+        if (prevPageBtn) prevPageBtn.disabled = true;
+        if (nextPageBtn) nextPageBtn.disabled = true;
+        if (pageInfoSpan) pageInfoSpan.textContent = 'Live';
+    }
+
+    function stopLiveTail() {
+        if (liveTailSource) {
+            liveTailSource.close();
+            liveTailSource = null;
+        }
+        if (liveTailBtn) {
+            liveTailBtn.classList.remove('live-tail-active');
+            liveTailBtn.innerHTML = '<i class="fas fa-satellite-dish"></i> Live Tail';
+        }
+    }
+
+    // Tam journal kaydı (sıkıştırılmış raw_log) yalnızca detay açılınca sunucudan istenir.
+    async function openLogDetails(entry) {
+        try {
+            const response = await fetch(`${API_BASE_URL}/logs/${entry.id}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            showLogDetails(await response.json());
+        } catch (error) {
+            console.error('Error fetching log details:', error);
+            showLogDetails(entry);
+        }
+    }
+
     // --- Detay Gösterme Fonksiyonu (Modal) ---
     function showLogDetails(logEntry) {
         // Basit bir modal oluşturma
@@ -133,12 +214,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 let value = logEntry[key];
                 if (key === "timestamp") {
                     value = formatJournalTimestamp(value) + ` (${value})`;
+                } else if (key === "message_snippet" && typeof value === 'string') {
+                    value = highlightSnippet(value);
                 } else if (key === "raw_log" && typeof value === 'string' && value.length > 300) {
-                    value = `<pre style="white-space: pre-wrap; word-break: break-all; max-height: 200px; overflow-y: auto; background-color: var(--primary-bg); padding: 5px; border-radius: 4px;">${value.substring(0,300)}...</pre> <button onclick="this.previousElementSibling.innerHTML='${escapeHtml(value)}'; this.remove();">Show Full Raw Log</button>`;
+                    // Tam metin butona tıklanınca textContent ile yazılır (HTML olarak yorumlanmaz)
+                    value = `<pre class="raw-log-preview" style="white-space: pre-wrap; word-break: break-all; max-height: 200px; overflow-y: auto; background-color: var(--primary-bg); padding: 5px; border-radius: 4px;">${escapeHtml(value.substring(0,300))}...</pre> <button class="raw-log-expand-btn">Show Full Raw Log</button>`;
                 } else if (typeof value === 'object' && value !== null) {
-                    value = `<pre style="white-space: pre-wrap; word-break: break-all;">${JSON.stringify(value, null, 2)}</pre>`;
+                    value = `<pre style="white-space: pre-wrap; word-break: break-all;">${escapeHtml(JSON.stringify(value, null, 2))}</pre>`;
+                } else {
+                    value = escapeHtml(value);
                 }
-                detailsHtml += `<p><strong>${key.toUpperCase()}:</strong> ${value === null || value === undefined ? '-' : value}</p>`;
+                detailsHtml += `<p><strong>${escapeHtml(key.toUpperCase())}:</strong> ${value === null || value === undefined ? '-' : value}</p>`;
             }
         }
 
@@ -153,6 +239,13 @@ document.addEventListener('DOMContentLoaded', function() {
         closeButton.style.cursor = 'pointer';
 
         modalContent.innerHTML = detailsHtml;
+        const rawLogExpandBtn = modalContent.querySelector('.raw-log-expand-btn');
+        if (rawLogExpandBtn) {
+            rawLogExpandBtn.addEventListener('click', () => {
+                modalContent.querySelector('.raw-log-preview').textContent = logEntry.raw_log;
+                rawLogExpandBtn.remove();
+            });
+        }
         modalContent.appendChild(closeButton);
         modalOverlay.appendChild(modalContent);
         document.body.appendChild(modalOverlay);
@@ -165,13 +258,19 @@ document.addEventListener('DOMContentLoaded', function() {
         };
     }
 
+    // Sunucu snippet eşleşmelerini STX/ETX (\u0002/\u0003) ile işaretler; HTML değil düz metindir.
+    function highlightSnippet(snippet) {
+        return escapeHtml(snippet).replace(/\u0002/g, '<mark>').replace(/\u0003/g, '</mark>');
+    }
+
     function escapeHtml(unsafe) {
         if (typeof unsafe !== 'string') return unsafe;
         return unsafe
-            .replace(/&/g, "&")
-            .replace(/</g, "<")
-            .replace(/>/g, ">")
-            .replace(/'/g, "'");
+            .replace(/&/g, "&amp;")
+            .replace(/</g, "&lt;")
+            .replace(/>/g, "&gt;")
+            .replace(/"/g, "&quot;")
+            .replace(/'/g, "&#039;");
     }
 
 
@@ -185,12 +284,26 @@ document.addEventListener('DOMContentLoaded', function() {
                 .replace(/\u2029/g, '\\u2029');
     }
 
+    function describeDashboardWindow(windowSeconds) {
+        if (!(windowSeconds > 0)) return 'All Time';
+        return windowSeconds % 3600 === 0
+            ? `In the Last ${windowSeconds / 3600} Hours`
+            : `In the Last ${Math.round(windowSeconds / 60)} Minutes`;
+    }
+
     async function updateDashboardWidgets() {
         try {
-            const response = await fetch(`${API_BASE_URL}/dashboard-data`);
+            const queryParams = new URLSearchParams();
+            if (dashboardWindowSelect) queryParams.set('window', dashboardWindowSelect.value);
+            const response = await fetch(`${API_BASE_URL}/dashboard-data?${queryParams.toString()}`);
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
             const data = await response.json();
 
+            // Etiketler, sunucunun gerçekten kullandığı zaman penceresini gösterir
+            document.querySelectorAll('.dashboard-window-label').forEach(label => {
+                label.textContent = describeDashboardWindow(data.window_seconds);
+            });
+
             if (errorLogCountElement) {
                 errorLogCountElement.textContent = data.error_log_count !== undefined ? data.error_log_count : 'N/A';
             }
@@ -232,6 +345,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
             }
 
+            await updateLogVolumeChart();
+            await updateTopPatterns();
+
             // Recent System Boots
             if (bootListElement && data.recent_boots) {
                 bootListElement.innerHTML = '';
@@ -263,14 +379,14 @@ document.addEventListener('DOMContentLoaded', function() {
 
                     row.innerHTML = `
                         <td>${formatJournalTimestamp(entry.timestamp)}</td>
-                        <td>${entry.hostname || '-'}</td>
+                        <td>${escapeHtml(entry.hostname || '-')}</td>
                         <td class="${priorityInfo.class}">${priorityInfo.text}</td>
-                        <td>${identifier}</td>
-                        <td class="message-col">${messageSnippet}</td>
+                        <td>${escapeHtml(identifier)}</td>
+                        <td class="message-col">${escapeHtml(messageSnippet)}</td>
                         <td><button class="action-btn" data-log-id="${entry.id}"><i class="fas fa-search-plus"></i> View</button></td>
                     `;
                      row.querySelector('.action-btn').addEventListener('click', function() {
-                        showLogDetails(entry);
+                        openLogDetails(entry);
                     });
                 });
             }
@@ -281,6 +397,190 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    async function updateTopPatterns() {
+        if (!patternListElement) return;
+        const response = await fetch(`${API_BASE_URL}/patterns?limit=10`);
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const data = await response.json();
+
+        patternListElement.innerHTML = '';
+        if (data.templates.length === 0) {
+            patternListElement.innerHTML = '<li>No log patterns in this window.</li>';
+            return;
+        }
+        data.templates.forEach(pattern => {
+            const li = document.createElement('li');
+            const count = document.createElement('span'); count.className = 'pattern-count'; count.textContent = pattern.count;
+            const text = document.createElement('code'); text.textContent = pattern.template;
+            li.appendChild(count); li.appendChild(text);
+            patternListElement.appendChild(li);
+        });
+    }
+
+    async function updateLogVolumeChart() {
+        // Sunucu rollup tablolarından kovalanmış sayıları döndürür; ham satır çekilmez.
+        if (!logVolumeChartCtx) return;
+        const response = await fetch(`${API_BASE_URL}/histogram?buckets=96`);
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        const histogram = await response.json();
+
+        const labels = histogram.buckets.map(bucketStart => formatJournalTimestamp(bucketStart));
+        const datasets = Object.entries(histogram.by_priority).map(([priority, counts]) => {
+            const priorityInfo = getPriorityTextAndClass(priority === 'unknown' ? null : priority);
+            return { label: priority === 'unknown' ? 'UNKNOWN' : priorityInfo.text, data: counts, backgroundColor: priorityInfo.color, stack: 'volume' };
+        });
+        if (window.logVolumeChartInstance) window.logVolumeChartInstance.destroy();
+        window.logVolumeChartInstance = new Chart(logVolumeChartCtx, {
+            type: 'bar',
+            data: { labels: labels, datasets: datasets },
+            options: {
+                responsive: true, maintainAspectRatio: false, animation: false,
+                scales: { x: { stacked: true, ticks: { maxTicksLimit: 12 } }, y: { stacked: true, beginAtZero: true } },
+                plugins: { legend: { position: 'bottom' } }
+            }
+        });
+    }
+
+    async function loadWatchlist() {
+        try {
+            const [rulesResponse, alertsResponse] = await Promise.all([
+                fetch(`${API_BASE_URL}/watchlist/rules`), fetch(`${API_BASE_URL}/alerts?limit=50`)
+            ]);
+            if (!rulesResponse.ok || !alertsResponse.ok) throw new Error('Watchlist could not be loaded.');
+            const rules = await rulesResponse.json();
+            const alerts = await alertsResponse.json();
+
+            if (watchlistRulesTableBody) {
+                watchlistRulesTableBody.innerHTML = '';
+                rules.forEach(rule => {
+                    const row = watchlistRulesTableBody.insertRow();
+                    row.innerHTML = `
+                        <td>${escapeHtml(rule.name)}</td>
+                        <td>${rule.pattern ? escapeHtml(rule.pattern) + (rule.is_regex ? ' <small>(regex)</small>' : '') : '-'}</td>
+                        <td>${rule.max_priority !== null ? '&lt;= ' + getPriorityTextAndClass(rule.max_priority).text : '-'}</td>
+                        <td>${escapeHtml(rule.unit || '-')}</td>
+                        <td>${rule.threshold} / ${rule.window_seconds}s</td>
+                        <td><button class="action-btn"><i class="fas fa-trash"></i> Delete</button></td>
+                    `;
+                    row.querySelector('.action-btn').addEventListener('click', async () => {
+                        await fetch(`${API_BASE_URL}/watchlist/rules/${rule.id}`, { method: 'DELETE' });
+                        loadWatchlist();
+                    });
+                });
+            }
+
+            if (watchlistAlertsContainer) {
+                if (alerts.length === 0) {
+                    watchlistAlertsContainer.innerHTML = '<p>No active watchlist alerts.</p>';
+                    return;
+                }
+                watchlistAlertsContainer.innerHTML = '';
+                alerts.forEach(alert => {
+                    const item = document.createElement('div');
+                    item.className = 'watchlist-alert' + (alert.acknowledged_at ? ' acknowledged' : '');
+                    item.innerHTML = `
+                        <strong>${escapeHtml(alert.rule_name)}</strong> (${alert.match_count} match)
+                        <small>${formatJournalTimestamp(alert.last_match_at)} · ${escapeHtml(alert.hostname || '-')} · ${escapeHtml(alert.unit || '-')}</small>
+                        <div class="message-col">${escapeHtml(alert.message || '')}</div>
+                    `;
+                    if (!alert.acknowledged_at) {
+                        const ackButton = document.createElement('button');
+                        ackButton.className = 'action-btn';
+                        ackButton.innerHTML = '<i class="fas fa-check"></i> Acknowledge';
+                        ackButton.addEventListener('click', async () => {
+                            await fetch(`${API_BASE_URL}/alerts/${alert.id}/acknowledge`, { method: 'POST' });
+                            loadWatchlist();
+                        });
+                        item.appendChild(ackButton);
+                    }
+                    watchlistAlertsContainer.appendChild(item);
+                });
+            }
+        } catch (error) {
+            console.error('Error loading watchlist:', error);
+        }
+    }
+
+    if (watchlistAddBtn) {
+        watchlistAddBtn.addEventListener('click', async () => {
+            const rule = {
+                pattern: document.getElementById('watchlist-pattern-input').value,
+                is_regex: document.getElementById('watchlist-regex-input').checked,
+                max_priority: document.getElementById('watchlist-priority-input').value,
+                unit: document.getElementById('watchlist-unit-input').value,
+                threshold: document.getElementById('watchlist-threshold-input').value,
+                window_seconds: document.getElementById('watchlist-window-input').value
+            };
+            const response = await fetch(`${API_BASE_URL}/watchlist/rules`, {
+                method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(rule)
+            });
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({}));
+                alert(error.error || `HTTP error! status: ${response.status}`);
+                return;
+            }
+            document.getElementById('watchlist-pattern-input').value = '';
+            loadWatchlist();
+        });
+    }
+
+    // --- Filtre önerileri (/api/facets) ---
+    // Yazarken bilinen identifier/unit ve hostname değerleri datalist'e gelir.
+    // Filtredeki değerler listeden seçilmişse sorgu match=exact ile gönderilir,
+    // böylece sunucu LIKE taraması yerine indeksli eşitlik araması yapar.
+    const facetSuggestDelayMs = 250;
+    const knownFacetValues = { identifier: new Set(), hostname: new Set() };
+
+    async function updateFacetSuggestions(input, datalist, facetNames, knownValues) {
+        const queryParams = new URLSearchParams({
+            facet: facetNames.join(','),
+            prefix: input.value.trim(),
+            window: 0, // Tüm zamanlar
+            limit: 20
+        });
+        try {
+            const response = await fetch(`${API_BASE_URL}/facets?${queryParams.toString()}`);
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            const data = await response.json();
+            const counts = new Map();
+            facetNames.forEach(name => (data.facets[name] || []).forEach(item => {
+                counts.set(item.value, (counts.get(item.value) || 0) + item.count);
+            }));
+            datalist.innerHTML = '';
+            [...counts.entries()].sort((a, b) => b[1] - a[1]).slice(0, 20).forEach(([value, count]) => {
+                knownValues.add(value);
+                const option = document.createElement('option');
+                option.value = value;
+                option.label = `${count} logs`;
+                datalist.appendChild(option);
+            });
+        } catch (error) {
+            console.error('Error fetching filter suggestions:', error);
+        }
+    }
+
+    function attachFacetSuggestions(input, datalist, facetNames, knownValues) {
+        if (!input || !datalist) return;
+        let timer = null;
+        const refresh = () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => updateFacetSuggestions(input, datalist, facetNames, knownValues), facetSuggestDelayMs);
+        };
+        input.addEventListener('input', refresh);
+        input.addEventListener('focus', refresh);
+    }
+
+    attachFacetSuggestions(idFilter, idFilterValues, ['identifier', 'unit'], knownFacetValues.identifier);
+    attachFacetSuggestions(hostFilter, hostFilterValues, ['hostname'], knownFacetValues.hostname);
+
+    // Dolu olan identifier/hostname filtrelerinin hepsi bilinen değerlerse 'exact'.
+    function filterMatchMode(identifier, hostname) {
+        if (!identifier && !hostname) return '';
+        if (identifier && !knownFacetValues.identifier.has(identifier)) return '';
+        if (hostname && !knownFacetValues.hostname.has(hostname)) return '';
+        return 'exact';
+    }
+
     // --- Event Listeners ---
     // Filtre butonu
     if (applyFiltersBtn) {
@@ -290,10 +590,26 @@ document.addEventListener('DOMContentLoaded', function() {
                 priority: prioFilter.value,
                 identifier: idFilter.value,
                 hostname: hostFilter.value,
+                match: filterMatchMode(idFilter.value, hostFilter.value),
                 global_search: '' // Filtreleme için global search'ü boş bırak
             };
             currentPage = 1; // Filtre uygulandığında ilk sayfaya dön
-            fetchAndPopulateJournalTable(currentPage, filters);
+            const wasTailing = liveTailSource !== null;
+            stopLiveTail();
+            fetchAndPopulateJournalTable(currentPage, filters).then(() => {
+                if (wasTailing) startLiveTail(); // Yeni filtrelerle takibe devam et
+            });
+        });
+    }
+
+    if (liveTailBtn) {
+        liveTailBtn.addEventListener('click', () => {
+            if (liveTailSource) {
+                stopLiveTail();
+                fetchAndPopulateJournalTable(1, getCurrentFilters());
+            } else {
+                fetchAndPopulateJournalTable(1, getCurrentFilters()).then(startLiveTail);
+            }
         });
     }
 
@@ -313,17 +629,17 @@ document.addEventListener('DOMContentLoaded', function() {
     // Sayfalama butonları
     if (prevPageBtn) {
         prevPageBtn.addEventListener('click', () => {
-            if (currentPage > 1) {
+            if (prevPageCursor) {
                 const currentFilters = getCurrentFilters();
-                fetchAndPopulateJournalTable(currentPage - 1, currentFilters);
+                fetchAndPopulateJournalTable(Math.max(currentPage - 1, 1), currentFilters, prevPageCursor);
             }
         });
     }
     if (nextPageBtn) {
         nextPageBtn.addEventListener('click', () => {
-            if (currentPage < totalPages) {
+            if (nextPageCursor) {
                 const currentFilters = getCurrentFilters();
-                fetchAndPopulateJournalTable(currentPage + 1, currentFilters);
+                fetchAndPopulateJournalTable(currentPage + 1, currentFilters, nextPageCursor);
             }
         });
     }
@@ -335,14 +651,21 @@ document.addEventListener('DOMContentLoaded', function() {
         if (globalSearchTerm) {
             return { global_search: globalSearchTerm };
         }
+        const identifier = idFilter ? idFilter.value : '';
+        const hostname = hostFilter ? hostFilter.value : '';
         return {
             message: msgFilter ? msgFilter.value : '',
             priority: prioFilter ? prioFilter.value : '',
-            identifier: idFilter ? idFilter.value : '',
-            hostname: hostFilter ? hostFilter.value : ''
+            identifier: identifier,
+            hostname: hostname,
+            match: filterMatchMode(identifier, hostname)
         };
     }
 
+    if (dashboardWindowSelect) {
+        dashboardWindowSelect.addEventListener('change', updateDashboardWidgets);
+    }
+
     // --- Sayfa Yüklendiğinde İlk Verileri Yükle ---
     if (document.getElementById('dashboard')) { // Sadece dashboard görünürse
         updateDashboardWidgets(); // Dashboard widget'larını ve grafiklerini güncelle
@@ -371,6 +694,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     fetchAndPopulateJournalTable(1, getCurrentFilters());
                 } else if (targetId === 'dashboard') {
                     updateDashboardWidgets();
+                } else if (targetId === 'alerts') {
+                    loadWatchlist();
                 }
             } else {
                 section.classList.remove('active-section');
@@ -426,6 +751,6 @@ document.addEventListener('DOMContentLoaded', function() {
 
 
     // TODO: Implement "View" button functionality for individual log details (e.g., show full log in a modal)
-    // TODO: Implement Watchlist Alerts and Investigation page functionalities (server-side logic needed)
+    // TODO: Implement Investigation page functionalities (server-side logic needed)
     // TODO: Implement Settings page functionalities (server-side logic needed)
 });
\ No newline at end of file
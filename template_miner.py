@@ -0,0 +1,209 @@
+import re
+import time
+
+from collections import OrderedDict
+
+# Online log template mining in the style of Drain (He et al., ICWS 2017):
+# messages are routed through a fixed-depth parse tree keyed on token count
+# and leading tokens, then matched against the few templates in that leaf by
+# token similarity. Templates generalize differing tokens to WILDCARD.
+
+WILDCARD = "<*>"
+TREE_DEPTH = 4 # Root and length layers plus TREE_DEPTH - 2 leading-token layers.
+SIMILARITY_THRESHOLD = 0.4
+MAX_CHILDREN_PER_NODE = 100
+MAX_CACHED_TEMPLATES = 10000
+
+VARIABLE_TOKEN_PATTERN = re.compile(r"\d")
+# key=value tokens keep their key: "signal=-64" becomes "signal=<*>".
+KEY_VALUE_TOKEN_PATTERN = re.compile(r"^([A-Za-z_][\w.-]*[=:])(.+)$")
+
+def mask_token(token):
+    if not VARIABLE_TOKEN_PATTERN.search(token):
+        return token
+    key_value = KEY_VALUE_TOKEN_PATTERN.match(token)
+    if key_value and not VARIABLE_TOKEN_PATTERN.search(key_value.group(1)):
+        return key_value.group(1) + WILDCARD
+    return WILDCARD
+
+def tokenize(message):
+    return [mask_token(token) for token in message.split()]
+
+def extract_parameters(template, message):
+    """The message's values at the template's wildcards, or None if it does not fit."""
+    template_tokens = template.split()
+    message_tokens = message.split()
+    if len(template_tokens) != len(message_tokens):
+        return None
+    parameters = []
+    for template_token, message_token in zip(template_tokens, message_tokens):
+        if template_token == message_token:
+            continue
+        if template_token.endswith(WILDCARD):
+            prefix = template_token[:-len(WILDCARD)]
+            if message_token.startswith(prefix):
+                parameters.append(message_token[len(prefix):])
+                continue
+        return None
+    return parameters
+
+class LogTemplate:
+    __slots__ = ("id", "tokens", "leaf")
+
+    def __init__(self, template_id, tokens, leaf):
+        self.id = template_id # None until saved to log_templates.
+        self.tokens = tokens
+        self.leaf = leaf
+
+    @property
+    def text(self):
+        return " ".join(self.tokens)
+
+class DrainTemplateMiner:
+    """Assigns each message a template, creating or generalizing as needed.
+
+    Only the MAX_CACHED_TEMPLATES most recently matched templates are kept in
+    memory; a message of an evicted template starts a new one. Template ids
+    are the row ids of the database's log_templates table: new and changed
+    templates are pending until persist(conn) writes them.
+    """
+
+    def __init__(self, depth=TREE_DEPTH, similarity_threshold=SIMILARITY_THRESHOLD,
+                 max_children=MAX_CHILDREN_PER_NODE, max_templates=MAX_CACHED_TEMPLATES):
+        self.leading_tokens = max(depth - 2, 1)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.max_templates = max_templates
+        self.root = {}
+        self.templates = OrderedDict() # LRU order, keyed by id(template)
+        self.pending_new = []
+        self.pending_updated = set()
+        self.unsaved = []
+        self.unsaved_updated = set()
+
+    @classmethod
+    def load(cls, conn, **settings):
+        """A miner primed with the most recently updated templates of conn's database."""
+        miner = cls(**settings)
+        rows = conn.execute(
+            "SELECT id, template FROM log_templates ORDER BY updated_at DESC, id DESC LIMIT ?", (miner.max_templates,)
+        ).fetchall()
+        for template_id, template_text in reversed(rows):
+            tokens = template_text.split()
+            template = LogTemplate(template_id, tokens, miner.leaf_for(tokens, create=True))
+            template.leaf.append(template)
+            miner.templates[id(template)] = template
+        return miner
+
+    def leaf_for(self, tokens, create):
+        node = self.root.get(len(tokens))
+        if node is None:
+            if not create:
+                return None
+            node = self.root[len(tokens)] = {}
+        for depth, token in enumerate(tokens[:self.leading_tokens]):
+            is_last = depth == min(self.leading_tokens, len(tokens)) - 1
+            key = token if WILDCARD not in token else WILDCARD
+            child = node.get(key)
+            if child is None and key != WILDCARD:
+                if create and len(node) < self.max_children:
+                    child = node[key] = [] if is_last else {}
+                else:
+                    key = WILDCARD
+                    child = node.get(WILDCARD)
+            if child is None:
+                if not create:
+                    return None
+                child = node[WILDCARD] = [] if is_last else {}
+            node = child
+        if not tokens:
+            # Empty messages all share one leaf.
+            leaf = node.get(WILDCARD)
+            if leaf is None and create:
+                leaf = node[WILDCARD] = []
+            return leaf
+        return node
+
+    def best_match(self, leaf, tokens):
+        best = None
+        best_score = (-1.0, -1)
+        for template in leaf:
+            same = 0
+            wildcards = 0
+            for template_token, token in zip(template.tokens, tokens):
+                if template_token == WILDCARD:
+                    wildcards += 1
+                elif template_token == token:
+                    same += 1
+            score = (same / len(tokens) if tokens else 1.0, wildcards)
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score[0] >= self.similarity_threshold:
+            return best
+        return None
+
+    def add_message(self, message):
+        """The LogTemplate for message (None for non-text messages)."""
+        if not isinstance(message, str):
+            return None
+        tokens = tokenize(message)
+        leaf = self.leaf_for(tokens, create=False)
+        template = self.best_match(leaf, tokens) if leaf else None
+        if template is None:
+            leaf = self.leaf_for(tokens, create=True)
+            template = LogTemplate(None, tokens, leaf)
+            leaf.append(template)
+            self.pending_new.append(template)
+            self.templates[id(template)] = template
+            if len(self.templates) > self.max_templates:
+                _, evicted = self.templates.popitem(last=False)
+                evicted.leaf.remove(evicted)
+            return template
+
+        self.templates.move_to_end(id(template))
+        if template.tokens != tokens:
+            merged = [
+                template_token if template_token == token else WILDCARD
+                for template_token, token in zip(template.tokens, tokens)
+            ]
+            if merged != template.tokens:
+                template.tokens = merged
+                if template.id is not None:
+                    self.pending_updated.add(template)
+        return template
+
+    def add_messages(self, messages):
+        return [self.add_message(message) for message in messages]
+
+    def has_pending_changes(self):
+        return bool(self.pending_new or self.pending_updated)
+
+    def persist(self, conn):
+        """Saves new and generalized templates with conn (the caller commits).
+
+        If the transaction does not commit, call forget_unsaved() so the ids
+        handed out here are not reused.
+        """
+        now = time.time()
+        self.unsaved = []
+        self.unsaved_updated = self.pending_updated
+        for template in self.pending_new:
+            cursor = conn.execute(
+                "INSERT INTO log_templates (template, token_count, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (template.text, len(template.tokens), now, now)
+            )
+            template.id = cursor.lastrowid
+            self.unsaved.append(template)
+        if self.pending_updated:
+            conn.executemany("UPDATE log_templates SET template = ?, updated_at = ? WHERE id = ?",
+                             [(template.text, now, template.id) for template in self.pending_updated])
+        self.pending_new = []
+        self.pending_updated = set()
+
+    def forget_unsaved(self):
+        for template in self.unsaved:
+            template.id = None
+        self.pending_new = self.unsaved + self.pending_new
+        self.pending_updated |= {template for template in self.unsaved_updated if template.id is not None}
+        self.unsaved = []
+        self.unsaved_updated = set()
@@ -0,0 +1,142 @@
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+import collector
+
+# Stands in for `journalctl --follow -o json`: logs its arguments, prints the
+# entries after --after-cursor up to STUB_LAST_ENTRY, then keeps following
+# (STUB_EXIT unset) or exits.
+STUB_JOURNALCTL = '''
+import json, os, sys, time
+with open(os.environ["STUB_CALLS_FILE"], "a") as f_calls:
+    f_calls.write(json.dumps(sys.argv[1:]) + "\\n")
+after = int(sys.argv[sys.argv.index("--after-cursor") + 1]) if "--after-cursor" in sys.argv else 0
+for number in range(after + 1, int(os.environ["STUB_LAST_ENTRY"]) + 1):
+    print(json.dumps({
+        "__CURSOR": str(number),
+        "__REALTIME_TIMESTAMP": str(1700000000000000 + number),
+        "MESSAGE": f"entry {number}",
+        "PRIORITY": "6",
+        "SYSLOG_IDENTIFIER": "stub",
+    }), flush=True)
+if not os.environ.get("STUB_EXIT"):
+    time.sleep(60)
+'''
+
+class RecordingEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return super().wait(timeout)
+
+def wait_until(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("Timed out waiting for the journal follower.")
+        time.sleep(0.02)
+
+@pytest.fixture
+def stub_journalctl(tmp_path, monkeypatch):
+    script = tmp_path / "journalctl"
+    script.write_text(f"#!{sys.executable}\n{STUB_JOURNALCTL}")
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    calls_file = tmp_path / "calls.jsonl"
+    monkeypatch.setenv("STUB_CALLS_FILE", str(calls_file))
+    monkeypatch.setattr(collector, "JOURNALCTL_BINARY", str(script))
+    monkeypatch.setattr(collector, "JOURNALCTL_RESTART_BACKOFF_SECONDS", 0.05)
+    monkeypatch.setattr(collector, "JOURNALCTL_MAX_RESTART_BACKOFF_SECONDS", 0.2)
+    monkeypatch.setattr(collector, "EVALUATE_WATCHLIST", False)
+    monkeypatch.setattr(collector, "write_log_batch_to_file", lambda log_entries: None)
+
+    def calls():
+        if not calls_file.exists():
+            return []
+        return [json.loads(line) for line in calls_file.read_text().splitlines()]
+    return calls
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Messages written to the database and cursors saved, in order."""
+    result = {"messages": [], "cursors": []}
+    monkeypatch.setattr(collector, "write_log_batch_to_database",
+                        lambda log_entries: result["messages"].extend(entry["MESSAGE"] for entry in log_entries))
+    monkeypatch.setattr(collector, "save_journal_cursor", result["cursors"].append)
+    return result
+
+def run_follower(stop_event, current_cursor=None):
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.setdefault("cursor", collector.follow_journal_logs(current_cursor, stop_event)))
+    thread.start()
+    return thread, result
+
+def test_follower_delivers_lines_and_advances_cursor(stub_journalctl, stored, monkeypatch):
+    monkeypatch.setenv("STUB_LAST_ENTRY", "3")
+    stop_event = threading.Event()
+    thread, result = run_follower(stop_event)
+    try:
+        wait_until(lambda: len(stored["messages"]) == 3)
+    finally:
+        stop_event.set()
+        thread.join(10)
+
+    assert stored["messages"] == ["entry 1", "entry 2", "entry 3"]
+    assert stored["cursors"][-1] == "3"
+    assert result["cursor"] == "3"
+    assert len(stub_journalctl()) == 1
+    assert "--follow" in stub_journalctl()[0]
+
+def test_follower_restarts_from_cursor_with_backoff(stub_journalctl, stored, monkeypatch):
+    monkeypatch.setenv("STUB_LAST_ENTRY", "2")
+    monkeypatch.setenv("STUB_EXIT", "1")
+    stop_event = RecordingEvent()
+    thread, result = run_follower(stop_event)
+    try:
+        wait_until(lambda: len(stop_event.waits) >= 4)
+    finally:
+        stop_event.set()
+        thread.join(10)
+
+    # Reset after the run that delivered entries, then doubled up to the maximum.
+    assert stop_event.waits[:4] == [0.05, 0.1, 0.2, 0.2]
+    calls = stub_journalctl()
+    assert "--after-cursor" not in calls[0]
+    for args in calls[1:]:
+        assert args[args.index("--after-cursor") + 1] == "2"
+    assert stored["messages"] == ["entry 1", "entry 2"]
+    assert result["cursor"] == "2"
+
+def test_follower_rereads_batch_after_failed_database_write(stub_journalctl, stored, monkeypatch):
+    monkeypatch.setenv("STUB_LAST_ENTRY", "3")
+    store_messages = collector.write_log_batch_to_database
+    failures = []
+
+    def fail_once(log_entries):
+        if not failures:
+            failures.append(len(log_entries))
+            raise RuntimeError("database is locked")
+        store_messages(log_entries)
+    monkeypatch.setattr(collector, "write_log_batch_to_database", fail_once)
+
+    stop_event = threading.Event()
+    thread, result = run_follower(stop_event, current_cursor="1")
+    try:
+        wait_until(lambda: len(stored["messages"]) == 2)
+    finally:
+        stop_event.set()
+        thread.join(10)
+
+    assert failures
+    assert stored["messages"] == ["entry 2", "entry 3"]
+    assert [args[args.index("--after-cursor") + 1] for args in stub_journalctl()] == ["1", "1"]
+    assert result["cursor"] == "3"
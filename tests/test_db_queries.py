@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+
+import db_manager
+
+MESSAGES = [
+    "wpa_supplicant[812]: CTRL-EVENT-CONNECTED - Connection to 00:11:22 completed",
+    "systemd[1]: Deactivating swap /dev/zram0...",
+    "systemd[1]: Activated swap /dev/zram0.",
+    "sshd[4410]: Accepted publickey for deploy from 10.0.0.5",
+]
+
+def journal_entry(number, timestamp=True, message=None):
+    entry = {
+        "__CURSOR": f"cursor-{number}",
+        "MESSAGE": message or f"entry {number}",
+        "PRIORITY": "6",
+        "SYSLOG_IDENTIFIER": "test",
+        "_HOSTNAME": "host",
+    }
+    if timestamp:
+        entry["__REALTIME_TIMESTAMP"] = str(1700000000000000 + number * 1_000_000)
+    return entry
+
+@pytest.fixture
+def log_database(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "logs_db.sqlite3")
+    monkeypatch.setattr(db_manager, "DATABASE_NAME", db_path)
+    writer = db_manager.SqliteBatchWriter(db_path)
+    yield writer
+    writer.close()
+
+def test_page_token_round_trip():
+    token = db_manager.encode_page_token(1700000000.25, 42, db_manager.PAGE_DIRECTION_NEXT)
+    assert "=" not in token
+    assert db_manager.decode_page_token(token) == (1700000000.25, 42, db_manager.PAGE_DIRECTION_NEXT)
+    token = db_manager.encode_page_token(None, 7, db_manager.PAGE_DIRECTION_PREV)
+    assert db_manager.decode_page_token(token) == (None, 7, db_manager.PAGE_DIRECTION_PREV)
+
+@pytest.mark.parametrize("token", [
+    "not a token",
+    db_manager.encode_page_token(1.0, 1, "sideways"),
+    db_manager.encode_page_token(1.0, "1", db_manager.PAGE_DIRECTION_NEXT),
+    db_manager.encode_page_token("1.0", 1, db_manager.PAGE_DIRECTION_NEXT),
+])
+def test_invalid_page_tokens_are_rejected(token):
+    with pytest.raises(ValueError):
+        db_manager.decode_page_token(token)
+
+def test_keyset_pages_cover_every_row_once_in_both_directions(log_database):
+    log_database.write_batch([journal_entry(number) for number in range(1, 8)])
+    log_database.write_batch([journal_entry(number, timestamp=False) for number in range(8, 11)])
+
+    pages = [db_manager.get_logs_page(limit=3)]
+    while pages[-1]["next"]:
+        pages.append(db_manager.get_logs_page(limit=3, page_token=pages[-1]["next"]))
+    messages = [log["message"] for page in pages for log in page["logs"]]
+    # Newest first, then the rows without a timestamp.
+    assert messages[:7] == [f"entry {number}" for number in range(7, 0, -1)]
+    assert sorted(messages[7:]) == ["entry 10", "entry 8", "entry 9"]
+    assert pages[0]["prev"] is None
+
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = db_manager.get_logs_page(limit=3, page_token=page["prev"])
+        assert [log["id"] for log in page["logs"]] == [log["id"] for log in expected["logs"]]
+
+def test_untimestamped_rows_page_by_shard_then_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_manager, "SHARD_DIRECTORY", str(tmp_path / "log_shards"))
+    monkeypatch.setattr(db_manager, "SHARD_INTERVAL_SECONDS", 3600)
+    store = db_manager.get_shard_store()
+    older_shard = store.shard_number(1700000000)
+    writers = [db_manager.SqliteBatchWriter(store.ensure_shard(shard)) for shard in (older_shard, older_shard + 1)]
+    try:
+        # The newer shard's untimestamped rows are written first, so they have lower rowids.
+        writers[1].write_batch([journal_entry(number, timestamp=False) for number in range(1, 4)])
+        writers[0].write_batch([journal_entry(number, timestamp=False) for number in range(4, 7)])
+        writers[0].write_batch([journal_entry(7)])
+
+        pages = [db_manager.get_logs_page(limit=2)]
+        while pages[-1]["next"]:
+            pages.append(db_manager.get_logs_page(limit=2, page_token=pages[-1]["next"]))
+        messages = [log["message"] for page in pages for log in page["logs"]]
+        assert messages == ["entry 7", "entry 3", "entry 2", "entry 1", "entry 6", "entry 5", "entry 4"]
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = db_manager.get_logs_page(limit=2, page_token=page["prev"])
+            assert [log["id"] for log in page["logs"]] == [log["id"] for log in expected["logs"]]
+    finally:
+        for writer in writers:
+            writer.close()
+
+def test_fts_expression_quotes_terms_as_word_prefixes():
+    assert db_manager.build_fts_match_expression("deactivat") == '"deactivat" *'
+    assert db_manager.build_fts_match_expression('wpa_supp "swap /dev" OR') == '"wpa_supp" * AND "swap /dev" AND "OR" *'
+    assert db_manager.build_fts_match_expression('say "hi"', column="message") == 'message : ("say" * AND "hi")'
+    assert db_manager.build_fts_match_expression("ssh*") == '"ssh" *'
+    assert db_manager.build_fts_match_expression('- * ""') is None
+    assert db_manager.build_fts_match_expression(None) is None
+
+@pytest.mark.parametrize("search_text, expected", [
+    ("deactivat", [1]),
+    ("wpa_supp", [0]),
+    ("CTRL-EVENT", [0]),
+    ("activat", [2]), # A word prefix only: not inside "Deactivating".
+    ('"swap /dev/zram0"', [1, 2]),
+    ("accepted deploy", [3]),
+    ("NEAR(", []),
+])
+def test_fts_expression_matches_the_full_text_index(log_database, search_text, expected):
+    log_database.write_batch([journal_entry(number, message=message) for number, message in enumerate(MESSAGES)])
+    conn = sqlite3.connect(log_database.db_path)
+    try:
+        rows = conn.execute(
+            "SELECT logs.message FROM logs_fts JOIN logs ON logs.id = logs_fts.rowid WHERE logs_fts MATCH ? ORDER BY logs.id",
+            (db_manager.build_fts_match_expression(search_text),),
+        ).fetchall()
+    finally:
+        conn.close()
+    assert [row[0] for row in rows] == [MESSAGES[index] for index in expected]
+
+def test_only_new_rows_are_mined_for_templates(log_database, monkeypatch):
+    if log_database.template_miner is None:
+        pytest.skip("Template mining is off.")
+    log_database.write_batch([journal_entry(1, message="session opened for user alice")])
+    mined = []
+    add_messages = log_database.template_miner.add_messages
+    monkeypatch.setattr(log_database.template_miner, "add_messages",
+                        lambda messages: mined.extend(messages) or add_messages(messages))
+
+    inserted = log_database.write_batch([
+        journal_entry(1, message="session opened for user alice"),
+        journal_entry(2, message="session opened for user bob"),
+        journal_entry(2, message="session opened for user bob"),
+    ])
+    assert inserted == 1
+    assert mined == ["session opened for user bob"]
@@ -0,0 +1,31 @@
+import pytest
+
+from ingest_server import TCP_MAX_FRAME_BYTES, SyslogFramingError, split_syslog_frames
+
+def test_newline_delimited_frames():
+    assert split_syslog_frames(b"<13>one\n<13>two\n\n<13>par") == ([b"<13>one", b"<13>two"], 17)
+
+def test_octet_counted_frames_may_contain_newlines():
+    buffer = b"9 <13>a\nb c12 <13>partial"
+    assert split_syslog_frames(buffer) == ([b"<13>a\nb c"], 11)
+
+def test_mixed_framing():
+    assert split_syslog_frames(b"7 <13>one<13>two\n") == ([b"<13>one", b"<13>two"], 17)
+
+def test_unterminated_frame_is_kept_until_final():
+    assert split_syslog_frames(b"<13>last") == ([], 0)
+    assert split_syslog_frames(b"<13>last", final=True) == ([b"<13>last"], 8)
+
+def test_overlong_line_is_cut_at_the_frame_limit():
+    frames, consumed = split_syslog_frames(b"x" * (TCP_MAX_FRAME_BYTES + 10))
+    assert frames == [b"x" * TCP_MAX_FRAME_BYTES]
+    assert consumed == TCP_MAX_FRAME_BYTES + 10
+
+def test_octet_count_above_the_limit_is_rejected():
+    with pytest.raises(SyslogFramingError):
+        split_syslog_frames(f"{TCP_MAX_FRAME_BYTES + 1} <13>".encode())
+
+def test_accepts_a_bytearray_buffer():
+    frames, consumed = split_syslog_frames(bytearray(b"<13>one\n"))
+    assert frames == [b"<13>one"] and all(type(frame) is bytes for frame in frames)
+    assert consumed == 8
@@ -0,0 +1,67 @@
+import json
+
+import journal_spool
+
+def journal_lines(first, last):
+    return [json.dumps({"__CURSOR": f"c{number}", "MESSAGE": f"entry {number}"}) for number in range(first, last + 1)]
+
+def messages(batch):
+    return [json.loads(line)["MESSAGE"] for line in batch.lines]
+
+def test_append_read_and_ack(tmp_path):
+    spool = journal_spool.JournalSpool(str(tmp_path))
+    assert spool.append(journal_lines(1, 3)) == "c3"
+    assert spool.last_cursor() == "c3"
+
+    batch = spool.read_batch(max_entries=2, timeout=1)
+    assert messages(batch) == ["entry 1", "entry 2"]
+    assert not batch.replayed
+    spool.ack(batch, "c2")
+    assert messages(spool.read_batch(max_entries=10, timeout=1)) == ["entry 3"]
+    assert spool.read_batch(max_entries=10, timeout=0.05) is None
+    spool.close()
+
+def test_reopen_replays_only_unacknowledged_entries(tmp_path):
+    spool = journal_spool.JournalSpool(str(tmp_path))
+    spool.append(journal_lines(1, 4))
+    spool.ack(spool.read_batch(max_entries=2, timeout=1), "c2")
+    spool.read_batch(max_entries=2, timeout=1) # Read but never acknowledged, as in a crash.
+    spool.close()
+
+    spool = journal_spool.JournalSpool(str(tmp_path))
+    assert spool.last_cursor() == "c4"
+    batch = spool.read_batch(max_entries=10, timeout=1)
+    assert messages(batch) == ["entry 3", "entry 4"]
+    assert batch.replayed
+    spool.ack(batch, "c4")
+
+    spool.append(journal_lines(5, 5))
+    batch = spool.read_batch(max_entries=10, timeout=1)
+    assert messages(batch) == ["entry 5"]
+    assert not batch.replayed
+    spool.close()
+
+def test_torn_last_line_is_dropped_on_reopen(tmp_path):
+    spool = journal_spool.JournalSpool(str(tmp_path))
+    spool.append(journal_lines(1, 2))
+    spool.close()
+    with open(spool.segment_path(0), "ab") as f_segment:
+        f_segment.write(b'{"__CURSOR": "c3", "MESS')
+
+    spool = journal_spool.JournalSpool(str(tmp_path))
+    assert spool.last_cursor() == "c2"
+    assert messages(spool.read_batch(max_entries=10, timeout=1)) == ["entry 1", "entry 2"]
+    spool.close()
+
+def test_spilled_backlog_is_read_back_from_disk_across_segments(tmp_path):
+    spool = journal_spool.JournalSpool(str(tmp_path), segment_max_bytes=100, memory_max_entries=2)
+    for number in range(1, 7):
+        spool.append(journal_lines(number, number))
+
+    read = []
+    while (batch := spool.read_batch(max_entries=4, timeout=0.05)) is not None:
+        read.extend(messages(batch))
+        spool.ack(batch)
+    assert read == [f"entry {number}" for number in range(1, 7)]
+    assert len(list(tmp_path.glob(f"*{journal_spool.SPOOL_SEGMENT_SUFFIX}"))) == 1
+    spool.close()
@@ -0,0 +1,413 @@
+import logging
+import re
+import time
+
+from collections import deque
+
+import db_pool
+import metrics
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Rules and alerts live in their own small database rather than in the log
+# database(s): with sharding, shards come and go with retention but rules
+# have to stay.
+WATCHLIST_DATABASE = "watchlist.sqlite3"
+WATCHLIST_RELOAD_INTERVAL_SECONDS = 5
+WATCHLIST_DEFAULT_WINDOW_SECONDS = 60
+# Regexes whose required literal is shorter than this are run on every entry.
+REGEX_PREFILTER_MIN_LITERAL_CHARS = 3
+ALERT_MESSAGE_MAX_CHARS = 1000
+ALERTS_DEFAULT_LIMIT = 100
+
+watchlist_logger = logging.getLogger(__name__)
+
+alerts_fired_total = metrics.counter("pylog_watchlist_alerts_total", "Watchlist alerts fired.")
+watchlist_batch_seconds = metrics.histogram(
+    "pylog_watchlist_batch_seconds", "Time to evaluate one ingest batch against every watchlist rule.")
+
+WATCHLIST_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS watchlist_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        pattern TEXT,
+        is_regex INTEGER NOT NULL DEFAULT 0,
+        max_priority INTEGER,
+        unit TEXT,
+        hostname TEXT,
+        threshold INTEGER NOT NULL DEFAULT 1,
+        window_seconds REAL NOT NULL DEFAULT 60,
+        enabled INTEGER NOT NULL DEFAULT 1,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        rule_id INTEGER NOT NULL,
+        rule_name TEXT NOT NULL,
+        fired_at REAL NOT NULL,
+        first_match_at REAL,
+        last_match_at REAL,
+        match_count INTEGER NOT NULL,
+        hostname TEXT,
+        unit TEXT,
+        priority INTEGER,
+        message TEXT,
+        acknowledged_at REAL
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_alerts_rule_id ON alerts(rule_id)",
+]
+
+RULE_FIELDS = ("name", "pattern", "is_regex", "max_priority", "unit", "hostname", "threshold", "window_seconds", "enabled")
+
+_ready_databases = set()
+
+def setup_watchlist_database(db_path=WATCHLIST_DATABASE):
+    if db_path in _ready_databases:
+        return
+    with db_pool.get_pool(db_path).write() as conn:
+        for statement in WATCHLIST_SCHEMA:
+            conn.execute(statement)
+    _ready_databases.add(db_path)
+
+class AhoCorasick:
+    """Finds every one of many keywords in a text in a single pass.
+
+    Matching costs O(len(text) + matches) whatever the number of keywords.
+    find() returns the indexes of the keywords that occur in the text.
+    """
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for keyword_index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (keyword_index,)
+
+        # Breadth-first, so a state's fail target is final before its children.
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                fail_state = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = fail_state if fail_state != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def find(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+def required_literal(pattern):
+    """The longest literal run every match of the regex must contain, or ''.
+
+    Only top-level literals are considered: anything inside a group,
+    alternation or repetition may be skipped by a match.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return ""
+    longest = ""
+    current = []
+    for opcode, argument in parsed:
+        if opcode == sre_parse.LITERAL:
+            current.append(chr(argument))
+            continue
+        if len(current) > len(longest):
+            longest = "".join(current)
+        current = []
+    if len(current) > len(longest):
+        longest = "".join(current)
+    # Matching lowercases both sides, which is only safe for ASCII under IGNORECASE.
+    if parsed.state.flags & re.IGNORECASE and not longest.isascii():
+        return ""
+    return longest
+
+def entry_message(log_entry):
+    message = log_entry.get("MESSAGE")
+    if isinstance(message, list):
+        # journalctl emits non-UTF-8 messages as a byte array.
+        try:
+            message = bytes(message).decode("utf-8", "replace")
+        except (TypeError, ValueError):
+            return ""
+    return message if isinstance(message, str) else ""
+
+def entry_timestamp(log_entry):
+    try:
+        return int(log_entry["__REALTIME_TIMESTAMP"]) / 1_000_000
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+def entry_priority(log_entry):
+    try:
+        return int(log_entry.get("PRIORITY"))
+    except (TypeError, ValueError):
+        return None
+
+def validate_rule(rule):
+    """Normalizes a rule dict from the API; raises ValueError when it is unusable."""
+    if not isinstance(rule, dict):
+        raise ValueError("A rule must be a JSON object.")
+    pattern = (rule.get("pattern") or "").strip() or None
+    is_regex = bool(rule.get("is_regex"))
+    if pattern and is_regex:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+    normalized = {
+        "name": (rule.get("name") or pattern or "").strip(),
+        "pattern": pattern,
+        "is_regex": int(is_regex),
+        "max_priority": None,
+        "unit": (rule.get("unit") or "").strip() or None,
+        "hostname": (rule.get("hostname") or "").strip() or None,
+        "enabled": int(rule.get("enabled", True) not in (False, 0, "0", "false")),
+    }
+    try:
+        if rule.get("max_priority") not in (None, ""):
+            normalized["max_priority"] = int(rule["max_priority"])
+        normalized["threshold"] = int(rule.get("threshold") or 1)
+        normalized["window_seconds"] = float(rule.get("window_seconds") or WATCHLIST_DEFAULT_WINDOW_SECONDS)
+    except (TypeError, ValueError):
+        raise ValueError("max_priority, threshold and window_seconds must be numbers.")
+    if normalized["threshold"] < 1 or normalized["window_seconds"] <= 0:
+        raise ValueError("threshold must be at least 1 and window_seconds positive.")
+    if not (pattern or normalized["max_priority"] is not None or normalized["unit"] or normalized["hostname"]):
+        raise ValueError("A rule needs a pattern or at least one of max_priority, unit and hostname.")
+    if not normalized["name"]:
+        normalized["name"] = f"{normalized['unit'] or normalized['hostname'] or 'any'} priority<={normalized['max_priority']}"
+    return normalized
+
+class WatchlistRule:
+    def __init__(self, row):
+        self.id = row["id"]
+        self.name = row["name"]
+        self.pattern = row["pattern"]
+        self.regex = re.compile(row["pattern"]) if row["pattern"] and row["is_regex"] else None
+        self.max_priority = row["max_priority"]
+        self.unit = row["unit"]
+        self.hostname = row["hostname"]
+        self.threshold = row["threshold"]
+        self.window_seconds = row["window_seconds"]
+        self.updated_at = row["updated_at"]
+        # Timestamps of the last `threshold` matches: the rule fires when all
+        # of them fall within window_seconds, i.e. a sliding-window count.
+        self.recent_matches = deque(maxlen=self.threshold)
+        self.quiet_until = None
+
+    def matches_fields(self, log_entry, priority):
+        if self.max_priority is not None and (priority is None or priority > self.max_priority):
+            return False
+        if self.unit and self.unit not in (log_entry.get("_SYSTEMD_UNIT"), log_entry.get("SYSLOG_IDENTIFIER")):
+            return False
+        if self.hostname and self.hostname != log_entry.get("_HOSTNAME"):
+            return False
+        return True
+
+    def record_match(self, timestamp):
+        """Counts one match; True when that completes `threshold` matches in the window."""
+        if self.quiet_until is not None and timestamp < self.quiet_until:
+            return False
+        self.recent_matches.append(timestamp)
+        if len(self.recent_matches) < self.threshold:
+            return False
+        if self.recent_matches[-1] - self.recent_matches[0] > self.window_seconds:
+            return False
+        # One alert per window: further matches until it ends are not reported again.
+        self.recent_matches.clear()
+        self.quiet_until = timestamp + self.window_seconds if self.threshold > 1 else None
+        return True
+
+class WatchlistEngine:
+    """Evaluates ingested entries against every enabled watchlist rule.
+
+    Literal patterns (case-insensitive substrings) and the required literals
+    of regex patterns are compiled into one Aho-Corasick automaton, so each
+    message is scanned once no matter how many rules exist; a regex only runs
+    when its literal was seen. Rules without a pattern are indexed by unit.
+    Threshold windows are kept in memory per rule. Rules are reloaded from the
+    database when they change, checked every WATCHLIST_RELOAD_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, db_path=WATCHLIST_DATABASE):
+        self.db_path = db_path
+        setup_watchlist_database(db_path)
+        self.pool = db_pool.get_pool(db_path)
+        self.rules = {}
+        self.revision = None
+        self.next_reload_check = 0.0
+        self.automaton = None
+        self.rules_by_keyword = []
+        self.unfiltered_regex_rules = []
+        self.patternless_rules_by_unit = {}
+        self.maybe_reload_rules(force=True)
+
+    def maybe_reload_rules(self, force=False):
+        now = time.monotonic()
+        if not force and now < self.next_reload_check:
+            return
+        self.next_reload_check = now + WATCHLIST_RELOAD_INTERVAL_SECONDS
+        with self.pool.read() as conn:
+            revision = tuple(conn.execute("SELECT COUNT(*), COALESCE(MAX(updated_at), 0) FROM watchlist_rules").fetchone())
+            if revision == self.revision:
+                return
+            rows = conn.execute("SELECT * FROM watchlist_rules WHERE enabled = 1").fetchall()
+        self.revision = revision
+        self.compile_rules(rows)
+        watchlist_logger.info(f"Loaded {len(self.rules)} watchlist rule(s) from '{self.db_path}'.")
+
+    def compile_rules(self, rows):
+        rules = {}
+        for row in rows:
+            existing = self.rules.get(row["id"])
+            if existing is not None and existing.updated_at == row["updated_at"]:
+                rules[row["id"]] = existing # Keeps its window state.
+                continue
+            try:
+                rules[row["id"]] = WatchlistRule(row)
+            except re.error as e:
+                watchlist_logger.error(f"Skipping watchlist rule {row['id']} ({row['name']}): {e}")
+        self.rules = rules
+
+        keyword_indexes = {}
+        self.rules_by_keyword = []
+        self.unfiltered_regex_rules = []
+        self.patternless_rules_by_unit = {}
+        for rule in rules.values():
+            if not rule.pattern:
+                self.patternless_rules_by_unit.setdefault(rule.unit, []).append(rule)
+                continue
+            keyword = required_literal(rule.pattern) if rule.regex else rule.pattern
+            if rule.regex and len(keyword) < REGEX_PREFILTER_MIN_LITERAL_CHARS:
+                self.unfiltered_regex_rules.append(rule)
+                continue
+            keyword = keyword.lower()
+            if keyword not in keyword_indexes:
+                keyword_indexes[keyword] = len(self.rules_by_keyword)
+                self.rules_by_keyword.append([])
+            self.rules_by_keyword[keyword_indexes[keyword]].append(rule)
+        self.automaton = AhoCorasick(list(keyword_indexes)) if keyword_indexes else None
+
+    def matching_rules(self, log_entry, priority):
+        candidates = []
+        if self.automaton is not None or self.unfiltered_regex_rules:
+            message = entry_message(log_entry)
+            if self.automaton is not None and message:
+                for keyword_index in self.automaton.find(message.lower()):
+                    candidates.extend(self.rules_by_keyword[keyword_index])
+            candidates.extend(self.unfiltered_regex_rules)
+            candidates = [rule for rule in candidates if rule.regex is None or rule.regex.search(message)]
+        if self.patternless_rules_by_unit:
+            for unit in {None, log_entry.get("_SYSTEMD_UNIT"), log_entry.get("SYSLOG_IDENTIFIER")}:
+                candidates.extend(self.patternless_rules_by_unit.get(unit, ()))
+        return [rule for rule in candidates if rule.matches_fields(log_entry, priority)]
+
+    def evaluate_batch(self, log_entries):
+        """Checks a batch of journal entries; stores and returns the alerts fired."""
+        self.maybe_reload_rules()
+        if not self.rules or not log_entries:
+            return []
+
+        fired = []
+        with watchlist_batch_seconds.time():
+            for log_entry in log_entries:
+                priority = entry_priority(log_entry)
+                for rule in self.matching_rules(log_entry, priority):
+                    timestamp = entry_timestamp(log_entry)
+                    first_match_at = rule.recent_matches[0] if rule.recent_matches else timestamp
+                    if rule.record_match(timestamp):
+                        fired.append((
+                            rule.id, rule.name, time.time(), first_match_at, timestamp, rule.threshold,
+                            log_entry.get("_HOSTNAME"), log_entry.get("_SYSTEMD_UNIT") or log_entry.get("SYSLOG_IDENTIFIER"),
+                            priority, entry_message(log_entry)[:ALERT_MESSAGE_MAX_CHARS],
+                        ))
+
+        if fired:
+            with self.pool.write() as conn:
+                conn.executemany('''
+                    INSERT INTO alerts (rule_id, rule_name, fired_at, first_match_at, last_match_at, match_count,
+                                        hostname, unit, priority, message)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', fired)
+            alerts_fired_total.inc(len(fired))
+            for alert in fired:
+                watchlist_logger.warning(f"Watchlist alert '{alert[1]}' ({alert[5]} match(es)) on {alert[6]}/{alert[7]}: {alert[9][:200]}")
+        return fired
+
+    def close(self):
+        self.pool.close_writer()
+
+def list_rules(db_path=WATCHLIST_DATABASE):
+    setup_watchlist_database(db_path)
+    with db_pool.get_pool(db_path).read() as conn:
+        return [dict(row) for row in conn.execute("SELECT * FROM watchlist_rules ORDER BY id")]
+
+def add_rule(rule, db_path=WATCHLIST_DATABASE):
+    normalized = validate_rule(rule)
+    setup_watchlist_database(db_path)
+    now = time.time()
+    with db_pool.get_pool(db_path).write() as conn:
+        cursor = conn.execute(f'''
+            INSERT INTO watchlist_rules ({", ".join(RULE_FIELDS)}, created_at, updated_at)
+            VALUES ({", ".join("?" * len(RULE_FIELDS))}, ?, ?)
+        ''', tuple(normalized[field] for field in RULE_FIELDS) + (now, now))
+        row = conn.execute("SELECT * FROM watchlist_rules WHERE id = ?", (cursor.lastrowid,)).fetchone()
+    return dict(row)
+
+def delete_rule(rule_id, db_path=WATCHLIST_DATABASE):
+    setup_watchlist_database(db_path)
+    with db_pool.get_pool(db_path).write() as conn:
+        return conn.execute("DELETE FROM watchlist_rules WHERE id = ?", (rule_id,)).rowcount > 0
+
+def list_alerts(limit=ALERTS_DEFAULT_LIMIT, after_id=None, unacknowledged_only=False, db_path=WATCHLIST_DATABASE):
+    """Newest alerts first; after_id returns only alerts newer than that id."""
+    setup_watchlist_database(db_path)
+    conditions = []
+    params = []
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    if unacknowledged_only:
+        conditions.append("acknowledged_at IS NULL")
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    with db_pool.get_pool(db_path).read() as conn:
+        rows = conn.execute(f"SELECT * FROM alerts{where_clause} ORDER BY id DESC LIMIT ?", tuple(params) + (limit,))
+        return [dict(row) for row in rows]
+
+def acknowledge_alert(alert_id, db_path=WATCHLIST_DATABASE):
+    setup_watchlist_database(db_path)
+    with db_pool.get_pool(db_path).write() as conn:
+        return conn.execute(
+            "UPDATE alerts SET acknowledged_at = ? WHERE id = ? AND acknowledged_at IS NULL", (time.time(), alert_id)
+        ).rowcount > 0